@@ -5,7 +5,6 @@ Add sample data for testing admin dashboard
 
 import requests
 import json
-import time
 from datetime import datetime, timedelta
 
 # Configuration
@@ -131,26 +130,27 @@ def add_sample_data():
     success_count = 0
     error_count = 0
     
-    for i, data in enumerate(sample_data, 1):
-        try:
-            print(f"📝 Adding record {i}/{len(sample_data)}: {data['cpu_model']} + {data['gpu_model']}")
-            
-            response = requests.post(f"{BASE_URL}/submit", json=data, timeout=5)
-            
-            if response.status_code == 200:
-                result = response.json()
-                print(f"   ✅ Success: {result['message']}")
-                success_count += 1
-            else:
-                print(f"   ❌ Failed: {response.status_code} - {response.text}")
-                error_count += 1
-                
-        except Exception as e:
-            print(f"   ❌ Error: {str(e)}")
-            error_count += 1
+    try:
+        # ส่งทั้งหมดในคำขอเดียว
+        response = requests.post(f"{BASE_URL}/submit/batch", json=sample_data, timeout=30)
         
-        # Small delay between requests
-        time.sleep(0.3)
+        if response.status_code == 200:
+            result = response.json()
+            for item in result['results']:
+                data = sample_data[item['index']]
+                if item['status'] == 'ok':
+                    print(f"   ✅ {data['cpu_model']} + {data['gpu_model']}")
+                    success_count += 1
+                else:
+                    print(f"   ❌ {data['cpu_model']} + {data['gpu_model']}: {item['message']}")
+                    error_count += 1
+        else:
+            print(f"   ❌ Failed: {response.status_code} - {response.text}")
+            error_count = len(sample_data)
+            
+    except Exception as e:
+        print(f"   ❌ Error: {str(e)}")
+        error_count = len(sample_data)
     
     print("\n" + "=" * 60)
     print(f"🎉 Data addition completed!")
@@ -0,0 +1,260 @@
+"""
+Columnar aggregation engine for the dashboard (no pandas).
+
+Documents are appended into typed column buffers: dictionary-encoded
+``array('i')`` codes for models/brands/modes/RAM sizes, ``array('d')`` for
+RAM and scores, ``array('q')`` epoch microseconds for created_at. The
+stats dict (see dashboard.py) is then computed with a handful of NumPy
+primitives over those buffers:
+
+* ``count_by``  - counts per category (``bincount`` over codes)
+* ``sum_by``    - per-category [sum, count] of a float column (grouped means)
+* ``bin_by``    - per-category histogram of floor(value)
+
+Counts for pairs (CPU+GPU combos, brand pairs) use a combined code.
+``Columns.to_frame()`` imports pandas lazily for ad-hoc analysis only.
+"""
+
+import math
+from array import array
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+
+from dashboard import SCORE_DIMENSIONS, combo_label, empty_stats, extract_mode, extract_score
+
+CATEGORICAL_FIELDS = ['test_device_type', 'cpu_brand', 'cpu_model', 'gpu_brand', 'gpu_model', 'ram_gb']
+
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+_EPOCH_DAY = date(1970, 1, 1)
+_NAT = np.iinfo(np.int64).min
+_DAY_US = 86400 * 1000000
+
+
+class CategoricalColumn:
+    """Append-only dictionary-encoded column (int32 codes, -1 = missing)"""
+
+    def __init__(self):
+        self.codes = array('i')
+        # None is pre-seeded as -1, so encoding is a single setdefault()
+        self.index = {None: -1}
+
+    def append(self, value):
+        index = self.index
+        self.codes.append(index.setdefault(value, len(index) - 1))
+
+    def build(self):
+        codes = np.frombuffer(self.codes, dtype=np.int32) if self.codes else np.empty(0, dtype=np.int32)
+        return codes, list(self.index)[1:]
+
+
+def _as_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _epoch_us(value):
+    """created_at -> microseconds since epoch (UTC), NaT sentinel if unusable"""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return _NAT
+    if not isinstance(value, datetime):
+        return _NAT
+    return (value - (_EPOCH if value.tzinfo is None else _EPOCH_UTC)) // _MICROSECOND
+
+
+def _floats(buffer):
+    return np.frombuffer(buffer, dtype=np.float64) if buffer else np.empty(0)
+
+
+class ColumnBuilder:
+    """Collects dashboard documents into column buffers"""
+
+    def __init__(self):
+        self.categorical = {field: CategoricalColumn() for field in CATEGORICAL_FIELDS}
+        self.mode = CategoricalColumn()
+        self.ram = array('d')
+        self.score = array('d')
+        self.created_at = array('q')
+
+    def append(self, doc):
+        return self.extend([doc])
+
+    def extend(self, docs):
+        # ลูปต่อเอกสารเป็นส่วนที่แพงที่สุด: ผูก method ไว้ในตัวแปร local
+        fields = [(field, column.index, column.codes.append) for field, column in self.categorical.items()]
+        mode_index, mode_append = self.mode.index, self.mode.codes.append
+        ram_append, score_append, created_append = self.ram.append, self.score.append, self.created_at.append
+        nan, isfinite = math.nan, math.isfinite
+        for doc in docs:
+            get = doc.get
+            for field, index, append in fields:
+                append(index.setdefault(get(field), len(index) - 1))
+            ram = get('ram_gb')
+            ram_append(ram if type(ram) in (int, float) else _as_float(ram))
+            created_append(_epoch_us(get('created_at')))
+            # Documents whose test_details is missing, free text or without a mode count as mode 'unknown'
+            details = get('test_details')
+            if type(details) is dict:
+                mode = details.get('mode')
+                mode_append(mode_index.setdefault('unknown' if mode is None else mode, len(mode_index) - 1))
+                score = details.get('avg_score')
+                if type(score) is not float:
+                    score = extract_score(details)
+                score_append(nan if score is None or not isfinite(score) else score)
+            else:
+                mode_append(mode_index.setdefault(extract_mode(details), len(mode_index) - 1))
+                score_append(nan)
+        return self
+
+    def build(self):
+        return Columns(
+            {field: column.build() for field, column in self.categorical.items()},
+            self.mode.build(),
+            _floats(self.ram),
+            _floats(self.score),
+            np.frombuffer(self.created_at, dtype=np.int64) if self.created_at else np.empty(0, dtype=np.int64),
+        )
+
+
+class Columns:
+    """Built dashboard columns: (codes, categories) pairs plus float/epoch arrays"""
+
+    def __init__(self, categorical, mode, ram, score, created_at):
+        self.categorical = categorical
+        self.mode = mode
+        self.ram = ram
+        self.score = score
+        self.created_at = created_at
+
+    def __len__(self):
+        return len(self.created_at)
+
+    def column(self, name):
+        return self.mode if name == 'mode' else self.categorical[name]
+
+    def to_frame(self):
+        """pandas DataFrame of the columns (pandas is imported only here: pip install -r requirements-analysis.txt)"""
+        import pandas as pd
+
+        frame = {name: pd.Categorical.from_codes(codes, categories=categories)
+                 for name, (codes, categories) in self.categorical.items() if name != 'ram_gb'}
+        frame['ram_gb'] = self.ram
+        frame['created_at'] = pd.to_datetime(self.created_at.view('datetime64[us]'))
+        frame['mode'] = pd.Categorical.from_codes(*self.mode)
+        frame['score'] = self.score
+        return pd.DataFrame(frame)
+
+
+def count_by(column):
+    """{category: count} for a (codes, categories) column, missing values skipped"""
+    codes, categories = column
+    keep = codes >= 0
+    counts = np.bincount(codes[keep], minlength=len(categories))
+    return {categories[code]: int(n) for code, n in enumerate(counts) if n}
+
+
+def sum_by(column, values):
+    """{category: [sum, count]} of the finite values per category"""
+    codes, categories = column
+    keep = (codes >= 0) & np.isfinite(values)
+    sums = np.bincount(codes[keep], weights=values[keep], minlength=len(categories))
+    counts = np.bincount(codes[keep], minlength=len(categories))
+    return {categories[code]: [float(sums[code]), int(n)] for code, n in enumerate(counts) if n}
+
+
+def bin_by(column, values):
+    """{category: {floor(value): count}} over the finite values"""
+    codes, categories = column
+    keep = (codes >= 0) & np.isfinite(values)
+    if not keep.any():
+        return {}
+    bins = np.floor(values[keep]).astype(np.int64)
+    low = int(bins.min())
+    span = int(bins.max()) - low + 1
+    counts = np.bincount(codes[keep].astype(np.int64) * span + (bins - low))
+    hists = {}
+    for combined in np.flatnonzero(counts):
+        code, offset = divmod(int(combined), span)
+        hists.setdefault(categories[code], {})[low + offset] = int(counts[combined])
+    return hists
+
+
+def count_pairs(left, right, mask=None):
+    """{(left category | None, right category | None): count} via a combined code"""
+    (left_codes, left_categories), (right_codes, right_categories) = left, right
+    width = len(right_categories) + 1
+    combined = (left_codes.astype(np.int64) + 1) * width + (right_codes + 1)
+    if mask is not None:
+        combined = combined[mask]
+    counts = np.bincount(combined) if len(combined) else np.empty(0, dtype=np.int64)
+    pairs = {}
+    for key in np.flatnonzero(counts):
+        l, r = divmod(int(key), width)
+        pairs[(left_categories[l - 1] if l else None, right_categories[r - 1] if r else None)] = int(counts[key])
+    return pairs
+
+
+def stats_from_columns(columns):
+    """Dashboard stats dict computed from built columns"""
+    stats = empty_stats()
+    if not len(columns):
+        return stats
+
+    counts = stats['counts']
+    stats['total'] = len(columns)
+    ram = columns.ram[np.isfinite(columns.ram)]
+    stats['ram_sum'] = float(ram.sum())
+    stats['ram_count'] = int(len(ram))
+
+    for dim in ('cpu_model', 'gpu_model', 'cpu_brand', 'gpu_brand', 'ram_gb'):
+        counts[dim] = count_by(columns.column(dim))
+    device_type = columns.column('test_device_type')
+    device_codes = device_type[0]
+    counts['device_type'] = count_by(device_type)
+    missing_device = int((device_codes < 0).sum())
+    if missing_device:
+        counts['device_type']['unknown'] = counts['device_type'].get('unknown', 0) + missing_device
+    counts['mode'] = count_by(columns.mode)
+
+    for (cpu, gpu), n in count_pairs(columns.column('cpu_model'), columns.column('gpu_model')).items():
+        label = combo_label(cpu, gpu)
+        counts['combo'][label] = counts['combo'].get(label, 0) + n
+    cpu_brand, gpu_brand = columns.column('cpu_brand'), columns.column('gpu_brand')
+    has_pair = (device_codes >= 0) & (cpu_brand[0] >= 0) & (gpu_brand[0] >= 0)
+    counts['brand_pair'] = count_pairs(cpu_brand, gpu_brand, has_pair)
+
+    # วันที่ (UTC) และช่วง 7 วันล่าสุดเทียบกับ 7 วันก่อนหน้า โดยอิงเวลาล่าสุดในข้อมูล
+    created_at = columns.created_at[columns.created_at != _NAT]
+    if len(created_at):
+        days, day_counts = np.unique(created_at // _DAY_US, return_counts=True)
+        counts['day'] = {(_EPOCH_DAY + timedelta(days=int(day))).isoformat(): int(n)
+                         for day, n in zip(days, day_counts)}
+        latest = int(created_at.max())
+        last_start = latest - 7 * _DAY_US
+        prev_start = latest - 14 * _DAY_US
+        stats['tests_last_7d'] = int((created_at > last_start).sum())
+        stats['tests_prev_7d'] = int(((created_at > prev_start) & (created_at <= last_start)).sum())
+
+    scores = columns.score
+    scored = scores[np.isfinite(scores)]
+    stats['score_sum'] = float(scored.sum())
+    stats['score_count'] = int(len(scored))
+    if len(scored):
+        bins, bin_counts = np.unique(np.floor(scored).astype(np.int64), return_counts=True)
+        stats['score_bins'] = {int(b): int(n) for b, n in zip(bins, bin_counts)}
+    for dim in SCORE_DIMENSIONS:
+        stats['score_sums'][dim] = sum_by(columns.column(dim), scores)
+        stats['score_hists'][dim] = bin_by(columns.column(dim), scores)
+    return stats
+
+
+def stats_from_documents(data):
+    """Build stats by scanning raw documents (mock data or un-rolled-up collections)"""
+    return stats_from_columns(ColumnBuilder().extend(data).build())
@@ -1,12 +1,23 @@
-from flask import Flask, request, jsonify, render_template_string
-from pymongo import MongoClient
-from datetime import datetime, timezone
+from flask import Flask, Response, request, jsonify, render_template_string, stream_with_context
 import os
+import atexit
 import logging
-import pandas as pd
-import plotly.graph_objs as go
-import plotly.utils
-import json
+from cache import DEFAULT_TTL, DashboardCache
+from connection import MongoConnection
+from daily import DAILY_COLLECTION, DailyRollupStore
+from dashboard import (CHART_DIMENSIONS, CHARTS, SUMMARY_DIMENSIONS, TOP_K_CHARTS, build_summary, chart_json,
+                       empty_stats)
+from indexes import ensure_indexes, index_status
+from ingest import QueueFull, WriteBehindQueue
+from listing import next_cursor, parse_list_args
+from pool import connection_budget
+from queries import parse_window
+from retention import HISTORY_COLLECTION, HistoryStore
+from rollups import ROLLUP_COLLECTION, RollupStore
+from sketches import DEFAULT_FLUSH_INTERVAL, SKETCH_COLLECTION, SKETCH_DIMENSIONS, SketchStore
+from storage import MongoStorage, backend_from_env, embedded_storage_from_env
+from submission import (apply_write_errors, batch_response, build_document, demo_results, parse_batch,
+                        validate_batch)
 
 app = Flask(__name__)
 
@@ -14,27 +25,119 @@ app = Flask(__name__)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# mongodb (default) or sqlite (embedded, no external service; see storage.py)
+STORAGE_BACKEND = backend_from_env()
+# Parquet archive of old submissions, served together with the backend (see archive.py)
+ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR')
+# วันเก่าถูก archive หรือถูกพับเข้า history (retention.py) อย่างใดอย่างหนึ่ง ไม่งั้น stats นับซ้ำ
+ARCHIVE_RETENTION_CONFLICT = 'RETENTION_DAYS and ARCHIVE_DIR are exclusive: old days are either archived or folded'
+if ARCHIVE_DIR and os.environ.get('RETENTION_DAYS'):
+    raise ValueError(ARCHIVE_RETENTION_CONFLICT)
+
 # MongoDB Atlas connection (use environment variable for security)
 MONGODB_URI = os.environ.get('MONGODB_URI')
 
-if not MONGODB_URI:
+if not MONGODB_URI and STORAGE_BACKEND == 'mongodb':
     logger.error("MONGODB_URI environment variable not set!")
     # For demo purposes, we'll use a fallback
     MONGODB_URI = "mongodb://localhost:27017"
     logger.warning("Using fallback MongoDB URI - this may not work in production")
 
-try:
-    client = MongoClient(MONGODB_URI, serverSelectionTimeoutMS=5000)
-    # Test the connection
-    client.admin.command('ping')
-    logger.info("Successfully connected to MongoDB")
-    db = client["system-monitor"]
-    collection = db["process"]
-except Exception as e:
-    logger.error(f"Failed to connect to MongoDB: {e}")
-    # For demo purposes, we'll create a mock collection
-    collection = None
-    logger.warning("Using mock data storage for demo purposes")
+# Degraded (demo) mode until the background connection succeeds
+storage = None
+ingest_queue = None
+
+# Rendered dashboard payload, reused until new data arrives or the TTL expires
+dashboard_cache = DashboardCache(ttl=float(os.environ.get('DASHBOARD_CACHE_TTL', DEFAULT_TTL)))
+
+# Write-behind mode: /submit queues documents and a background thread inserts them in batches
+WRITE_BEHIND = os.environ.get('WRITE_BEHIND', '').lower() in ('1', 'true', 'yes')
+RETRY_AFTER_SECONDS = 1
+# Without MONGODB_URI the app is a demo: writes get mock responses instead of 503 while disconnected
+DEMO_FALLBACK = not os.environ.get('MONGODB_URI')
+
+
+def _with_archive(backend):
+    """`backend` plus the Parquet archive when ARCHIVE_DIR is set (pyarrow is only imported then)"""
+    if not ARCHIVE_DIR:
+        return backend
+    if os.environ.get('RETENTION_DAYS'):
+        raise ValueError(ARCHIVE_RETENTION_CONFLICT)
+    from archive import Archive, ArchivedStorage
+
+    return ArchivedStorage(backend, Archive(ARCHIVE_DIR))
+
+
+def _on_connect(mongo_client):
+    """Switch from degraded to live once MongoDB answers (runs on the connection thread)"""
+    global storage, ingest_queue
+    database = mongo_client["system-monitor"]
+    if os.environ.get('ENSURE_INDEXES', '1') != '0':
+        try:
+            created = ensure_indexes(database)
+            if created:
+                logger.info(f"Created indexes: {', '.join(created)}")
+        except Exception as e:
+            logger.error(f"Failed to ensure indexes: {e}")
+    mongo_storage = MongoStorage(
+        database["process"],
+        rollups=RollupStore(database[ROLLUP_COLLECTION]),
+        daily_rollups=DailyRollupStore(database[DAILY_COLLECTION]),
+        sketches=SketchStore(database[SKETCH_COLLECTION],
+                             flush_interval=float(os.environ.get('SKETCH_FLUSH_SECONDS', DEFAULT_FLUSH_INTERVAL))),
+        history=HistoryStore(database[HISTORY_COLLECTION]),
+    )
+    live = _with_archive(mongo_storage)
+    storage = live
+    if WRITE_BEHIND:
+        # callback ผูกกับ storage ของ connection นี้ ไม่อ่าน global (อาจเป็น None หลัง fork)
+        ingest_queue = WriteBehindQueue.from_env(mongo_storage.collection,
+                                                 on_flush=lambda docs: _after_insert(docs, live))
+        logger.info("Write-behind ingest enabled")
+    dashboard_cache.invalidate()
+
+
+def _after_fork():
+    """Forked worker: back to degraded until this process has its own client"""
+    global storage, ingest_queue
+    if STORAGE_BACKEND == 'mongodb':
+        storage = ingest_queue = None
+        connection.after_fork()
+
+
+@atexit.register
+def _shutdown():
+    # Only this process's own stores (the parent's are dropped by _after_fork)
+    if ingest_queue is not None:
+        ingest_queue.close()
+    if storage is not None:
+        storage.close()
+
+
+connection = MongoConnection.from_env(MONGODB_URI, on_connect=_on_connect)
+if STORAGE_BACKEND == 'mongodb':
+    connection.start()
+else:
+    # SQLite opens its connections per thread and per process, so it survives a fork as is
+    storage = _with_archive(embedded_storage_from_env())
+    logger.info(f"Using embedded {storage.name} storage")
+os.register_at_fork(after_in_child=_after_fork)
+
+
+@app.before_request
+def _ensure_connecting():
+    # After a fork (gunicorn --preload) the connection thread starts again in the worker
+    if STORAGE_BACKEND == 'mongodb':
+        connection.start()
+
+
+def _unavailable_response():
+    """503 for writes while MongoDB is still connecting (agents retry after Retry-After)"""
+    status = connection.status()
+    response = jsonify({'status': 'error', 'message': f"Database unavailable ({status['state']}), retry later"})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(max(RETRY_AFTER_SECONDS, int(status['next_attempt_in'] or 0)))
+    return response
 
 # HTML template for admin dashboard
 ADMIN_TEMPLATE = '''
@@ -176,6 +279,35 @@ ADMIN_TEMPLATE = '''
             transform: rotate(180deg);
         }
         
+        .window-form {
+            display: flex;
+            flex-wrap: wrap;
+            align-items: center;
+            gap: 12px;
+            margin-bottom: 30px;
+            color: #374151;
+            font-weight: 600;
+        }
+        
+        .window-form input {
+            padding: 10px 14px;
+            border: 2px solid #e5e7eb;
+            border-radius: 12px;
+            font-size: 15px;
+        }
+        
+        .window-form button, .window-form a {
+            background: linear-gradient(135deg, #667eea, #764ba2);
+            color: white;
+            border: none;
+            padding: 10px 20px;
+            border-radius: 12px;
+            cursor: pointer;
+            font-size: 15px;
+            font-weight: 600;
+            text-decoration: none;
+        }
+        
         .demo-notice, .error-notice {
             padding: 20px;
             border-radius: 16px;
@@ -417,6 +549,14 @@ ADMIN_TEMPLATE = '''
             <i class="fas fa-sync-alt"></i> Refresh Data
         </button>
         
+        <form class="window-form" method="get" action="/admin">
+            <i class="fas fa-calendar-alt"></i>
+            <label>From <input type="date" name="from" value="{{ window_from }}"></label>
+            <label>To <input type="date" name="to" value="{{ window_to }}"></label>
+            <button type="submit">Apply</button>
+            {% if window_from or window_to %}<a href="/admin">All time</a>{% endif %}
+        </form>
+        
         <div class="stats-grid">
             <div class="stat-card">
                 <div class="stat-icon"><i class="fas fa-vial"></i></div>
@@ -461,6 +601,11 @@ ADMIN_TEMPLATE = '''
                 <div class="stat-number">{{ top_combo_label }}</div>
                 <div class="stat-label">Top CPU+GPU Combo</div>
             </div>
+            <div class="stat-card">
+                <div class="stat-icon"><i class="fas fa-percentage"></i></div>
+                <div class="stat-number">{{ score_percentiles_label }}</div>
+                <div class="stat-label">Score p50 / p90 / p99</div>
+            </div>
         </div>
 
         <div class="chart-grid">
@@ -538,6 +683,13 @@ ADMIN_TEMPLATE = '''
                 <div id="scoreHist"></div>
             </div>
         </div>
+
+        <div class="chart-grid">
+            <div class="chart full-width">
+                <div class="chart-title"><i class="fas fa-percentage"></i> Score Percentiles by Test Mode</div>
+                <div id="scorePercentiles"></div>
+            </div>
+        </div>
     </div>
 
     <script>
@@ -569,104 +721,87 @@ ADMIN_TEMPLATE = '''
             };
         }
 
-        // CPU Chart
-        var cpuData = {{ cpu_chart_data | safe }};
-        if (cpuData.data.length > 0) {
-            cpuData.data[0].marker.color = colors.primary;
-            cpuData.layout = updateChartLayout(cpuData.layout);
-        }
-        Plotly.newPlot('cpuChart', cpuData.data, cpuData.layout, chartConfig);
-
-        // GPU Chart
-        var gpuData = {{ gpu_chart_data | safe }};
-        if (gpuData.data.length > 0) {
-            gpuData.data[0].marker.color = colors.secondary;
-            gpuData.layout = updateChartLayout(gpuData.layout);
-        }
-        Plotly.newPlot('gpuChart', gpuData.data, gpuData.layout, chartConfig);
-
-        // RAM Pie Chart
-        var ramData = {{ ram_pie_data | safe }};
-        if (ramData.data.length > 0) {
-            ramData.data[0].marker = {
-                colors: [colors.primary, colors.secondary, colors.accent, colors.success, colors.warning]
-            };
-            ramData.layout = updateChartLayout(ramData.layout);
-        }
-        Plotly.newPlot('ramPieChart', ramData.data, ramData.layout, chartConfig);
-
-        // Brand Chart
-        var brandData = {{ brand_chart_data | safe }};
-        if (brandData.data.length > 0) {
-            brandData.data.forEach((trace, index) => {
-                trace.marker.color = index === 0 ? colors.primary : colors.secondary;
-            });
-            brandData.layout = updateChartLayout(brandData.layout);
-        }
-        Plotly.newPlot('brandChart', brandData.data, brandData.layout, chartConfig);
-
-        // Mode Chart
-        var modeData = {{ mode_chart_data | safe }};
-        if (modeData.data.length > 0) {
-            modeData.data[0].marker = {
-                colors: [colors.success, colors.warning, colors.error, colors.accent]
-            };
-            modeData.layout = updateChartLayout(modeData.layout);
-        }
-        Plotly.newPlot('modeChart', modeData.data, modeData.layout, chartConfig);
-
-        // Scores Chart
-        var scoresData = {{ scores_chart_data | safe }};
-        if (scoresData.data.length > 0) {
-            scoresData.data[0].marker.color = colors.accent;
-            scoresData.layout = updateChartLayout(scoresData.layout);
-        }
-        Plotly.newPlot('scoresChart', scoresData.data, scoresData.layout, chartConfig);
-
-        // Daily Activity Chart
-        var dailyData = {{ daily_chart_data | safe }};
-        if (dailyData.data.length > 0) {
-            dailyData.data[0].line.color = colors.success;
-            dailyData.data[0].marker.color = colors.success;
-            dailyData.layout = updateChartLayout(dailyData.layout);
-        }
-        Plotly.newPlot('dailyChart', dailyData.data, dailyData.layout, chartConfig);
+        // Per-chart styling applied after the figure arrives from /api/charts/<name>
+        const charts = [
+            { name: 'cpu', element: 'cpuChart', style: fig => {
+                if (fig.data.length > 0) { fig.data[0].marker.color = colors.primary; }
+            } },
+            { name: 'gpu', element: 'gpuChart', style: fig => {
+                if (fig.data.length > 0) { fig.data[0].marker.color = colors.secondary; }
+            } },
+            { name: 'ram', element: 'ramPieChart', style: fig => {
+                if (fig.data.length > 0) {
+                    fig.data[0].marker = {
+                        colors: [colors.primary, colors.secondary, colors.accent, colors.success, colors.warning]
+                    };
+                }
+            } },
+            { name: 'brand', element: 'brandChart', style: fig => {
+                fig.data.forEach((trace, index) => {
+                    trace.marker.color = index === 0 ? colors.primary : colors.secondary;
+                });
+            } },
+            { name: 'mode', element: 'modeChart', style: fig => {
+                if (fig.data.length > 0) {
+                    fig.data[0].marker = { colors: [colors.success, colors.warning, colors.error, colors.accent] };
+                }
+            } },
+            { name: 'scores', element: 'scoresChart', style: fig => {
+                if (fig.data.length > 0) { fig.data[0].marker.color = colors.accent; }
+            } },
+            { name: 'daily', element: 'dailyChart', style: fig => {
+                if (fig.data.length > 0) {
+                    fig.data[0].line.color = colors.success;
+                    fig.data[0].marker.color = colors.success;
+                }
+            } },
+            { name: 'device_type', element: 'deviceTypeChart', style: fig => {
+                if (fig.data.length > 0) {
+                    fig.data[0].marker = { colors: [colors.primary, colors.secondary, colors.accent] };
+                }
+            } },
+            { name: 'ram_tier', element: 'ramTierChart', style: fig => {
+                if (fig.data.length > 0) {
+                    fig.data[0].marker = { colors: [colors.warning, colors.primary, colors.secondary, colors.accent, colors.success] };
+                }
+            } },
+            { name: 'heatmap', element: 'brandHeatmap', style: fig => {} },
+            { name: 'combos', element: 'comboChart', style: fig => {} },
+            { name: 'top_cpu', element: 'topCpuChart', style: fig => {} },
+            { name: 'score_hist', element: 'scoreHist', style: fig => {} },
+            { name: 'score_percentiles', element: 'scorePercentiles', style: fig => {} }
+        ];
 
-        // Device Type Mix
-        var deviceTypeData = {{ device_type_chart_data | safe }};
-        if (deviceTypeData.data.length > 0) {
-            deviceTypeData.data[0].marker = { colors: [colors.primary, colors.secondary, colors.accent] };
-            deviceTypeData.layout = updateChartLayout(deviceTypeData.layout);
+        function loadChart(chart) {
+            fetch('/api/charts/' + chart.name + window.location.search)
+                .then(response => {
+                    if (!response.ok) { throw new Error(response.status + ' ' + response.statusText); }
+                    return response.json();
+                })
+                .then(fig => {
+                    chart.style(fig);
+                    fig.layout = updateChartLayout(fig.layout);
+                    Plotly.newPlot(chart.element, fig.data, fig.layout, chartConfig);
+                })
+                .catch(error => {
+                    document.getElementById(chart.element).textContent = 'Failed to load chart: ' + error.message;
+                });
         }
-        Plotly.newPlot('deviceTypeChart', deviceTypeData.data, deviceTypeData.layout, chartConfig);
 
-        // RAM Tier Distribution
-        var ramTierData = {{ ram_tier_pie_data | safe }};
-        if (ramTierData.data.length > 0) {
-            ramTierData.data[0].marker = { colors: [colors.warning, colors.primary, colors.secondary, colors.accent, colors.success] };
-            ramTierData.layout = updateChartLayout(ramTierData.layout);
+        // Fetch each chart in parallel once its container scrolls into view
+        if ('IntersectionObserver' in window) {
+            const observer = new IntersectionObserver(entries => {
+                entries.forEach(entry => {
+                    if (entry.isIntersecting) {
+                        observer.unobserve(entry.target);
+                        loadChart(charts.find(chart => chart.element === entry.target.id));
+                    }
+                });
+            }, { rootMargin: '200px' });
+            charts.forEach(chart => observer.observe(document.getElementById(chart.element)));
+        } else {
+            charts.forEach(loadChart);
         }
-        Plotly.newPlot('ramTierChart', ramTierData.data, ramTierData.layout, chartConfig);
-
-        // Brand Heatmap
-        var brandHeatmapData = {{ brand_heatmap_data | safe }};
-        brandHeatmapData.layout = updateChartLayout(brandHeatmapData.layout);
-        Plotly.newPlot('brandHeatmap', brandHeatmapData.data, brandHeatmapData.layout, chartConfig);
-
-        // Top Combos
-        var comboBarData = {{ combo_bar_data | safe }};
-        comboBarData.layout = updateChartLayout(comboBarData.layout);
-        Plotly.newPlot('comboChart', comboBarData.data, comboBarData.layout, chartConfig);
-
-        // Top 10 CPUs by Avg Score
-        var topCpuData = {{ top_cpu_chart_data | safe }};
-        topCpuData.layout = updateChartLayout(topCpuData.layout);
-        Plotly.newPlot('topCpuChart', topCpuData.data, topCpuData.layout, chartConfig);
-
-        // Score Histogram
-        var scoreHistData = {{ score_hist_data | safe }};
-        scoreHistData.layout = updateChartLayout(scoreHistData.layout);
-        Plotly.newPlot('scoreHist', scoreHistData.data, scoreHistData.layout, chartConfig);
 
         // Add smooth loading animation
         document.addEventListener('DOMContentLoaded', function() {
@@ -689,38 +824,39 @@ ADMIN_TEMPLATE = '''
 @app.route('/submit', methods=['POST'])
 def submit():
     try:
-        data = request.json
-        
-        if not data:
-            return jsonify({'status': 'error', 'message': 'No JSON data provided'}), 400
-
-        # Validate required fields
-        required = ['test_device_type', 'cpu_brand', 'cpu_model', 'gpu_brand', 'gpu_model', 'ram_gb']
-        for field in required:
-            if field not in data:
-                return jsonify({'status': 'error', 'message': f'Missing field: {field}'}), 400
-
-        # Prepare document
-        doc = {
-            'test_device_type': data['test_device_type'], # ประเภทอุปกรณ์ที่ใช้ทดสอบ (CPU/GPU)
-            'cpu_brand': data['cpu_brand'],           # ยี่ห้อ CPU
-            'cpu_model': data['cpu_model'],           # รุ่น CPU
-            'gpu_brand': data['gpu_brand'],           # ยี่ห้อ GPU
-            'gpu_model': data['gpu_model'],           # รุ่น GPU
-            'ram_gb': data['ram_gb'],                 # จำนวนแรม (GB)
-            'test_details': data.get('test_details'), # ข้อมูลอื่นๆ (optional)
-            'created_at': datetime.now(timezone.utc)  # เวลาบันทึก (timezone-aware)
-        }
+        try:
+            doc = build_document(request.json)
+        except ValueError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
 
-        # Insert to MongoDB if available
-        if collection is not None:
-            result = collection.insert_one(doc)
-            logger.info(f"Successfully inserted document with ID: {result.inserted_id}")
+        # Queue for a batched insert (write-behind mode)
+        if ingest_queue is not None:
+            try:
+                document_id = ingest_queue.put(doc)
+            except QueueFull as e:
+                logger.warning(f"Rejecting submit: {e}")
+                response = jsonify({'status': 'error', 'message': f'Server busy: {str(e)}'})
+                response.status_code = 503
+                response.headers['Retry-After'] = str(RETRY_AFTER_SECONDS)
+                return response
+            return jsonify({
+                'status': 'ok',
+                'message': 'Data accepted.',
+                'document_id': str(document_id)
+            })
+
+        # Insert to the storage backend if available
+        if storage is not None:
+            inserted_id = storage.insert(doc)
+            logger.info(f"Successfully inserted document with ID: {inserted_id}")
+            _after_insert([doc])
             return jsonify({
                 'status': 'ok', 
                 'message': 'Data saved successfully.',
-                'document_id': str(result.inserted_id)
+                'document_id': str(inserted_id)
             })
+        elif not DEMO_FALLBACK:
+            return _unavailable_response()
         else:
             # Mock response for demo
             logger.warning("MongoDB not available, using mock response")
@@ -734,479 +870,232 @@ def submit():
         logger.error(f"Error in submit endpoint: {e}")
         return jsonify({'status': 'error', 'message': f'Server error: {str(e)}'}), 500
 
+@app.route('/submit/batch', methods=['POST'])
+def submit_batch():
+    """Insert many records (JSON array or NDJSON) with one unordered insert_many"""
+    try:
+        try:
+            records = parse_batch(request.get_data(), request.content_type)
+        except ValueError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+
+        documents, results = validate_batch(records)
+        if documents and storage is None and not DEMO_FALLBACK:
+            return _unavailable_response()
+        if documents and storage is not None:
+            write_errors = storage.insert_many([doc for _, doc in documents])
+            _after_insert(apply_write_errors(documents, results, write_errors))
+        else:
+            demo_results(documents, results)
+
+        body = batch_response(results, demo=storage is None)
+        logger.info(f"Batch submit: {body['saved']} saved, {body['failed']} rejected")
+        return jsonify(body)
+
+    except Exception as e:
+        logger.error(f"Error in batch submit endpoint: {e}")
+        return jsonify({'status': 'error', 'message': f'Server error: {str(e)}'}), 500
+
+
+def _after_insert(docs, target=None):
+    """Fold newly stored documents into the rollups (of `target`, default the current storage) and expire the cached dashboard"""
+    target = target if target is not None else storage
+    if not docs or target is None:
+        return
+    target.after_insert(docs)
+    dashboard_cache.invalidate()
+
 @app.route('/list', methods=['GET'])
 def list_data():
+    stream = request.args.get('format') == 'ndjson'
     try:
-        if collection is not None:
-            # ดึงข้อมูลทั้งหมด
-            results = list(collection.find({}, {'_id': 0}))
-            logger.info(f"Retrieved {len(results)} documents")
-            return jsonify(results)
-        else:
+        params = parse_list_args(request.args, stream=stream)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    try:
+        if storage is None:
             # Mock response for demo
             logger.warning("MongoDB not available, returning empty list")
+            if stream:
+                return Response('', mimetype='application/x-ndjson')
             return jsonify([])
+
+        if stream:
+            # ส่งข้อมูลทีละเอกสาร (NDJSON) หน่วยความจำไม่โตตามขนาด collection
+            cursor = storage.find(params['query'], params['projection'], params['sort'], params['limit'])
+            return Response(stream_with_context(_ndjson_lines(cursor, params['hidden'])),
+                            mimetype='application/x-ndjson')
+
+        # ดึงเกินมา 1 รายการเพื่อตรวจว่ามีหน้าถัดไปหรือไม่
+        results = list(storage.find(params['query'], params['projection'], params['sort'], params['limit'] + 1))
+        has_more = len(results) > params['limit']
+        results = results[:params['limit']]
+        cursor_field = params['sort'][0][0]
+        next_after = next_cursor(results[-1], cursor_field) if has_more else None
+        for doc in results:
+            for field in params['hidden']:
+                doc.pop(field, None)
+        logger.info(f"Retrieved {len(results)} documents")
+        response = jsonify(results)
+        if next_after:
+            response.headers['X-Next-Cursor'] = next_after
+        return response
     except Exception as e:
         logger.error(f"Error in list endpoint: {e}")
         return jsonify({'status': 'error', 'message': f'Server error: {str(e)}'}), 500
 
-@app.route('/admin', methods=['GET'])
-def admin_dashboard():
+
+def _ndjson_lines(cursor, hidden):
     try:
-        # ดึงข้อมูลทั้งหมดจาก MongoDB
-        if collection is not None:
-            data = list(collection.find({}))
-        else:
-            # Mock data for demo
-            logger.warning("MongoDB not available, using mock data")
-            data = [
-                {
-                    'test_device_type': 'CPU',
-                    'cpu_brand': 'Intel',
-                    'cpu_model': 'i5-13600K',
-                    'gpu_brand': 'NVIDIA',
-                    'gpu_model': 'RTX 4070',
-                    'ram_gb': 32,
-                    'test_details': 'AI Model Training Test',
-                    'created_at': datetime.now(timezone.utc)
-                },
-                {
-                    'test_device_type': 'GPU',
-                    'cpu_brand': 'AMD',
-                    'cpu_model': 'Ryzen 7 5800X',
-                    'gpu_brand': 'NVIDIA',
-                    'gpu_model': 'RTX 4080',
-                    'ram_gb': 64,
-                    'test_details': 'Deep Learning Inference',
-                    'created_at': datetime.now(timezone.utc)
-                }
-            ]
-        
-        if not data:
-            return render_template_string(ADMIN_TEMPLATE, 
-                demo_mode=True,
-                error_message="No data available or MongoDB connection failed",
-                total_tests=0, unique_cpus=0, unique_gpus=0, avg_ram=0,
-                cpu_chart_data=json.dumps({'data': [], 'layout': {}}),
-                gpu_chart_data=json.dumps({'data': [], 'layout': {}}),
-                ram_pie_data=json.dumps({'data': [], 'layout': {}}),
-                brand_chart_data=json.dumps({'data': [], 'layout': {}}),
-                daily_chart_data=json.dumps({'data': [], 'layout': {}})
-            )
-        
-        # สร้าง DataFrame
-        df = pd.DataFrame(data)
-        
-        # แปลง created_at เป็น datetime ถ้าเป็น string
-        if 'created_at' in df.columns:
-            df['created_at'] = pd.to_datetime(df['created_at'])
-        
-        # คำนวณสถิติพื้นฐาน
-        total_tests = len(df)
-        unique_cpus = df['cpu_model'].nunique()
-        unique_gpus = df['gpu_model'].nunique()
-        avg_ram = round(df['ram_gb'].mean(), 1)
-        
-        # 1. CPU Model Horizontal Bar Chart
-        cpu_counts = df['cpu_model'].value_counts().head(10)
-        cpu_chart_data = {
-            'data': [{
-                'x': cpu_counts.values.tolist(),
-                'y': cpu_counts.index.tolist(),
-                'type': 'bar',
-                'orientation': 'h',
-                'marker': {'color': '#667eea'}
-            }],
-            'layout': {
-                'title': 'CPU Model Usage',
-                'xaxis': {'title': 'Number of Tests'},
-                'yaxis': {'title': 'CPU Model'},
-                'height': 400
-            }
-        }
-        
-        # 2. GPU Model Horizontal Bar Chart
-        gpu_counts = df['gpu_model'].value_counts().head(10)
-        gpu_chart_data = {
-            'data': [{
-                'x': gpu_counts.values.tolist(),
-                'y': gpu_counts.index.tolist(),
-                'type': 'bar',
-                'orientation': 'h',
-                'marker': {'color': '#764ba2'}
-            }],
-            'layout': {
-                'title': 'GPU Model Usage',
-                'xaxis': {'title': 'Number of Tests'},
-                'yaxis': {'title': 'GPU Model'},
-                'height': 400
-            }
-        }
-        
-        # 3. RAM Distribution Pie Chart
-        ram_counts = df['ram_gb'].value_counts()
-        ram_pie_data = {
-            'data': [{
-                'labels': [f'{ram} GB' for ram in ram_counts.index],
-                'values': ram_counts.values.tolist(),
-                'type': 'pie',
-                'hole': 0.4
-            }],
-            'layout': {
-                'title': 'RAM Distribution',
-                'height': 400
-            }
-        }
-        
-        # 4. CPU vs GPU Brand Distribution
-        cpu_brand_counts = df['cpu_brand'].value_counts()
-        gpu_brand_counts = df['gpu_brand'].value_counts()
-        
-        brand_chart_data = {
-            'data': [
-                {
-                    'x': cpu_brand_counts.index.tolist(),
-                    'y': cpu_brand_counts.values.tolist(),
-                    'type': 'bar',
-                    'name': 'CPU Brand',
-                    'marker': {'color': '#667eea'}
-                },
-                {
-                    'x': gpu_brand_counts.index.tolist(),
-                    'y': gpu_brand_counts.values.tolist(),
-                    'type': 'bar',
-                    'name': 'GPU Brand',
-                    'marker': {'color': '#764ba2'}
-                }
-            ],
-            'layout': {
-                'title': 'CPU vs GPU Brand Distribution',
-                'xaxis': {'title': 'Brand'},
-                'yaxis': {'title': 'Number of Tests'},
-                'barmode': 'group',
-                'height': 400
-            }
-        }
-        
-        # 5. Daily Test Activity Line Chart
-        df['date'] = df['created_at'].dt.date
-        daily_counts = df['date'].value_counts().sort_index()
-        
-        daily_chart_data = {
-            'data': [{
-                'x': [str(date) for date in daily_counts.index],
-                'y': daily_counts.values.tolist(),
-                'type': 'scatter',
-                'mode': 'lines+markers',
-                'line': {'color': '#4CAF50', 'width': 3},
-                'marker': {'size': 8}
-            }],
-            'layout': {
-                'title': 'Daily Test Activity',
-                'xaxis': {'title': 'Date'},
-                'yaxis': {'title': 'Number of Tests'},
-                'height': 400
-            }
-        }
-        
-        # 6. Test Mode Distribution (ถ้ามีข้อมูล)
-        if 'test_details' in df.columns and len(df) > 0:
-            # ดึง mode จาก test_details
-            modes = []
-            for _, row in df.iterrows():
-                if isinstance(row['test_details'], dict) and 'mode' in row['test_details']:
-                    modes.append(row['test_details']['mode'])
-                else:
-                    modes.append('unknown')
-            
-            mode_counts = pd.Series(modes).value_counts()
-            mode_chart_data = {
-                'data': [{
-                    'labels': mode_counts.index.tolist(),
-                    'values': mode_counts.values.tolist(),
-                    'type': 'pie',
-                    'hole': 0.4
-                }],
-                'layout': {
-                    'title': 'Test Mode Distribution',
-                    'height': 400
-                }
-            }
-        else:
-            mode_chart_data = {
-                'data': [{
-                    'labels': ['No mode data'],
-                    'values': [1],
-                    'type': 'pie',
-                    'hole': 0.4
-                }],
-                'layout': {
-                    'title': 'Test Mode Distribution',
-                    'height': 400
-                }
-            }
-        
-        # 7. Average Scores by Mode (ถ้ามีข้อมูล)
-        if 'test_details' in df.columns and len(df) > 0:
-            scores_data = []
-            for _, row in df.iterrows():
-                if isinstance(row['test_details'], dict) and 'avg_score' in row['test_details']:
-                    mode = row['test_details'].get('mode', 'unknown')
-                    score = row['test_details']['avg_score']
-                    scores_data.append({'mode': mode, 'score': score})
-            
-            if scores_data:
-                scores_df = pd.DataFrame(scores_data)
-                avg_scores = scores_df.groupby('mode')['score'].mean()
-                
-                scores_chart_data = {
-                    'data': [{
-                        'x': avg_scores.index.tolist(),
-                        'y': avg_scores.values.tolist(),
-                        'type': 'bar',
-                        'marker': {'color': '#FF6B6B'}
-                    }],
-                    'layout': {
-                        'title': 'Average Scores by Test Mode',
-                        'xaxis': {'title': 'Test Mode'},
-                        'yaxis': {'title': 'Average Score'},
-                        'height': 400
-                    }
-                }
-            else:
-                scores_chart_data = {
-                    'data': [{
-                        'x': ['No data'],
-                        'y': [0],
-                        'type': 'bar',
-                        'marker': {'color': '#FF6B6B'}
-                    }],
-                    'layout': {
-                        'title': 'Average Scores by Test Mode',
-                        'xaxis': {'title': 'Test Mode'},
-                        'yaxis': {'title': 'Average Score'},
-                        'height': 400
-                    }
-                }
-        else:
-            scores_chart_data = {
-                'data': [{
-                    'x': ['No data'],
-                    'y': [0],
-                    'type': 'bar',
-                    'marker': {'color': '#FF6B6B'}
-                }],
-                'layout': {
-                    'title': 'Average Scores by Test Mode',
-                    'xaxis': {'title': 'Test Mode'},
-                    'yaxis': {'title': 'Average Score'},
-                    'height': 400
-                }
-            }
+        for doc in cursor:
+            for field in hidden:
+                doc.pop(field, None)
+            yield app.json.dumps(doc) + '\n'
+    finally:
+        cursor.close()
 
-        # 8. Marketing/Business insights
-        # Time window based on data timeline to avoid tz issues
-        now_ts = pd.to_datetime(df['created_at']).max()
-        last_7_start = now_ts - pd.Timedelta(days=7) if pd.notna(now_ts) else None
-        prev_7_start = now_ts - pd.Timedelta(days=14) if pd.notna(now_ts) else None
-        if last_7_start is not None:
-            last_7_df = df[df['created_at'] > last_7_start]
-            prev_7_df = df[(df['created_at'] > prev_7_start) & (df['created_at'] <= last_7_start)] if prev_7_start is not None else df.iloc[0:0]
-            tests_last_7d = int(len(last_7_df))
-            prev_cnt = int(len(prev_7_df))
-            growth_7d_pct = round(((tests_last_7d - prev_cnt) / (prev_cnt if prev_cnt > 0 else 1)) * 100.0, 1)
-        else:
-            tests_last_7d = 0
-            growth_7d_pct = 0.0
-
-        # Avg score overall
-        overall_scores = []
-        if 'test_details' in df.columns and len(df) > 0:
-            for _, row in df.iterrows():
-                if isinstance(row['test_details'], dict) and 'avg_score' in row['test_details']:
-                    try:
-                        overall_scores.append(float(row['test_details']['avg_score']))
-                    except Exception:
-                        pass
-        avg_score_overall = round(sum(overall_scores) / len(overall_scores), 1) if overall_scores else 0
-
-        # Top CPU+GPU combo
-        combo_series = (df['cpu_model'].fillna('Unknown CPU') + ' + ' + df['gpu_model'].fillna('Unknown GPU'))
-        combo_counts = combo_series.value_counts()
-        if not combo_counts.empty:
-            top_combo_label = f"{combo_counts.index[0]}"
-        else:
-            top_combo_label = 'N/A'
-
-        # Device type mix (pie)
-        device_counts = df['test_device_type'].fillna('unknown').value_counts()
-        device_type_chart_data = {
-            'data': [{
-                'labels': device_counts.index.tolist(),
-                'values': device_counts.values.tolist(),
-                'type': 'pie',
-                'hole': 0.35
-            }],
-            'layout': {
-                'title': 'Device Type Mix',
-                'height': 400
-            }
-        }
+def load_dashboard_stats(dims=None, window=None):
+    """
+    Dashboard stats; `dims` limits which rollup dimensions are read, `window`
+    (from parse_window) limits the data to a created_at range.
+    """
+    if storage is not None:
+        if window is not None:
+            # หนึ่งครั้งต่อ window: ทุกกราฟของช่วงเวลาเดียวกันใช้ผลลัพธ์ร่วมกัน
+            return dashboard_cache.get(('stats', window), lambda: storage.stats(None, window))
+        return storage.stats(dims)
 
-        # RAM Tiers
-        try:
-            ram_tiers = pd.cut(df['ram_gb'].astype(float),
-                               bins=[0, 8, 16, 32, 64, float('inf')],
-                               labels=['<=8 GB', '9-16 GB', '17-32 GB', '33-64 GB', '65+ GB'],
-                               include_lowest=True)
-            ram_tier_counts = ram_tiers.value_counts().reindex(['<=8 GB', '9-16 GB', '17-32 GB', '33-64 GB', '65+ GB']).fillna(0)
-        except Exception:
-            ram_tier_counts = pd.Series([], dtype=int)
-        ram_tier_pie_data = {
-            'data': [{
-                'labels': ram_tier_counts.index.astype(str).tolist(),
-                'values': ram_tier_counts.values.tolist(),
-                'type': 'pie',
-                'hole': 0.35
-            }],
-            'layout': {
-                'title': 'RAM Tier Distribution',
-                'height': 400
-            }
-        }
+    # ยังไม่มีฐานข้อมูล: แสดง dashboard ว่าง (หน้า /admin แจ้งว่าไม่มีข้อมูล)
+    logger.warning("MongoDB not available, no dashboard data")
+    return empty_stats()
 
-        # CPU vs GPU Brand Heatmap
-        brand_matrix = df.pivot_table(index='cpu_brand', columns='gpu_brand', values='test_device_type', aggfunc='count', fill_value=0)
-        heatmap_data = {
-            'data': [{
-                'z': brand_matrix.values.tolist(),
-                'x': brand_matrix.columns.astype(str).tolist(),
-                'y': brand_matrix.index.astype(str).tolist(),
-                'type': 'heatmap',
-                'colorscale': 'Blues'
-            }],
-            'layout': {
-                'title': 'CPU vs GPU Brand Heatmap',
-                'height': 400
-            }
-        }
 
-        # Top CPU+GPU combos (bar)
-        top_combos = combo_counts.head(10)
-        combo_bar_data = {
-            'data': [{
-                'x': top_combos.values.tolist(),
-                'y': top_combos.index.tolist(),
-                'type': 'bar',
-                'orientation': 'h',
-                'marker': {'color': '#546de5'}
-            }],
-            'layout': {
-                'title': 'Top CPU+GPU Combos',
-                'xaxis': {'title': 'Count'},
-                'yaxis': {'title': 'CPU + GPU'},
-                'height': 400
-            }
-        }
+def sketches_ready(window):
+    """Sketches cover all-time data only, and only once built (python sketches.py rebuild)"""
+    return window is None and storage is not None and storage.sketches is not None and storage.sketches.ready()
+
 
-        # Top 10 CPUs by average score (marketing insight: stronger CPU -> better AI performance)
-        cpu_scores = []
-        if 'test_details' in df.columns and len(df) > 0:
-            for _, row in df.iterrows():
-                if isinstance(row['test_details'], dict) and 'avg_score' in row['test_details']:
-                    try:
-                        cpu_scores.append({'cpu_model': row.get('cpu_model', 'Unknown'),
-                                           'avg_score': float(row['test_details']['avg_score'])})
-                    except Exception:
-                        pass
-        if cpu_scores:
-            cpu_scores_df = pd.DataFrame(cpu_scores)
-            top_cpu = cpu_scores_df.groupby('cpu_model')['avg_score'].mean().sort_values(ascending=False).head(10)
+def dashboard_summary(window=None):
+    """Stat card values, cached between data changes"""
+    def compute():
+        if sketches_ready(window):
+            # จำนวนรุ่นที่ไม่ซ้ำและ combo อันดับหนึ่งจาก sketch, rollups อ่านแค่แถว total
+            stats = storage.sketches.fill(load_dashboard_stats(
+                [dim for dim in SUMMARY_DIMENSIONS if dim not in SKETCH_DIMENSIONS], window))
         else:
-            top_cpu = pd.Series([], dtype=float)
-        top_cpu_chart_data = {
-            'data': [{
-                'x': top_cpu.values.tolist()[::-1],
-                'y': top_cpu.index.tolist()[::-1],
-                'type': 'bar',
-                'orientation': 'h',
-                'marker': {'color': '#10b981'}
-            }],
-            'layout': {
-                'title': 'Top 10 CPUs by Avg Score',
-                'xaxis': {'title': 'Average Score'},
-                'yaxis': {'title': 'CPU Model'},
-                'height': 450
-            }
-        }
+            stats = dict(load_dashboard_stats(SUMMARY_DIMENSIONS, window))
+        if storage is not None:
+            stats['tests_last_7d'], stats['tests_prev_7d'] = storage.growth_counts(window)
+        return build_summary(stats)
 
-        # Score histogram
-        score_values = overall_scores
-        score_hist_data = {
-            'data': [{
-                'x': score_values,
-                'type': 'histogram',
-                'marker': {'color': '#f093fb'}
-            }],
-            'layout': {
-                'title': 'Score Distribution',
-                'xaxis': {'title': 'Avg Score'},
-                'yaxis': {'title': 'Frequency'},
-                'height': 400
-            }
-        }
-        
-        return render_template_string(ADMIN_TEMPLATE,
-            demo_mode=(collection is None),
-            error_message=None,
-            total_tests=total_tests,
-            unique_cpus=unique_cpus,
-            unique_gpus=unique_gpus,
-            avg_ram=avg_ram,
-            tests_last_7d=tests_last_7d,
-            growth_7d_pct=growth_7d_pct,
-            avg_score_overall=avg_score_overall,
-            top_combo_label=top_combo_label,
-            cpu_chart_data=json.dumps(cpu_chart_data),
-            gpu_chart_data=json.dumps(gpu_chart_data),
-            ram_pie_data=json.dumps(ram_pie_data),
-            brand_chart_data=json.dumps(brand_chart_data),
-            daily_chart_data=json.dumps(daily_chart_data),
-            mode_chart_data=json.dumps(mode_chart_data),
-            scores_chart_data=json.dumps(scores_chart_data),
-            device_type_chart_data=json.dumps(device_type_chart_data),
-            ram_tier_pie_data=json.dumps(ram_tier_pie_data),
-            brand_heatmap_data=json.dumps(heatmap_data),
-            combo_bar_data=json.dumps(combo_bar_data),
-            top_cpu_chart_data=json.dumps(top_cpu_chart_data),
-            score_hist_data=json.dumps(score_hist_data)
-        )
-        
+    return dashboard_cache.get(('summary', window), compute)
+
+
+def chart_payload(name, window=None):
+    """Plotly JSON of one chart, cached between data changes"""
+    def compute():
+        if name in TOP_K_CHARTS and sketches_ready(window):
+            return chart_json(name, storage.sketches.fill(empty_stats()))
+        return chart_json(name, load_dashboard_stats(CHART_DIMENSIONS[name], window))
+
+    return dashboard_cache.get(('chart', name, window), compute)
+
+
+def admin_context(args):
+    """Template variables of the /admin page for the query parameters `args`"""
+    window_from = args.get('from', '')
+    window_to = args.get('to', '')
+    try:
+        context = dashboard_summary(parse_window(args))
+        if not context['total_tests']:
+            return dict(demo_mode=True,
+                        error_message="No data available or MongoDB connection failed",
+                        window_from=window_from,
+                        window_to=window_to,
+                        **context)
+        return dict(demo_mode=(storage is None),
+                    error_message=None,
+                    window_from=window_from,
+                    window_to=window_to,
+                    **context)
     except Exception as e:
         logger.error(f"Error in admin dashboard: {e}")
-        return render_template_string(ADMIN_TEMPLATE,
-            demo_mode=True,
-            error_message=f"Error loading dashboard: {str(e)}",
-            total_tests=0, unique_cpus=0, unique_gpus=0, avg_ram=0,
-            cpu_chart_data=json.dumps({'data': [], 'layout': {}}),
-            gpu_chart_data=json.dumps({'data': [], 'layout': {}}),
-            ram_pie_data=json.dumps({'data': [], 'layout': {}}),
-            brand_chart_data=json.dumps({'data': [], 'layout': {}}),
-            daily_chart_data=json.dumps({'data': [], 'layout': {}})
-        )
+        return dict(demo_mode=True,
+                    error_message=f"Error loading dashboard: {str(e)}",
+                    window_from=window_from,
+                    window_to=window_to,
+                    **build_summary(empty_stats()))
+
+
+@app.route('/api/charts/<name>', methods=['GET'])
+def chart_data(name):
+    """Plotly JSON for one dashboard chart, loaded lazily by the admin page"""
+    if name not in CHARTS:
+        return jsonify({'status': 'error', 'message': f'Unknown chart: {name}'}), 404
+    try:
+        window = parse_window(request.args)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    try:
+        return Response(chart_payload(name, window), mimetype='application/json')
+    except Exception as e:
+        logger.error(f"Error in chart endpoint ({name}): {e}")
+        return jsonify({'status': 'error', 'message': f'Server error: {str(e)}'}), 500
+
+
+@app.route('/admin', methods=['GET'])
+def admin_dashboard():
+    return render_template_string(ADMIN_TEMPLATE, **admin_context(request.args))
 
 @app.route('/health', methods=['GET'])
 def health_check():
+    mongodb = connection.status()
     try:
-        # Test MongoDB connection if available
-        if collection is not None:
-            client.admin.command('ping')
-            return jsonify({'status': 'ok', 'message': 'Service is healthy'})
+        # Test the storage backend if available
+        if storage is not None:
+            storage.ping()
+            return jsonify({'status': 'ok', 'message': 'Service is healthy', 'storage': storage.name,
+                            'mongodb': mongodb})
+        elif DEMO_FALLBACK:
+            return jsonify({'status': 'ok', 'message': 'Service is healthy (Demo Mode)', 'mongodb': mongodb})
         else:
-            return jsonify({'status': 'ok', 'message': 'Service is healthy (Demo Mode)'})
+            # ยังรับ request ได้ (โหมด degraded) จึงตอบ 200 ให้ health check ของ Render ไม่ restart ระหว่างรอเชื่อมต่อ
+            return jsonify({'status': 'degraded', 'message': f"Waiting for MongoDB ({mongodb['state']})", 'mongodb': mongodb})
     except Exception as e:
         logger.error(f"Health check failed: {e}")
-        return jsonify({'status': 'error', 'message': f'Service unhealthy: {str(e)}'}), 500
+        return jsonify({'status': 'error', 'message': f'Service unhealthy: {str(e)}', 'mongodb': mongodb}), 500
+
+@app.route('/diagnostics', methods=['GET'])
+def diagnostics():
+    """Operational details that are too expensive or noisy for /health"""
+    try:
+        max_pool_size = connection.client_options.get('maxPoolSize')
+        pool = {
+            'pid': os.getpid(),
+            'options': connection.client_options,
+            'metrics': connection.pool_metrics.snapshot(max_pool_size),
+            'budget': connection_budget(max_pool_size),
+        }
+        if storage is None:
+            return jsonify({'status': 'ok', 'message': 'Demo Mode', 'indexes': {}, 'pool': pool})
+        archive = {'archive': storage.archive.status()} if storage.archive is not None else {}
+        backend = storage.hot if storage.archive is not None else storage
+        if not isinstance(backend, MongoStorage):
+            return jsonify({'status': 'ok', 'message': f'Embedded {storage.name} storage', 'storage': backend.status(),
+                            **archive})
+        status = index_status(backend.collection.database)
+        missing = sum(len(indexes['missing']) for indexes in status.values())
+        return jsonify({
+            'status': 'ok' if not missing else 'degraded',
+            'message': 'All indexes present' if not missing else f'{missing} index(es) missing (run: python indexes.py ensure)',
+            'indexes': status,
+            'pool': pool,
+            **archive
+        })
+    except Exception as e:
+        logger.error(f"Diagnostics failed: {e}")
+        return jsonify({'status': 'error', 'message': f'Server error: {str(e)}'}), 500
 
 @app.route('/', methods=['GET'])
 def index():
@@ -1216,9 +1105,12 @@ def index():
         'message': 'System Monitor API',
         'endpoints': {
             'submit': '/submit (POST)',
+            'submit_batch': '/submit/batch (POST)',
             'list': '/list (GET)',
             'admin': '/admin (GET)',
-            'health': '/health (GET)'
+            'charts': '/api/charts/<name> (GET)',
+            'health': '/health (GET)',
+            'diagnostics': '/diagnostics (GET)'
         },
         'version': '1.0.0'
     })
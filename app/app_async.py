@@ -0,0 +1,375 @@
+"""
+Async (ASGI) entry point for high-concurrency ingest.
+
+Serves the same contract as app.py (``/submit``, ``/submit/batch``, ``/list``,
+``/admin``, ``/api/charts/<name>``, ``/health``) with Quart and the Motor
+driver, so one worker keeps thousands of agent check-ins in flight while
+their inserts wait on MongoDB:
+
+    uvicorn app_async:app --host 0.0.0.0 --port $PORT --workers 2
+
+What is shared with app.py (imported, not copied):
+
+* validation (submission.py) and listing parameters (listing.py)
+* the dashboard: summary, charts, template and cache run in a thread
+  against app.py's PyMongo connection (``asyncio.to_thread``)
+* folding new documents into the rollups, daily rollups and sketches
+  (``app._after_insert``), batched by ``RollupFolder`` off the event loop
+
+Requests are answered in degraded/demo mode until app.py's background
+connection is up, exactly like the sync app. Motor uses the same pool
+settings (pool.py). ``WRITE_BEHIND`` does not apply: inserts are awaited.
+With ``STORAGE_BACKEND=sqlite`` there is no Motor client: inserts and
+listings run on app.py's embedded storage in a thread.
+See bench_async.py for the comparison with gunicorn sync workers.
+"""
+
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import BulkWriteError
+from quart import Quart, Response, jsonify, render_template_string, request
+
+import app as sync_app
+from listing import STREAM_BATCH_SIZE, next_cursor, parse_list_args
+from pool import PoolMetrics, client_options, connection_budget
+from queries import parse_window
+from submission import (apply_write_errors, batch_response, build_document, demo_results, parse_batch,
+                        validate_batch)
+
+logger = logging.getLogger(__name__)
+
+FOLD_BATCH_SIZE = 500
+FOLD_INTERVAL = 0.05
+
+app = Quart(__name__)
+motor_client = None
+collection = None
+pool_metrics = PoolMetrics()
+
+
+class RollupFolder:
+    """
+    Collects inserted documents and folds them into the rollups in batches,
+    in a worker thread, so the event loop never waits on the sync stores.
+    """
+
+    def __init__(self, fold, batch_size=FOLD_BATCH_SIZE, flush_interval=FOLD_INTERVAL):
+        self.fold = fold
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending = []
+        self._task = None
+
+    def add(self, docs):
+        self._pending.extend(docs)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while self._pending:
+            # รอสั้น ๆ ให้เอกสารจาก request อื่นมารวม batch เดียวกัน
+            await asyncio.sleep(self.flush_interval)
+            batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+            try:
+                await asyncio.to_thread(self.fold, batch)
+            except Exception as e:
+                logger.error(f"Failed to fold {len(batch)} documents into rollups: {e}")
+
+    async def close(self):
+        if self._task is not None:
+            await self._task
+
+
+folder = RollupFolder(lambda docs: sync_app._after_insert(docs))
+
+
+def _live():
+    """Motor is used once app.py's connection has reached MongoDB"""
+    return collection is not None and sync_app.storage is not None
+
+
+def _embedded():
+    """app.py's storage is a local backend (no Motor client)"""
+    return motor_client is None and sync_app.storage is not None
+
+
+def _unavailable_response():
+    status = sync_app.connection.status()
+    response = jsonify({'status': 'error', 'message': f"Database unavailable ({status['state']}), retry later"})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(max(sync_app.RETRY_AFTER_SECONDS, int(status['next_attempt_in'] or 0)))
+    return response
+
+
+@app.before_serving
+async def _connect():
+    global motor_client, collection
+    if sync_app.STORAGE_BACKEND != 'mongodb':
+        return
+    # สร้าง client ใน process ของ worker (หลัง fork) และใน event loop ที่ใช้งานจริง
+    sync_app.connection.start()
+    motor_client = AsyncIOMotorClient(sync_app.MONGODB_URI,
+                                      serverSelectionTimeoutMS=sync_app.connection.connect_timeout_ms,
+                                      event_listeners=[pool_metrics], **client_options())
+    collection = motor_client["system-monitor"]["process"]
+
+
+@app.after_serving
+async def _disconnect():
+    await folder.close()
+    if motor_client is not None:
+        motor_client.close()
+
+
+@app.route('/submit', methods=['POST'])
+async def submit():
+    try:
+        try:
+            doc = build_document(await request.get_json(force=True, silent=True))
+        except ValueError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+
+        if _live():
+            result = await collection.insert_one(doc)
+            folder.add([doc])
+            return jsonify({
+                'status': 'ok',
+                'message': 'Data saved successfully.',
+                'document_id': str(result.inserted_id)
+            })
+        if _embedded():
+            inserted_id = await asyncio.to_thread(sync_app.storage.insert, doc)
+            folder.add([doc])
+            return jsonify({'status': 'ok', 'message': 'Data saved successfully.', 'document_id': str(inserted_id)})
+        if not sync_app.DEMO_FALLBACK:
+            return _unavailable_response()
+        return jsonify({
+            'status': 'ok',
+            'message': 'Data saved successfully (Demo Mode).',
+            'document_id': 'demo-' + str(hash(str(doc)))
+        })
+
+    except Exception as e:
+        logger.error(f"Error in submit endpoint: {e}")
+        return jsonify({'status': 'error', 'message': f'Server error: {str(e)}'}), 500
+
+
+@app.route('/submit/batch', methods=['POST'])
+async def submit_batch():
+    try:
+        try:
+            records = parse_batch(await request.get_data(), request.content_type)
+        except ValueError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+
+        documents, results = validate_batch(records)
+        stored = _live() or _embedded()
+        if documents and not stored and not sync_app.DEMO_FALLBACK:
+            return _unavailable_response()
+        if documents and _live():
+            write_errors = []
+            try:
+                await collection.insert_many([doc for _, doc in documents], ordered=False)
+            except BulkWriteError as e:
+                write_errors = e.details.get('writeErrors', [])
+            folder.add(apply_write_errors(documents, results, write_errors))
+        elif documents and stored:
+            write_errors = await asyncio.to_thread(sync_app.storage.insert_many, [doc for _, doc in documents])
+            folder.add(apply_write_errors(documents, results, write_errors))
+        else:
+            demo_results(documents, results)
+
+        body = batch_response(results, demo=not stored)
+        logger.info(f"Batch submit: {body['saved']} saved, {body['failed']} rejected")
+        return jsonify(body)
+
+    except Exception as e:
+        logger.error(f"Error in batch submit endpoint: {e}")
+        return jsonify({'status': 'error', 'message': f'Server error: {str(e)}'}), 500
+
+
+@app.route('/list', methods=['GET'])
+async def list_data():
+    stream = request.args.get('format') == 'ndjson'
+    try:
+        params = parse_list_args(request.args, stream=stream)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    try:
+        if _embedded() or (sync_app.storage is not None and sync_app.storage.archive is not None):
+            # storage ในเครื่อง หรือ MongoDB รวมกับ archive: อ่านผ่าน storage ของ app.py ใน thread
+            if stream:
+                return Response(_ndjson_in_thread(sync_app.storage, params), mimetype='application/x-ndjson')
+            results, next_after = await asyncio.to_thread(_find_in_thread, params)
+            response = jsonify(results)
+            if next_after:
+                response.headers['X-Next-Cursor'] = next_after
+            return response
+        if not _live():
+            logger.warning("MongoDB not available, returning empty list")
+            if stream:
+                return Response('', mimetype='application/x-ndjson')
+            return jsonify([])
+
+        cursor = collection.find(params['query'], params['projection'], sort=params['sort'],
+                                 batch_size=STREAM_BATCH_SIZE)
+        if stream:
+            if params['limit']:
+                cursor = cursor.limit(params['limit'])
+            return Response(_ndjson_lines(cursor, params['hidden']), mimetype='application/x-ndjson')
+
+        results = await cursor.limit(params['limit'] + 1).to_list(None)
+        has_more = len(results) > params['limit']
+        results = results[:params['limit']]
+        next_after = next_cursor(results[-1], params['sort'][0][0]) if has_more else None
+        for doc in results:
+            for field in params['hidden']:
+                doc.pop(field, None)
+        response = jsonify(results)
+        if next_after:
+            response.headers['X-Next-Cursor'] = next_after
+        return response
+    except Exception as e:
+        logger.error(f"Error in list endpoint: {e}")
+        return jsonify({'status': 'error', 'message': f'Server error: {str(e)}'}), 500
+
+
+def _find_in_thread(params):
+    """(documents, next cursor) of a /list page through app.py's storage (runs in a thread)"""
+    results = list(sync_app.storage.find(params['query'], params['projection'], params['sort'], params['limit'] + 1))
+    next_after = None
+    if len(results) > params['limit']:
+        results = results[:params['limit']]
+        next_after = next_cursor(results[-1], params['sort'][0][0])
+    for doc in results:
+        for field in params['hidden']:
+            doc.pop(field, None)
+    return results, next_after
+
+
+async def _ndjson_in_thread(storage, params):
+    """NDJSON of a /list stream through a sync storage, read in STREAM_BATCH_SIZE chunks"""
+    loop = asyncio.get_running_loop()
+    # thread เดียวต่อ stream: cursor ของ SQLite ผูกกับ connection ของ thread ที่เปิด
+    executor = ThreadPoolExecutor(max_workers=1)
+    cursor = None
+    try:
+        cursor = await loop.run_in_executor(executor, lambda: storage.find(
+            params['query'], params['projection'], params['sort'], params['limit']))
+        rows = await loop.run_in_executor(executor, iter, cursor)
+        while True:
+            chunk = await loop.run_in_executor(executor, lambda: list(islice(rows, STREAM_BATCH_SIZE)))
+            if not chunk:
+                break
+            for doc in chunk:
+                for field in params['hidden']:
+                    doc.pop(field, None)
+            yield ''.join(app.json.dumps(doc) + '\n' for doc in chunk).encode()
+    finally:
+        if cursor is not None:
+            await loop.run_in_executor(executor, cursor.close)
+        executor.shutdown(wait=False)
+
+
+async def _ndjson_lines(cursor, hidden):
+    try:
+        async for doc in cursor:
+            for field in hidden:
+                doc.pop(field, None)
+            yield (app.json.dumps(doc) + '\n').encode()
+    finally:
+        await cursor.close()
+
+
+@app.route('/api/charts/<name>', methods=['GET'])
+async def chart_data(name):
+    if name not in sync_app.CHARTS:
+        return jsonify({'status': 'error', 'message': f'Unknown chart: {name}'}), 404
+    try:
+        window = parse_window(request.args)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    try:
+        payload = await asyncio.to_thread(sync_app.chart_payload, name, window)
+        return Response(payload, mimetype='application/json')
+    except Exception as e:
+        logger.error(f"Error in chart endpoint ({name}): {e}")
+        return jsonify({'status': 'error', 'message': f'Server error: {str(e)}'}), 500
+
+
+@app.route('/admin', methods=['GET'])
+async def admin_dashboard():
+    context = await asyncio.to_thread(sync_app.admin_context, request.args)
+    return await render_template_string(sync_app.ADMIN_TEMPLATE, **context)
+
+
+@app.route('/health', methods=['GET'])
+async def health_check():
+    mongodb = sync_app.connection.status()
+    try:
+        if _live():
+            await motor_client.admin.command('ping')
+            return jsonify({'status': 'ok', 'message': 'Service is healthy', 'mongodb': mongodb})
+        elif _embedded():
+            await asyncio.to_thread(sync_app.storage.ping)
+            return jsonify({'status': 'ok', 'message': 'Service is healthy', 'storage': sync_app.storage.name,
+                            'mongodb': mongodb})
+        elif sync_app.DEMO_FALLBACK:
+            return jsonify({'status': 'ok', 'message': 'Service is healthy (Demo Mode)', 'mongodb': mongodb})
+        else:
+            return jsonify({'status': 'degraded', 'message': f"Waiting for MongoDB ({mongodb['state']})", 'mongodb': mongodb})
+    except Exception as e:
+        logger.error(f"Health check failed: {e}")
+        return jsonify({'status': 'error', 'message': f'Service unhealthy: {str(e)}', 'mongodb': mongodb}), 500
+
+
+@app.route('/diagnostics', methods=['GET'])
+async def diagnostics():
+    """
+    Connection pools of this worker: Motor, and app.py's PyMongo client that
+    the dashboard uses (indexes: see /diagnostics of app.py or python indexes.py status)
+    """
+    options = client_options()
+    clients = 2 if motor_client is not None else 1
+    return jsonify({
+        'status': 'ok',
+        'message': 'Demo Mode' if not _live() else 'Connected',
+        'pool': {
+            'pid': os.getpid(),
+            'options': options,
+            'metrics': pool_metrics.snapshot(options['maxPoolSize']),
+            'sync_metrics': sync_app.connection.pool_metrics.snapshot(options['maxPoolSize']),
+            'budget': connection_budget(options['maxPoolSize'], clients=clients)
+        }
+    })
+
+
+@app.route('/', methods=['GET'])
+async def index():
+    """Root endpoint with basic info"""
+    return jsonify({
+        'status': 'ok',
+        'message': 'System Monitor API (async)',
+        'endpoints': {
+            'submit': '/submit (POST)',
+            'submit_batch': '/submit/batch (POST)',
+            'list': '/list (GET)',
+            'admin': '/admin (GET)',
+            'charts': '/api/charts/<name> (GET)',
+            'health': '/health (GET)',
+            'diagnostics': '/diagnostics (GET)'
+        },
+        'version': '1.0.0'
+    })
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run(app, host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
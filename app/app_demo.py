@@ -1,15 +1,47 @@
-from flask import Flask, request, jsonify, render_template_string
-from datetime import datetime
+from flask import Flask, Response, request, jsonify, render_template_string, stream_with_context
 import os
+import atexit
 import logging
-import pandas as pd
 import json
-import uuid
+import threading
+from demo_log import StoreLocked, open_store_from_env
+from demo_store import RecordStore
+from listing import LIST_FILTERS
+from submission import parse_batch, validate_batch
 
 app = Flask(__name__)
 
-# Mock data storage (in-memory)
-mock_data = []
+# Mock data storage (in-memory, columnar); DEMO_STORE_CAPACITY keeps only the newest N records
+store = RecordStore(capacity=int(os.environ['DEMO_STORE_CAPACITY']) if os.environ.get('DEMO_STORE_CAPACITY') else None)
+# DEMO_DATA_DIR keeps the records across restarts (demo_log.py)
+DEMO_DATA_DIR = os.environ.get('DEMO_DATA_DIR')
+_persistence_lock = threading.Lock()
+_persistence_opened = False
+
+
+@app.before_request
+def _open_persistence():
+    # เปิดใน process ที่รับ request จริง (ไม่ใช่ process แม่ของ reloader หรือ gunicorn --preload)
+    global store, _persistence_opened
+    if not DEMO_DATA_DIR or _persistence_opened:
+        return
+    with _persistence_lock:
+        if _persistence_opened:
+            return
+        try:
+            store = open_store_from_env(DEMO_DATA_DIR)
+            app.logger.info(f"Restored {len(store)} demo records from {DEMO_DATA_DIR}")
+        except StoreLocked as e:
+            app.logger.warning(f"{e}; demo records of this process are kept in memory only")
+        except Exception as e:
+            app.logger.error(f"Could not open demo store in {DEMO_DATA_DIR}: {e}")
+        _persistence_opened = True
+
+
+@atexit.register
+def _close_persistence():
+    if store.journal is not None:
+        store.journal.close()
 
 # HTML template for admin dashboard
 ADMIN_TEMPLATE = '''
@@ -209,52 +241,104 @@ def submit():
 
         # Prepare document
         doc = {
-            '_id': str(uuid.uuid4()),
             'test_device_type': data['test_device_type'],
             'cpu_brand': data['cpu_brand'],
             'cpu_model': data['cpu_model'],
             'gpu_brand': data['gpu_brand'],
             'gpu_model': data['gpu_model'],
             'ram_gb': data['ram_gb'],
-            'test_details': data.get('test_details'),
-            'created_at': datetime.utcnow()
+            'test_details': data.get('test_details')
         }
 
         # Add to mock data
-        mock_data.append(doc)
-        app.logger.info(f"Successfully added document with ID: {doc['_id']}")
+        try:
+            document_id = store.append(doc)
+        except ValueError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+        app.logger.info(f"Successfully added document with ID: {document_id}")
         
         return jsonify({
             'status': 'ok', 
             'message': 'Data saved successfully (Demo Mode).',
-            'document_id': doc['_id']
+            'document_id': document_id
         })
         
     except Exception as e:
         app.logger.error(f"Error in submit endpoint: {e}")
         return jsonify({'status': 'error', 'message': f'Server error: {str(e)}'}), 500
 
+@app.route('/submit/batch', methods=['POST'])
+def submit_batch():
+    try:
+        try:
+            records = parse_batch(request.get_data(), request.content_type)
+        except ValueError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+
+        documents, results = validate_batch(records)
+        for index, doc in documents:
+            try:
+                results[index] = {'index': index, 'status': 'ok', 'document_id': store.append(doc)}
+            except ValueError as e:
+                results[index] = {'index': index, 'status': 'error', 'message': str(e)}
+
+        saved = sum(1 for result in results if result['status'] == 'ok')
+        app.logger.info(f"Batch submit: {saved} saved, {len(results) - saved} rejected")
+        return jsonify({
+            'status': 'ok' if saved == len(results) else 'partial',
+            'message': f'{saved} of {len(results)} records saved (Demo Mode).',
+            'saved': saved,
+            'failed': len(results) - saved,
+            'results': results
+        })
+
+    except Exception as e:
+        app.logger.error(f"Error in batch submit endpoint: {e}")
+        return jsonify({'status': 'error', 'message': f'Server error: {str(e)}'}), 500
+
 @app.route('/list', methods=['GET'])
 def list_data():
+    """All stored records as a JSON array, optionally filtered (same parameters as app.py) and limited"""
     try:
-        # Return all mock data (without _id for JSON serialization)
-        results = []
-        for doc in mock_data:
-            doc_copy = doc.copy()
-            doc_copy['_id'] = str(doc_copy['_id'])  # Convert ObjectId to string
-            results.append(doc_copy)
-        
-        app.logger.info(f"Retrieved {len(results)} documents")
-        return jsonify(results)
+        filters = {}
+        for param, field in LIST_FILTERS.items():
+            value = request.args.get(param)
+            if value is None:
+                continue
+            if param == 'ram_gb':
+                try:
+                    value = float(value)
+                except ValueError:
+                    return jsonify({'status': 'error', 'message': 'ram_gb must be a number'}), 400
+            filters[param] = value
+        limit = request.args.get('limit')
+        if limit is not None:
+            if not limit.isdigit() or int(limit) < 1:
+                return jsonify({'status': 'error', 'message': 'limit must be a positive integer'}), 400
+            limit = int(limit)
+
+        # สร้าง JSON ทีละรายการจาก store โดยไม่คัดลอกข้อมูลทั้งหมดเป็น list ก่อน
+        def generate():
+            yield '['
+            for i, doc in enumerate(store.iter_docs(filters, limit)):
+                yield (',' if i else '') + app.json.dumps(doc)
+            yield ']\n'
+
+        app.logger.info(f"Listing up to {limit or len(store)} of {len(store)} documents")
+        return Response(stream_with_context(generate()), mimetype='application/json')
     except Exception as e:
         app.logger.error(f"Error in list endpoint: {e}")
         return jsonify({'status': 'error', 'message': f'Server error: {str(e)}'}), 500
 
+def _most_common(counts, n=None):
+    """{value: count} ordered by count, descending (like pandas value_counts())"""
+    return dict(sorted(counts.items(), key=lambda item: item[1], reverse=True)[:n])
+
 @app.route('/admin', methods=['GET'])
 def admin_dashboard():
     try:
         # Check if we have data
-        if not mock_data:
+        if not len(store):
             return render_template_string(ADMIN_TEMPLATE, 
                 total_tests=0, unique_cpus=0, unique_gpus=0, avg_ram=0,
                 cpu_chart_data=json.dumps({'data': [], 'layout': {}}),
@@ -264,21 +348,18 @@ def admin_dashboard():
                 daily_chart_data=json.dumps({'data': [], 'layout': {}})
             )
         
-        # Create DataFrame
-        df = pd.DataFrame(mock_data)
-        
-        # Calculate basic stats
-        total_tests = len(df)
-        unique_cpus = df['cpu_model'].nunique()
-        unique_gpus = df['gpu_model'].nunique()
-        avg_ram = round(df['ram_gb'].mean(), 1)
+        # Calculate basic stats (counts are kept up to date by the store)
+        total_tests = len(store)
+        unique_cpus = store.distinct('cpu_model')
+        unique_gpus = store.distinct('gpu_model')
+        avg_ram = round(store.ram_mean(), 1)
         
         # 1. CPU Model Horizontal Bar Chart
-        cpu_counts = df['cpu_model'].value_counts().head(10)
+        cpu_counts = _most_common(store.value_counts('cpu_model'), 10)
         cpu_chart_data = {
             'data': [{
-                'x': cpu_counts.values.tolist(),
-                'y': cpu_counts.index.tolist(),
+                'x': list(cpu_counts.values()),
+                'y': list(cpu_counts),
                 'type': 'bar',
                 'orientation': 'h',
                 'marker': {'color': '#667eea'}
@@ -292,11 +373,11 @@ def admin_dashboard():
         }
         
         # 2. GPU Model Horizontal Bar Chart
-        gpu_counts = df['gpu_model'].value_counts().head(10)
+        gpu_counts = _most_common(store.value_counts('gpu_model'), 10)
         gpu_chart_data = {
             'data': [{
-                'x': gpu_counts.values.tolist(),
-                'y': gpu_counts.index.tolist(),
+                'x': list(gpu_counts.values()),
+                'y': list(gpu_counts),
                 'type': 'bar',
                 'orientation': 'h',
                 'marker': {'color': '#764ba2'}
@@ -310,11 +391,11 @@ def admin_dashboard():
         }
         
         # 3. RAM Distribution Pie Chart
-        ram_counts = df['ram_gb'].value_counts()
+        ram_counts = _most_common(store.value_counts('ram_gb'))
         ram_pie_data = {
             'data': [{
-                'labels': [f'{ram} GB' for ram in ram_counts.index],
-                'values': ram_counts.values.tolist(),
+                'labels': [f'{ram} GB' for ram in ram_counts],
+                'values': list(ram_counts.values()),
                 'type': 'pie',
                 'hole': 0.4
             }],
@@ -325,21 +406,21 @@ def admin_dashboard():
         }
         
         # 4. CPU vs GPU Brand Distribution
-        cpu_brand_counts = df['cpu_brand'].value_counts()
-        gpu_brand_counts = df['gpu_brand'].value_counts()
+        cpu_brand_counts = _most_common(store.value_counts('cpu_brand'))
+        gpu_brand_counts = _most_common(store.value_counts('gpu_brand'))
         
         brand_chart_data = {
             'data': [
                 {
-                    'x': cpu_brand_counts.index.tolist(),
-                    'y': cpu_brand_counts.values.tolist(),
+                    'x': list(cpu_brand_counts),
+                    'y': list(cpu_brand_counts.values()),
                     'type': 'bar',
                     'name': 'CPU Brand',
                     'marker': {'color': '#667eea'}
                 },
                 {
-                    'x': gpu_brand_counts.index.tolist(),
-                    'y': gpu_brand_counts.values.tolist(),
+                    'x': list(gpu_brand_counts),
+                    'y': list(gpu_brand_counts.values()),
                     'type': 'bar',
                     'name': 'GPU Brand',
                     'marker': {'color': '#764ba2'}
@@ -355,13 +436,12 @@ def admin_dashboard():
         }
         
         # 5. Daily Test Activity Line Chart
-        df['date'] = pd.to_datetime(df['created_at']).dt.date
-        daily_counts = df['date'].value_counts().sort_index()
+        daily_counts = store.day_counts()
         
         daily_chart_data = {
             'data': [{
-                'x': [str(date) for date in daily_counts.index],
-                'y': daily_counts.values.tolist(),
+                'x': [str(date) for date in daily_counts],
+                'y': list(daily_counts.values()),
                 'type': 'scatter',
                 'mode': 'lines+markers',
                 'line': {'color': '#4CAF50', 'width': 3},
@@ -394,7 +474,8 @@ def admin_dashboard():
 @app.route('/health', methods=['GET'])
 def health_check():
     try:
-        return jsonify({'status': 'ok', 'message': 'Service is healthy (Demo Mode)'})
+        return jsonify({'status': 'ok', 'message': 'Service is healthy (Demo Mode)', 'records': len(store),
+                        'persistent': store.journal is not None})
     except Exception as e:
         app.logger.error(f"Health check failed: {e}")
         return jsonify({'status': 'error', 'message': f'Service unhealthy: {str(e)}'}), 500
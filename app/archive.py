@@ -0,0 +1,613 @@
+#!/usr/bin/env python3
+"""
+Columnar archive of old submissions: Parquet files partitioned by day.
+
+``python archive.py run`` moves documents older than ``ARCHIVE_AFTER_DAYS``
+out of the hot store (the ``process`` collection, or the SQLite file with
+STORAGE_BACKEND=sqlite) into ``ARCHIVE_DIR``, in batches of
+``ARCHIVE_BATCH_SIZE``:
+
+    archive/date=2024-06-04/part-<first created_at µs>-<first _id>.parquet
+
+Each batch writes one file per UTC day it touches. Rows keep the dashboard
+fields as typed columns (brands, models, device type and mode
+dictionary-encoded, ``ram_gb`` and ``score`` as doubles, ``created_at`` as
+a UTC timestamp) and the submitted document as JSON (``doc``) for /list.
+A file is written (temp file + rename) before its documents are deleted,
+so an interrupted run rewrites the same file on the next run.
+
+With ARCHIVE_DIR set, app.py serves the hot store and the archive together
+(``ArchivedStorage``): /list merges both in sort order, and the windowed
+dashboard adds the archived tests of the window. Only the ``date=``
+directories inside the requested created_at range are opened (partition
+pruning), files are skipped by the _id/created_at range in their footer,
+and row groups by their column statistics. The all-time dashboard still
+reads the rollups, which keep counting archived documents (so rebuild
+rollups *before* archiving, the rebuild only reads the hot store).
+
+    python archive.py run [--older-than-days 90] [--batch-size 10000]
+    python archive.py status
+    python archive.py compact [--day 2024-06-04]     # one file per day
+
+Needs pyarrow (pip install -r requirements-archive.txt).
+"""
+
+import argparse
+import functools
+import heapq
+import itertools
+import json
+import logging
+import operator
+import os
+import sys
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from bson import ObjectId
+
+from aggregate import CATEGORICAL_FIELDS, Columns, stats_from_columns
+from dashboard import empty_stats, extract_score, merge_stats
+from storage import Storage
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_AFTER_DAYS = 90
+DEFAULT_BATCH_SIZE = 10000
+ROW_GROUP_SIZE = 50000
+
+TIMESTAMP = pa.timestamp('us', tz='UTC')
+DICTIONARY_FIELDS = ['test_device_type', 'cpu_brand', 'cpu_model', 'gpu_brand', 'gpu_model', 'mode']
+SCHEMA = pa.schema([
+    ('_id', pa.string()),
+    ('created_at', TIMESTAMP),
+    *[(field, pa.dictionary(pa.int32(), pa.string())) for field in DICTIONARY_FIELDS],
+    ('ram_gb', pa.float64()),
+    ('score', pa.float64()),
+    ('doc', pa.string()),
+])
+# /list query field -> column
+COLUMNS = {field: field for field in DICTIONARY_FIELDS if field != 'mode'}
+COLUMNS.update({'_id': '_id', 'created_at': 'created_at', 'ram_gb': 'ram_gb', 'test_details.mode': 'mode'})
+STATS_COLUMNS = ['created_at', *DICTIONARY_FIELDS, 'ram_gb', 'score']
+
+_OPERATORS = {'$gt': operator.gt, '$gte': operator.ge, '$lt': operator.lt, '$lte': operator.le}
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_MICROSECOND = timedelta(microseconds=1)
+# sort key of documents without a date: before every dated one, like MongoDB
+_NO_DATE = -2 ** 63
+
+
+def _epoch_us(value):
+    if not isinstance(value, datetime):
+        return None
+    return (value - (_EPOCH if value.tzinfo is None else _EPOCH_UTC)) // _MICROSECOND
+
+
+def _timestamp(value):
+    return pa.scalar(_epoch_us(value), TIMESTAMP)
+
+
+def _text(value):
+    return value if isinstance(value, str) else None
+
+
+def _number(value):
+    if isinstance(value, bool):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if np.isfinite(number) else None
+
+
+def _table(docs):
+    """Arrow table of documents that all have a datetime created_at, sorted by (created_at, _id)"""
+    rows = sorted(((_epoch_us(doc['created_at']), str(doc['_id']), doc) for doc in docs), key=lambda row: row[:2])
+    columns = {'_id': [], 'created_at': [], 'ram_gb': [], 'score': [], 'doc': []}
+    columns.update({field: [] for field in DICTIONARY_FIELDS})
+    for created_us, record_id, doc in rows:
+        details = doc.get('test_details')
+        columns['_id'].append(record_id)
+        columns['created_at'].append(created_us)
+        for field in DICTIONARY_FIELDS[:-1]:
+            columns[field].append(_text(doc.get(field)))
+        columns['mode'].append(_text(details.get('mode')) if isinstance(details, dict) else None)
+        columns['ram_gb'].append(_number(doc.get('ram_gb')))
+        columns['score'].append(extract_score(details) if isinstance(details, dict) else None)
+        body = {key: value for key, value in doc.items() if key not in ('_id', 'created_at')}
+        columns['doc'].append(json.dumps(body, default=str))
+    arrays = []
+    for field in SCHEMA:
+        if pa.types.is_dictionary(field.type):
+            arrays.append(pa.array(columns[field.name], pa.string()).dictionary_encode())
+        elif field.name == 'created_at':
+            arrays.append(pa.array(columns['created_at'], pa.int64()).cast(TIMESTAMP))
+        else:
+            arrays.append(pa.array(columns[field.name], field.type))
+    return pa.Table.from_arrays(arrays, schema=SCHEMA)
+
+
+def _write(table, path):
+    """Write `table` to `path` atomically, with its _id/created_at range in the footer"""
+    ids, created = table['_id'], table['created_at'].cast(pa.int64())
+    metadata = {
+        'archive.min_id': pc.min(ids).as_py(), 'archive.max_id': pc.max(ids).as_py(),
+        'archive.min_created_at': str(pc.min(created).as_py()), 'archive.max_created_at': str(pc.max(created).as_py()),
+    }
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), **metadata})
+    directory, name = os.path.split(path)
+    tmp_path = os.path.join(directory, f'.{name}.tmp')
+    pq.write_table(table, tmp_path, row_group_size=ROW_GROUP_SIZE, use_dictionary=DICTIONARY_FIELDS,
+                   compression='zstd')
+    os.replace(tmp_path, path)
+
+
+def _codes(column, categories_of=None):
+    """(codes, categories) of a dictionary column for aggregate.Columns, -1 for nulls"""
+    array = column.unify_dictionaries().combine_chunks() if column.num_chunks else pa.array([], column.type)
+    codes = array.indices.fill_null(-1).to_numpy(zero_copy_only=False).astype(np.int32)
+    categories = array.dictionary.to_pylist()
+    return codes, categories_of(categories) if categories_of else categories
+
+
+def _ram_categories(values):
+    # ram_gb is stored as a double: 16.0 is counted (and labelled) as 16, like the submitted value
+    return [int(value) if value.is_integer() else value for value in values]
+
+
+def _floats(column):
+    return pc.fill_null(column, np.nan).to_numpy() if len(column) else np.empty(0)
+
+
+def _columns(table):
+    """aggregate.Columns over an archive table (no per-row Python work)"""
+    categorical = {field: _codes(table[field]) for field in CATEGORICAL_FIELDS if field != 'ram_gb'}
+    categorical['ram_gb'] = _codes(pc.dictionary_encode(table['ram_gb']), _ram_categories)
+    codes, categories = _codes(table['mode'])
+    if (codes < 0).any():
+        # test_details missing, free text or without a mode: 'unknown' (dashboard.extract_mode)
+        if 'unknown' not in categories:
+            categories = categories + ['unknown']
+        codes[codes < 0] = categories.index('unknown')
+    created_at = table['created_at'].cast(pa.int64())
+    return Columns(categorical, (codes, categories), _floats(table['ram_gb']), _floats(table['score']),
+                   created_at.to_numpy() if len(created_at) else np.empty(0, dtype=np.int64))
+
+
+def _value(field, value):
+    if field == '_id':
+        return str(value)
+    if field == 'created_at':
+        return _timestamp(value)
+    if field == 'ram_gb':
+        return _number(value)
+    return value
+
+
+def expression(query):
+    """Arrow filter for a /list query (listing.parse_list_args), None for everything"""
+    parts = []
+    for field, condition in query.items():
+        if field in ('$and', '$or'):
+            combined = [expression(part) for part in condition]
+            if field == '$or' and any(part is None for part in combined):
+                continue
+            combined = [part for part in combined if part is not None]
+            if combined:
+                parts.append(functools.reduce(operator.and_ if field == '$and' else operator.or_, combined))
+            continue
+        if field not in COLUMNS:
+            raise ValueError(f'Unsupported filter field: {field}')
+        column = ds.field(COLUMNS[field])
+        if isinstance(condition, dict):
+            for op, value in condition.items():
+                if op not in _OPERATORS:
+                    raise ValueError(f'Unsupported filter operator: {op}')
+                parts.append(_OPERATORS[op](column, _value(field, value)))
+        else:
+            parts.append(column == _value(field, condition))
+    return functools.reduce(operator.and_, parts) if parts else None
+
+
+def _bound(query, field, low):
+    """
+    Lowest (or highest) `field` value a /list query can match, None when
+    unbounded: epoch µs for created_at, hex for _id. Only used to skip
+    partitions and files, so it may be loose.
+    """
+    bounds = []
+    for key, condition in query.items():
+        if key == '$and':
+            bounds += [_bound(part, field, low) for part in condition]
+        elif key == '$or':
+            branches = [_bound(part, field, low) for part in condition]
+            if branches and None not in branches:
+                bounds.append(min(branches) if low else max(branches))
+        elif key == field:
+            values = ([value for op, value in condition.items() if op in (('$gt', '$gte') if low else ('$lt', '$lte'))]
+                      if isinstance(condition, dict) else [condition])
+            bounds += [_epoch_us(value) if field == 'created_at' else str(value) for value in values]
+    bounds = [value for value in bounds if value is not None]
+    if not bounds:
+        return None
+    return max(bounds) if low else min(bounds)
+
+
+def sort_key(sort):
+    """Key of a document in a /list order ([('_id', 1)] or [('created_at', 1), ('_id', 1)])"""
+    if any(direction != 1 for _, direction in sort):
+        raise ValueError('The archive only serves ascending orders')
+    if [field for field, _ in sort] == ['_id']:
+        return lambda doc: str(doc['_id'])
+
+    def key(doc):
+        created_us = _epoch_us(doc.get('created_at'))
+        return (_NO_DATE if created_us is None else created_us), str(doc['_id'])
+    return key
+
+
+def _merge_runs(runs, key):
+    """
+    Merge sorted runs given as (lowest key, load) in key order. A run is
+    only loaded once the merge reaches its lowest key, so a limited page
+    opens the first few files only.
+    """
+    runs = sorted(runs, key=lambda run: run[0])
+    heap = []
+    tiebreak = itertools.count()
+    opened = 0
+    while opened < len(runs) or heap:
+        while opened < len(runs) and (not heap or runs[opened][0] <= heap[0][0]):
+            items = iter(runs[opened][1]())
+            opened += 1
+            item = next(items, None)
+            if item is not None:
+                heapq.heappush(heap, (key(item), next(tiebreak), item, items))
+        if not heap:
+            continue
+        _, _, item, items = heapq.heappop(heap)
+        yield item
+        following = next(items, None)
+        if following is not None:
+            heapq.heappush(heap, (key(following), next(tiebreak), following, items))
+
+
+def _partition_files(directory):
+    # ไฟล์ชั่วคราวขึ้นต้นด้วย '.' จนกว่าจะเขียนเสร็จ
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if name.endswith('.parquet') and not name.startswith('.'))
+
+
+class Archive:
+    """Date-partitioned Parquet files under `root`"""
+
+    def __init__(self, root):
+        self.root = root
+        # path -> footer range; archive files are never modified in place (new names, then removal)
+        self._ranges = {}
+
+    # -- layout ---------------------------------------------------------------------------
+
+    def partitions(self, start=None, end=None):
+        """[(day, directory)] of the date=YYYY-MM-DD partitions between epoch µs `start` and `end` (inclusive)"""
+        first = (_EPOCH + start * _MICROSECOND).date() if start is not None else None
+        last = (_EPOCH + end * _MICROSECOND).date() if end is not None else None
+        try:
+            entries = list(os.scandir(self.root))
+        except FileNotFoundError:
+            return []
+        partitions = []
+        for entry in entries:
+            if not entry.is_dir() or not entry.name.startswith('date='):
+                continue
+            try:
+                day = date.fromisoformat(entry.name[len('date='):])
+            except ValueError:
+                continue
+            if (first is None or day >= first) and (last is None or day <= last):
+                partitions.append((day, entry.path))
+        return sorted(partitions)
+
+    def files(self, start=None, end=None):
+        """Parquet files of the partitions between `start` and `end` (epoch µs), oldest day first"""
+        files = []
+        for _, directory in self.partitions(start, end):
+            files += _partition_files(directory)
+        return files
+
+    def _range(self, path):
+        """(rows, min _id, max _id, min created_at, max created_at) from the file footer"""
+        if path not in self._ranges:
+            metadata = pq.read_metadata(path)
+            meta = {key.decode(): value.decode() for key, value in (metadata.metadata or {}).items()}
+            self._ranges[path] = (metadata.num_rows, meta['archive.min_id'], meta['archive.max_id'],
+                                  int(meta['archive.min_created_at']), int(meta['archive.max_created_at']))
+        return self._ranges[path]
+
+    def _dataset(self, files):
+        return ds.dataset(files, schema=SCHEMA, format='parquet')
+
+    # -- writes ---------------------------------------------------------------------------
+
+    def write(self, docs):
+        """Store documents (each with a datetime created_at) as one file per UTC day; returns the paths"""
+        days = {}
+        for doc in docs:
+            created_at = doc['created_at']
+            if created_at.tzinfo is not None:
+                created_at = created_at.astimezone(timezone.utc)
+            days.setdefault(created_at.date(), []).append(doc)
+        paths = []
+        for day, day_docs in sorted(days.items()):
+            table = _table(day_docs)
+            directory = os.path.join(self.root, f'date={day.isoformat()}')
+            os.makedirs(directory, exist_ok=True)
+            first_us = table['created_at'].cast(pa.int64())[0].as_py()
+            path = os.path.join(directory, f'part-{first_us:017d}-{table["_id"][0].as_py()}.parquet')
+            _write(table, path)
+            paths.append(path)
+        return paths
+
+    def compact(self, day=None):
+        """Rewrite every partition (or the one of `day`) that has several files as one file; returns days compacted"""
+        compacted = []
+        for partition_day, directory in self.partitions():
+            if day is not None and partition_day != day:
+                continue
+            files = _partition_files(directory)
+            if len(files) < 2:
+                continue
+            table = self._dataset(files).to_table().sort_by([('created_at', 'ascending'), ('_id', 'ascending')])
+            first_us = table['created_at'].cast(pa.int64())[0].as_py()
+            path = os.path.join(directory, f'part-{first_us:017d}-{table["_id"][0].as_py()}.parquet')
+            _write(table.combine_chunks(), path)
+            for old in files:
+                if old != path:
+                    os.remove(old)
+                self._ranges.pop(old, None)
+            compacted.append(partition_day)
+            logger.info(f"Compacted {len(files)} files of {partition_day} ({table.num_rows} rows)")
+        return compacted
+
+    # -- reads ----------------------------------------------------------------------------
+
+    def find(self, query, projection=None, sort=None, limit=None):
+        """Archived documents matching a /list query, in `sort` order"""
+        sort = sort or [('_id', 1)]
+        key = sort_key(sort)
+        created_low, created_high = _bound(query, 'created_at', True), _bound(query, 'created_at', False)
+        id_low = _bound(query, '_id', True)
+        by_id = sort[0][0] == '_id'
+        fields = set(projection) | {'_id'} if projection else None
+        condition = expression(query)
+
+        runs = []
+        for path in self.files(created_low, created_high):
+            _, min_id, max_id, min_created, max_created = self._range(path)
+            if ((created_low is not None and max_created < created_low)
+                    or (created_high is not None and min_created > created_high)
+                    or (id_low is not None and max_id < id_low)):
+                continue
+            runs.append((min_id if by_id else (min_created, min_id),
+                         functools.partial(self._read_sorted, path, condition, sort, fields)))
+        documents = _merge_runs(runs, key)
+        return itertools.islice(documents, limit) if limit else documents
+
+    def _read_sorted(self, path, condition, sort, fields):
+        table = self._dataset([path]).to_table(columns=['_id', 'created_at', 'doc'], filter=condition)
+        table = table.sort_by([(field, 'ascending') for field, _ in sort])
+        created = table['created_at'].cast(pa.int64()).to_pylist()
+        for record_id, created_us, body in zip(table['_id'].to_pylist(), created, table['doc'].to_pylist()):
+            doc = {'_id': ObjectId(record_id) if ObjectId.is_valid(record_id) else record_id, **json.loads(body),
+                   'created_at': _EPOCH + created_us * _MICROSECOND}
+            yield {key: value for key, value in doc.items() if key in fields} if fields else doc
+
+    def stats(self, window=None):
+        """Dashboard stats dict of the archived tests in a created_at window"""
+        start, end = window or (None, None)
+        files = self.files(_epoch_us(start), _epoch_us(end))
+        if not files:
+            return empty_stats()
+        condition = expression({'created_at': {key: value for key, value in (('$gte', start), ('$lt', end))
+                                               if value is not None}})
+        table = self._dataset(files).to_table(columns=STATS_COLUMNS, filter=condition)
+        return stats_from_columns(_columns(table))
+
+    def newest(self, window=None):
+        start, end = window or (None, None)
+        condition = expression({'created_at': {key: value for key, value in (('$gte', start), ('$lt', end))
+                                               if value is not None}})
+        # ย้อนจากวันล่าสุด: วันแรกที่มีข้อมูลในช่วงคือคำตอบ
+        for _, directory in reversed(self.partitions(_epoch_us(start), _epoch_us(end))):
+            files = _partition_files(directory)
+            if not files:
+                continue
+            newest = pc.max(self._dataset(files).to_table(columns=['created_at'], filter=condition)['created_at'])
+            if newest.is_valid:
+                return _EPOCH_UTC + newest.cast(pa.int64()).as_py() * _MICROSECOND
+        return None
+
+    def growth_counts(self, window=None, anchor=None):
+        """Archived part of queries.growth_counts for the same anchor"""
+        if anchor is None:
+            anchor = self.newest(window)
+        if anchor is None:
+            return 0, 0
+        start = window[0] if window is not None else None
+
+        def count(after, until):
+            bounds = {'$gt': after, '$lte': until}
+            if start is not None and start > after:
+                bounds = {'$gte': start, '$lte': until}
+            files = self.files(_epoch_us(min(bounds.values())), _epoch_us(until))
+            return self._dataset(files).count_rows(filter=expression({'created_at': bounds})) if files else 0
+
+        last_start = anchor - timedelta(days=7)
+        return count(last_start, anchor), count(anchor - timedelta(days=14), last_start)
+
+    def status(self):
+        partitions = self.partitions()
+        files = self.files()
+        return {
+            'path': os.path.abspath(self.root),
+            'partitions': len(partitions),
+            'files': len(files),
+            'documents': sum(self._range(path)[0] for path in files),
+            'size_bytes': sum(os.path.getsize(path) for path in files),
+            'first_day': partitions[0][0].isoformat() if partitions else None,
+            'last_day': partitions[-1][0].isoformat() if partitions else None,
+        }
+
+
+class ArchivedStorage(Storage):
+    """A hot storage backend and the archive, queried together"""
+
+    def __init__(self, hot, archive):
+        self.hot = hot
+        self.archive = archive
+        self.name = hot.name
+        self.sketches = hot.sketches
+
+    def insert(self, doc):
+        return self.hot.insert(doc)
+
+    def insert_many(self, docs):
+        return self.hot.insert_many(docs)
+
+    def after_insert(self, docs):
+        self.hot.after_insert(docs)
+
+    def delete(self, ids):
+        return self.hot.delete(ids)
+
+    def find(self, query, projection=None, sort=None, limit=None):
+        sort = sort or [('_id', 1)]
+        key = sort_key(sort)
+        hot = self.hot.find(query, projection, sort, limit)
+        return _MergedCursor(heapq.merge(self.archive.find(query, projection, sort, limit), hot, key=key),
+                             limit, hot)
+
+    def stats(self, dims=None, window=None):
+        stats = self.hot.stats(dims, window)
+        if self.hot.stats_include_removed(window):
+            return stats
+        return merge_stats(stats, self.archive.stats(window))
+
+    def stats_include_removed(self, window=None):
+        return self.hot.stats_include_removed(window)
+
+    def newest(self, window=None):
+        newest = [value for value in (self.hot.newest(window), self.archive.newest(window)) if value is not None]
+        return max(newest) if newest else None
+
+    def growth_counts(self, window=None, anchor=None):
+        if anchor is None:
+            anchor = self.newest(window)
+        if anchor is None:
+            return 0, 0
+        hot_last, hot_prev = self.hot.growth_counts(window, anchor)
+        archived_last, archived_prev = self.archive.growth_counts(window, anchor)
+        return hot_last + archived_last, hot_prev + archived_prev
+
+    def ping(self):
+        self.hot.ping()
+
+    def close(self):
+        self.hot.close()
+
+
+class _MergedCursor:
+    """Hot and archived documents in one order; a document archived mid-request is returned once"""
+
+    def __init__(self, documents, limit, hot):
+        self._documents = documents
+        self._limit = limit
+        self._hot = hot
+
+    def __iter__(self):
+        returned = 0
+        last_id = None
+        for doc in self._documents:
+            if doc['_id'] == last_id:
+                continue
+            last_id = doc['_id']
+            yield doc
+            returned += 1
+            if self._limit and returned >= self._limit:
+                return
+
+    def close(self):
+        self._hot.close()
+
+
+def archive_older_than(storage, archive, cutoff, batch_size=DEFAULT_BATCH_SIZE):
+    """Move the documents created before `cutoff` from `storage` into `archive`; returns how many moved"""
+    moved = 0
+    while True:
+        docs = list(storage.find({'created_at': {'$lt': cutoff}}, sort=[('created_at', 1), ('_id', 1)],
+                                 limit=batch_size))
+        if not docs:
+            return moved
+        archive.write(docs)
+        # ลบหลังเขียนไฟล์สำเร็จเท่านั้น: ถ้าหยุดกลางทาง รอบถัดไปเขียนไฟล์ชื่อเดิมทับ
+        storage.delete([doc['_id'] for doc in docs])
+        moved += len(docs)
+        logger.info(f"Archived {moved} documents (up to {docs[-1]['created_at'].isoformat()})")
+
+
+def hot_storage_from_env(environ=os.environ):
+    """The hot store of STORAGE_BACKEND, without the archive"""
+    from storage import MongoStorage, backend_from_env, embedded_storage_from_env
+
+    if backend_from_env(environ) != 'mongodb':
+        return embedded_storage_from_env(environ)
+    from pymongo import MongoClient
+
+    client = MongoClient(environ.get('MONGODB_URI', 'mongodb://localhost:27017'))
+    return MongoStorage(client["system-monitor"]["process"])
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Move old submissions into the Parquet archive')
+    parser.add_argument('command', choices=['run', 'status', 'compact'])
+    parser.add_argument('--dir', default=os.environ.get('ARCHIVE_DIR', 'archive'), help='archive directory')
+    parser.add_argument('--older-than-days', type=float,
+                        default=float(os.environ.get('ARCHIVE_AFTER_DAYS', DEFAULT_AFTER_DAYS)))
+    parser.add_argument('--batch-size', type=int,
+                        default=int(os.environ.get('ARCHIVE_BATCH_SIZE', DEFAULT_BATCH_SIZE)))
+    parser.add_argument('--day', type=date.fromisoformat, help='compact: only this day')
+    args = parser.parse_args(argv[1:])
+
+    logging.basicConfig(level=logging.INFO)
+    archive = Archive(args.dir)
+    if args.command == 'status':
+        print(json.dumps(archive.status(), indent=2))
+        return 0
+    if args.command == 'compact':
+        days = archive.compact(args.day)
+        print(f"✅ Compacted {len(days)} day(s)")
+        return 0
+
+    if os.environ.get('RETENTION_DAYS'):
+        # retention.py พับวันเก่าเข้า history แล้ว: archive วันเดียวกันจะนับซ้ำ
+        print("RETENTION_DAYS and ARCHIVE_DIR are exclusive: old days are either archived or folded")
+        return 2
+    storage = hot_storage_from_env()
+    cutoff = datetime.now(timezone.utc) - timedelta(days=args.older_than_days)
+    try:
+        moved = archive_older_than(storage, archive, cutoff, args.batch_size)
+    finally:
+        storage.close()
+    print(f"✅ Archived {moved} documents created before {cutoff.isoformat()}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Hot store only vs. hot store + Parquet archive (archive.py).
+
+The same synthetic records (spread over `days` days) are stored twice in
+SQLite (storage backend ``sqlite``): once all in the hot table, once with
+everything older than 7 days moved into the archive. It then times the
+dashboard stats for a long window (all days) and the last 7 days, the
+growth counts, and the first /list page in created_at order (which comes
+from the archive).
+
+    python bench_archive.py                 # 200k records over 365 days
+    python bench_archive.py 1000000 730
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from archive import Archive, ArchivedStorage, archive_older_than
+from listing import parse_list_args
+from sqlite_storage import SQLiteStorage
+from synthetic import generate_records
+
+DEFAULT_RECORDS = 200_000
+DEFAULT_DAYS = 365
+HOT_DAYS = 7
+
+
+def timed(fn, repeat=3):
+    """Best of `repeat` runs in milliseconds"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+
+def measure(storage, days):
+    now = datetime.now(timezone.utc)
+    long_window = (now - timedelta(days=days + 1), None)
+    week = (now - timedelta(days=HOT_DAYS), None)
+    params = parse_list_args({'sort': 'created_at', 'limit': '1000'})
+    return {
+        f'stats {days}d (ms)': timed(lambda: storage.stats(window=long_window)),
+        f'stats {HOT_DAYS}d (ms)': timed(lambda: storage.stats(window=week)),
+        'growth (ms)': timed(storage.growth_counts),
+        'list page (ms)': timed(lambda: list(storage.find(params['query'], params['projection'],
+                                                          params['sort'], params['limit']))),
+    }
+
+
+def main(n, days):
+    records = list(generate_records(n, days=days))
+    directory = tempfile.mkdtemp(prefix='bench-archive-')
+    try:
+        everything = SQLiteStorage(os.path.join(directory, 'all.db'))
+        everything.insert_many([dict(record) for record in records])
+        hot = SQLiteStorage(os.path.join(directory, 'hot.db'))
+        hot.insert_many([dict(record) for record in records])
+        archive = Archive(os.path.join(directory, 'archive'))
+        start = time.perf_counter()
+        moved = archive_older_than(hot, archive, datetime.now(timezone.utc) - timedelta(days=HOT_DAYS))
+        archive_s = time.perf_counter() - start
+        archive.compact()
+        status = archive.status()
+        print(f"{n} records over {days} days; archived {moved} in {archive_s:.1f} s "
+              f"({moved / archive_s:.0f} rec/s), {status['partitions']} partitions, "
+              f"{status['size_bytes'] / 2 ** 20:.1f} MB Parquet vs {os.path.getsize(everything.path) / 2 ** 20:.1f} MB SQLite")
+
+        rows = [('hot only', measure(everything, days)), ('hot + archive', measure(ArchivedStorage(hot, archive), days))]
+        print(f"{'':>18}" + ''.join(f'{name:>15}' for name, _ in rows))
+        for metric in rows[0][1]:
+            print(f'{metric:>18}' + ''.join(f'{results[metric]:>15.1f}' for _, results in rows))
+        everything.close()
+        hot.close()
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_RECORDS,
+         int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_DAYS)
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+/submit under many concurrent agents: gunicorn sync workers (app.py) vs.
+uvicorn async workers (app_async.py), with the same number of workers.
+
+Each server runs as its usual CLI in a child process; an aiohttp driver
+keeps ``--clients`` connections posting records for ``--seconds`` and
+reports throughput and latency percentiles. With MONGODB_URI the apps
+write to that database. Without it every worker writes to its own
+mongomock store behind a simulated ``--latency-ms`` round trip (blocking
+sleep for the sync app, ``asyncio.sleep`` for the async one), which is
+what separates the two serving models.
+
+    python bench_async.py --clients 1000 --seconds 10 --workers 2 --latency-ms 5
+
+Needs the packages in requirements-async.txt.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from bench_ingest import BENCH_DB, SlowCollection
+
+SERVERS = {
+    'sync': lambda port, workers: ['gunicorn', 'bench_async:make_sync_app()', '--bind', f'127.0.0.1:{port}',
+                                   '--workers', str(workers), '--backlog', '4096', '--log-level', 'error'],
+    'async': lambda port, workers: ['uvicorn', 'bench_async:make_async_app', '--factory', '--host', '127.0.0.1',
+                                    '--port', str(port), '--workers', str(workers), '--backlog', '4096',
+                                    '--log-level', 'error'],
+}
+
+
+class AsyncSlowCollection:
+    """mongomock collection behind an awaitable, non-blocking simulated round trip"""
+
+    def __init__(self, collection, latency):
+        self._collection = collection
+        self._latency = latency
+
+    async def insert_one(self, doc):
+        await asyncio.sleep(self._latency)
+        return self._collection.insert_one(doc)
+
+    async def insert_many(self, docs, ordered=True):
+        await asyncio.sleep(self._latency)
+        return self._collection.insert_many(docs, ordered=ordered)
+
+
+def _simulated_stores(appmod):
+    """Point app.py at a per-worker mongomock database with the simulated latency"""
+    import mongomock
+    from daily import DailyRollupStore
+    from rollups import RollupStore
+    from sketches import SketchStore
+    from storage import MongoStorage
+
+    latency = float(os.environ['BENCH_LATENCY_MS']) / 1000.0
+    db = mongomock.MongoClient()[BENCH_DB]
+    appmod.connection.close()
+    appmod.storage = MongoStorage(SlowCollection(db['process'], latency),
+                                  rollups=RollupStore(SlowCollection(db['rollups'], latency)),
+                                  daily_rollups=DailyRollupStore(SlowCollection(db['daily_rollups'], latency)),
+                                  sketches=SketchStore(db['sketches']))
+    return db, latency
+
+
+def _quiet():
+    import logging
+    logging.getLogger().setLevel(logging.ERROR)
+
+
+def make_sync_app():
+    """gunicorn factory, runs in each worker"""
+    import app as appmod
+
+    _quiet()
+    if 'BENCH_LATENCY_MS' in os.environ:
+        _simulated_stores(appmod)
+    return appmod.app
+
+
+def make_async_app():
+    """uvicorn factory, runs in each worker"""
+    import app as appmod
+    import app_async
+
+    _quiet()
+    if 'BENCH_LATENCY_MS' in os.environ:
+        db, latency = _simulated_stores(appmod)
+
+        @app_async.app.before_serving
+        async def _simulated_collection():
+            # registered after app_async's own hook, so it replaces the Motor collection
+            app_async.collection = AsyncSlowCollection(db['process'], latency)
+
+    return app_async.app
+
+
+async def _drive(port, clients, seconds):
+    import aiohttp
+    from synthetic import generate_records
+
+    records = list(generate_records(1000))
+    for record in records:
+        record.pop('created_at')
+    url = f'http://127.0.0.1:{port}/submit'
+    latencies = []
+    statuses = {}
+    in_window = [0]
+    connector = aiohttp.TCPConnector(limit=0)
+    timeout = aiohttp.ClientTimeout(total=120)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        deadline = time.monotonic() + seconds
+
+        async def client(offset):
+            i = offset
+            while time.monotonic() < deadline:
+                start = time.perf_counter()
+                try:
+                    async with session.post(url, json=records[i % len(records)]) as response:
+                        await response.read()
+                        status = response.status
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    status = 'error'
+                latencies.append(time.perf_counter() - start)
+                statuses[status] = statuses.get(status, 0) + 1
+                if status == 200 and time.monotonic() <= deadline:
+                    in_window[0] += 1
+                i += 1
+
+        await asyncio.gather(*(client(offset) for offset in range(clients)))
+    # throughput counts what finished in the window; latencies also cover the requests drained after it
+    return latencies, statuses, in_window[0] / seconds
+
+
+def _percentile(values, q):
+    return statistics.quantiles(values, n=100)[q - 1] if len(values) > 1 else (values[0] if values else 0.0)
+
+
+def _wait_ready(port, child, timeout=30):
+    import requests
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if child.poll() is not None:
+            raise RuntimeError(f'server exited with {child.returncode}')
+        try:
+            requests.get(f'http://127.0.0.1:{port}/', timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError('server did not start')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--latency-ms', type=float, default=5)
+    parser.add_argument('--port', type=int, default=5098)
+    parser.add_argument('--modes', default='sync,async')
+    args = parser.parse_args()
+
+    env = dict(os.environ, WRITE_BEHIND='0', ENSURE_INDEXES='0')
+    if not os.environ.get('MONGODB_URI'):
+        env.update(MONGODB_URI='mongodb://127.0.0.1:1', BENCH_LATENCY_MS=str(args.latency_ms))
+    cwd = os.path.dirname(os.path.abspath(__file__))
+
+    print(f"{args.clients} clients, {args.workers} workers, {args.seconds:.0f}s"
+          + ('' if os.environ.get('MONGODB_URI') else f", simulated {args.latency_ms:g} ms write latency"))
+    print(f"{'server':>6} {'req/s':>8} {'ok':>8} {'non-200':>8} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9}")
+    for mode in args.modes.split(','):
+        child = subprocess.Popen(SERVERS[mode](args.port, args.workers), cwd=cwd, env=env)
+        try:
+            _wait_ready(args.port, child)
+            latencies, statuses, throughput = asyncio.run(_drive(args.port, args.clients, args.seconds))
+        finally:
+            child.terminate()
+            child.wait()
+        ok = statuses.get(200, 0)
+        failed = sum(statuses.values()) - ok
+        ms = sorted(latency * 1000 for latency in latencies)
+        print(f"{mode:>6} {throughput:>8.0f} {ok:>8} {failed:>8} {_percentile(ms, 50):>9.1f} "
+              f"{_percentile(ms, 95):>9.1f} {_percentile(ms, 99):>9.1f}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark test_details extraction for the admin dashboard:
+the original four df.iterrows() loops vs. a single pass that flattens
+test_details into typed mode/score columns (the pandas path the dashboard
+used before aggregate.py; see bench_engine.py for the current engine).
+pandas comes from requirements-analysis.txt.
+
+    python bench_dashboard.py                  # 10k, 100k, 1M rows
+    python bench_dashboard.py 10000 100000     # custom sizes
+"""
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from synthetic import generate_records
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+
+def legacy_extract(df):
+    """The four row loops admin_dashboard() used before normalize_details()"""
+    modes = []
+    for _, row in df.iterrows():
+        if isinstance(row['test_details'], dict) and 'mode' in row['test_details']:
+            modes.append(row['test_details']['mode'])
+        else:
+            modes.append('unknown')
+    mode_counts = pd.Series(modes).value_counts()
+
+    scores_data = []
+    for _, row in df.iterrows():
+        if isinstance(row['test_details'], dict) and 'avg_score' in row['test_details']:
+            scores_data.append({'mode': row['test_details'].get('mode', 'unknown'),
+                                'score': row['test_details']['avg_score']})
+    avg_scores = pd.DataFrame(scores_data).groupby('mode')['score'].mean()
+
+    overall_scores = []
+    for _, row in df.iterrows():
+        if isinstance(row['test_details'], dict) and 'avg_score' in row['test_details']:
+            try:
+                overall_scores.append(float(row['test_details']['avg_score']))
+            except Exception:
+                pass
+
+    cpu_scores = []
+    for _, row in df.iterrows():
+        if isinstance(row['test_details'], dict) and 'avg_score' in row['test_details']:
+            try:
+                cpu_scores.append({'cpu_model': row.get('cpu_model', 'Unknown'),
+                                   'avg_score': float(row['test_details']['avg_score'])})
+            except Exception:
+                pass
+    top_cpu = pd.DataFrame(cpu_scores).groupby('cpu_model')['avg_score'].mean()
+    return mode_counts, avg_scores, overall_scores, top_cpu
+
+
+def normalize_details(df):
+    """Flatten test_details into ``mode`` (object) and ``score`` (float64, NaN when absent or invalid)"""
+    details = [d if isinstance(d, dict) else {} for d in df['test_details']]
+    df['mode'] = pd.Series([d.get('mode', 'unknown') for d in details], index=df.index, dtype=object)
+    scores = pd.to_numeric(pd.Series([d.get('avg_score') for d in details], index=df.index, dtype=object),
+                           errors='coerce').astype(float)
+    df['score'] = scores.where(np.isfinite(scores))
+    return df
+
+
+def vectorized_extract(df):
+    """The same results from the normalized mode/score columns"""
+    normalize_details(df)
+    mode_counts = df['mode'].value_counts()
+    scored = df[df['score'].notna()]
+    avg_scores = scored.groupby('mode')['score'].mean()
+    top_cpu = scored.groupby('cpu_model')['score'].mean()
+    return mode_counts, avg_scores, scored['score'], top_cpu
+
+
+def timed(fn, df):
+    start = time.perf_counter()
+    result = fn(df)
+    return time.perf_counter() - start, result
+
+
+def main(sizes):
+    print(f"{'rows':>10} {'iterrows (s)':>14} {'normalized (s)':>15} {'speedup':>9}")
+    for n in sizes:
+        df = pd.DataFrame(list(generate_records(n)))
+        legacy_s, legacy = timed(legacy_extract, df.copy())
+        fast_s, fast = timed(vectorized_extract, df.copy())
+        assert legacy[0].sort_index().equals(fast[0].sort_index()), 'mode counts differ'
+        assert len(legacy[2]) == len(fast[2]), 'score counts differ'
+        print(f"{n:>10} {legacy_s:>14.3f} {fast_s:>15.3f} {legacy_s / fast_s:>8.0f}x")
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Dashboard aggregation engine: the previous pandas path vs. aggregate.py.
+
+Each path runs in its own process and reports
+* import time of what the path needs (pandas + numpy vs. numpy only),
+* RSS after import and peak RSS while aggregating,
+* median latency of one stats computation over N documents
+  (``stats_from_documents``, the path /admin takes without rollups).
+pandas comes from requirements-analysis.txt.
+
+    python bench_engine.py                 # 10k and 100k documents
+    python bench_engine.py 1000 50000      # custom sizes
+"""
+
+import json
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+DEFAULT_SIZES = [10_000, 100_000]
+REPEATS = 5
+
+
+def legacy_stats(data):
+    """The pandas implementation dashboard.py used before aggregate.py"""
+    import numpy as np
+    import pandas as pd
+
+    from dashboard import SCORE_DIMENSIONS, combo_label, empty_stats
+
+    def value_counts(series, missing=None):
+        counts = series.value_counts(dropna=missing is None)
+        return {(missing if pd.isna(key) else key): int(count) for key, count in counts.items() if count}
+
+    stats = empty_stats()
+    df = pd.DataFrame(data)
+    df['created_at'] = pd.to_datetime(df['created_at'])
+    details = [d if isinstance(d, dict) else {} for d in df['test_details']]
+    df['mode'] = pd.Series([d.get('mode', 'unknown') for d in details], index=df.index, dtype=object)
+    scores = pd.to_numeric(pd.Series([d.get('avg_score') for d in details], index=df.index, dtype=object),
+                           errors='coerce').astype(float)
+    df['score'] = scores.where(np.isfinite(scores))
+
+    counts = stats['counts']
+    stats['total'] = len(df)
+    ram = pd.to_numeric(df['ram_gb'], errors='coerce')
+    stats['ram_sum'], stats['ram_count'] = float(ram.sum()), int(ram.count())
+    for dim in ('cpu_model', 'gpu_model', 'cpu_brand', 'gpu_brand', 'ram_gb'):
+        counts[dim] = value_counts(df[dim])
+    counts['device_type'] = value_counts(df['test_device_type'], missing='unknown')
+    counts['day'] = {str(day.date()): int(n) for day, n in df['created_at'].dt.floor('D').value_counts().items()}
+    for (cpu, gpu), n in df.groupby(['cpu_model', 'gpu_model'], dropna=False).size().items():
+        label = combo_label(cpu, gpu)
+        counts['combo'][label] = counts['combo'].get(label, 0) + int(n)
+    brand_pairs = df.dropna(subset=['test_device_type']).groupby(['cpu_brand', 'gpu_brand']).size()
+    counts['brand_pair'] = {pair: int(n) for pair, n in brand_pairs.items() if n}
+    counts['mode'] = value_counts(df['mode'])
+    scored = df[df['score'].notna()]
+    bins = np.floor(scored['score']).astype(int)
+    for dim in SCORE_DIMENSIONS:
+        grouped = scored.groupby(dim)['score'].agg(['sum', 'count'])
+        stats['score_sums'][dim] = {key: [float(total), int(count)]
+                                    for key, total, count in zip(grouped.index, grouped['sum'], grouped['count'])}
+        for (key, bucket), n in scored.groupby([scored[dim], bins]).size().items():
+            stats['score_hists'][dim].setdefault(key, {})[int(bucket)] = int(n)
+    stats['score_sum'], stats['score_count'] = float(scored['score'].sum()), len(scored)
+    stats['score_bins'] = value_counts(bins)
+    now_ts = df['created_at'].max()
+    last_7_start, prev_7_start = now_ts - pd.Timedelta(days=7), now_ts - pd.Timedelta(days=14)
+    stats['tests_last_7d'] = int((df['created_at'] > last_7_start).sum())
+    stats['tests_prev_7d'] = int(((df['created_at'] > prev_7_start) & (df['created_at'] <= last_7_start)).sum())
+    return stats
+
+
+def rss_mb():
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * resource.getpagesize() / 2 ** 20
+
+
+def run_path(path, n):
+    """Child process: import, then time stats over n synthetic documents"""
+    start = time.perf_counter()
+    if path == 'pandas':
+        import numpy  # noqa: F401
+        import pandas  # noqa: F401
+        import dashboard  # noqa: F401
+        compute = legacy_stats
+    else:
+        from aggregate import stats_from_documents
+        compute = stats_from_documents
+    import_s = time.perf_counter() - start
+    import_rss = rss_mb()
+
+    from synthetic import generate_records
+    docs = list(generate_records(n, end=datetime(2024, 6, 30, tzinfo=timezone.utc)))
+    base_rss = rss_mb()
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        stats = compute(docs)
+        timings.append(time.perf_counter() - start)
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({
+        'import_s': import_s,
+        'import_rss_mb': import_rss,
+        'peak_delta_mb': max(peak_mb - base_rss, 0),
+        'latency_s': statistics.median(timings),
+        'total': stats['total'],
+    }))
+
+
+def main(sizes):
+    print(f"{'engine':>8} {'docs':>8} {'import (s)':>11} {'RSS after import (MB)':>22} "
+          f"{'peak RSS delta (MB)':>20} {'median latency (s)':>19}")
+    for n in sizes:
+        for path in ('pandas', 'engine'):
+            out = subprocess.run([sys.executable, __file__, '--run', path, str(n)],
+                                 check=True, capture_output=True, text=True).stdout
+            result = json.loads(out)
+            print(f"{path:>8} {result['total']:>8} {result['import_s']:>11.3f} {result['import_rss_mb']:>22.1f} "
+                  f"{result['peak_delta_mb']:>20.1f} {result['latency_s']:>19.3f}")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 4 and sys.argv[1] == '--run':
+        run_path(sys.argv[2], int(sys.argv[3]))
+    else:
+        main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Peak RSS and wall time of the dashboard scan path:
+``list(collection.find({}))`` of full documents ("before") vs. the
+projected columnar ``fetch_columns()`` ("after"), both reduced by the
+columnar engine.
+
+Each path runs in its own process so peak RSS is not shared. Against a
+real server, set MONGODB_URI (the synthetic collection is created and
+dropped); otherwise an in-process mongomock collection is used.
+
+    python bench_fetch.py            # 200k documents
+    python bench_fetch.py 1000000
+"""
+
+import os
+import resource
+import subprocess
+import sys
+import time
+
+DEFAULT_SIZE = 200_000
+BENCH_DB = 'system-monitor-bench'
+
+
+def open_collection(n):
+    from synthetic import generate_records
+
+    uri = os.environ.get('MONGODB_URI')
+    if uri:
+        from pymongo import MongoClient
+        collection = MongoClient(uri)[BENCH_DB]['process']
+    else:
+        import mongomock
+        collection = mongomock.MongoClient()[BENCH_DB]['process']
+    if collection.estimated_document_count() != n:
+        collection.drop()
+        batch = []
+        for doc in generate_records(n):
+            batch.append(doc)
+            if len(batch) == 10000:
+                collection.insert_many(batch)
+                batch = []
+        if batch:
+            collection.insert_many(batch)
+    return collection
+
+
+def current_rss_kb():
+    with open('/proc/self/statm') as statm:
+        return int(statm.read().split()[1]) * resource.getpagesize() // 1024
+
+
+def run_path(path, n):
+    """Child process: load the collection, then time one dashboard scan"""
+    from aggregate import stats_from_columns, stats_from_documents
+    from fetch import fetch_columns
+
+    collection = open_collection(n)
+    rss_before = current_rss_kb()
+    start = time.perf_counter()
+    if path == 'before':
+        stats = stats_from_documents(list(collection.find({})))
+    else:
+        stats = stats_from_columns(fetch_columns(collection))
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{elapsed:.3f} {max(peak - rss_before, 0)} {stats['total']}")
+
+
+def main(n):
+    if not os.environ.get('MONGODB_URI'):
+        print("MONGODB_URI not set, using mongomock (its own document copies add to both paths)")
+    print(f"{'path':>8} {'docs':>10} {'wall (s)':>10} {'peak RSS delta (MB)':>20}")
+    for path in ('before', 'after'):
+        out = subprocess.run([sys.executable, __file__, '--run', path, str(n)],
+                             check=True, capture_output=True, text=True).stdout.split()
+        elapsed, peak_kb, total = float(out[0]), int(out[1]), int(out[2])
+        print(f"{path:>8} {total:>10} {elapsed:>10.2f} {peak_kb / 1024:>20.1f}")
+    if os.environ.get('MONGODB_URI'):
+        from pymongo import MongoClient
+        MongoClient(os.environ['MONGODB_URI']).drop_database(BENCH_DB)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 4 and sys.argv[1] == '--run':
+        run_path(sys.argv[2], int(sys.argv[3]))
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_SIZE)
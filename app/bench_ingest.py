@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+/submit throughput with write-behind mode off and on.
+
+The app is served by a threaded werkzeug server in a child process (one per
+mode) and driven by concurrent HTTP clients. Without MONGODB_URI it writes to
+mongomock; `--latency-ms` adds a simulated round trip to every write so the
+numbers resemble a remote Atlas cluster.
+
+    python bench_ingest.py --clients 32 --seconds 10 --latency-ms 5
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DB = 'system-monitor-bench'
+
+
+class SlowCollection:
+    """Proxy adding a fixed delay to each write, standing in for network RTT"""
+
+    def __init__(self, collection, latency):
+        self._collection = collection
+        self._latency = latency
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if name in ('insert_one', 'insert_many', 'bulk_write'):
+            def delayed(*args, **kwargs):
+                time.sleep(self._latency)
+                return attr(*args, **kwargs)
+            return delayed
+        return attr
+
+
+def serve(mode, latency_ms, port):
+    """Child process: patch the app onto the benchmark collection and serve it"""
+    os.environ['WRITE_BEHIND'] = '1' if mode == 'on' else '0'
+    import app as appmod
+    from daily import DailyRollupStore
+    from ingest import WriteBehindQueue
+    from rollups import RollupStore
+    from storage import MongoStorage
+    from werkzeug.serving import make_server
+
+    uri = os.environ.get('MONGODB_URI')
+    if uri:
+        from pymongo import MongoClient
+        db = MongoClient(uri)[BENCH_DB]
+    else:
+        import mongomock
+        db = mongomock.MongoClient()[BENCH_DB]
+    db.drop_collection('process')
+    db.drop_collection('rollups')
+    db.drop_collection('daily_rollups')
+    latency = latency_ms / 1000.0
+    # the benchmark collections replace whatever the app's own connection would switch to
+    appmod.connection.close()
+    appmod.storage = MongoStorage(SlowCollection(db['process'], latency),
+                                  rollups=RollupStore(SlowCollection(db['rollups'], latency)),
+                                  daily_rollups=DailyRollupStore(SlowCollection(db['daily_rollups'], latency)))
+    appmod.ingest_queue = (WriteBehindQueue.from_env(appmod.storage.collection, on_flush=appmod._after_insert)
+                           if mode == 'on' else None)
+
+    import logging
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', port, appmod.app, threaded=True)
+    print('ready', flush=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    sys.stdin.read()  # parent closes stdin when done
+    if appmod.ingest_queue is not None:
+        appmod.ingest_queue.close()
+    print(json.dumps({'stored': db['process'].count_documents({})}), flush=True)
+
+
+def drive(port, clients, seconds):
+    import requests
+    from synthetic import generate_records
+
+    records = list(generate_records(1000))
+    for record in records:
+        record.pop('created_at')
+    deadline = time.monotonic() + seconds
+    url = f'http://127.0.0.1:{port}/submit'
+
+    def client(offset):
+        session = requests.Session()
+        ok = busy = errors = 0
+        i = offset
+        while time.monotonic() < deadline:
+            response = session.post(url, json=records[i % len(records)])
+            if response.status_code == 200:
+                ok += 1
+            elif response.status_code == 503:
+                busy += 1
+            else:
+                errors += 1
+            i += 1
+        return ok, busy, errors
+
+    with ThreadPoolExecutor(clients) as pool:
+        results = list(pool.map(client, range(clients)))
+    return [sum(column) for column in zip(*results)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--serve', choices=['on', 'off'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.latency_ms, args.port)
+        return
+
+    print(f"{'write-behind':>12} {'req/s':>10} {'ok':>8} {'503':>6} {'errors':>7} {'stored':>8}")
+    for mode in ('off', 'on'):
+        child = subprocess.Popen([sys.executable, __file__, '--serve', mode, '--port', str(args.port),
+                                  '--latency-ms', str(args.latency_ms)],
+                                 stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        child.stdout.readline()
+        ok, busy, errors = drive(args.port, args.clients, args.seconds)
+        child.stdin.close()
+        stored = json.loads(child.stdout.readline())['stored']
+        child.wait()
+        print(f"{mode:>12} {ok / args.seconds:>10.0f} {ok:>8} {busy:>6} {errors:>7} {stored:>8}")
+
+
+if __name__ == '__main__':
+    main()
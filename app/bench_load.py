@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Load generator for capacity planning.
+
+Drives a mix of endpoints (``/submit``, ``/submit/batch``, ``/list``,
+``/admin``, ``/api/charts/<name>``, ``/health``) at a fixed concurrency and
+reports throughput and p50/p95/p99 latency per endpoint. Records come from
+synthetic.py, optionally shaped by a JSON profile (see synthetic.Profile).
+
+Targets:
+
+* ``app``      - app.py in a child process (threaded werkzeug server), on
+                 MONGODB_URI if set (e.g. a local mongod), otherwise mongomock;
+                 with STORAGE_BACKEND=sqlite on SQLITE_PATH
+* ``app_demo`` - app_demo.py in a child process (in-memory demo_store)
+* a URL        - an already running server, e.g. https://staging.example.com
+
+The store is prefilled with ``--prefill`` records through /submit/batch so
+/list and /admin have data to read. Results are saved as JSON and can be
+compared run against run:
+
+    python bench_load.py app --concurrency 16 --seconds 20 --mix submit=8,list=1,admin=1
+    python bench_load.py app_demo --profile profile.json --output demo.json
+    python bench_load.py --compare before.json after.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from synthetic import Profile, generate_records
+
+DEFAULT_MIX = 'submit=8,list=1,admin=1'
+BATCH_SIZE = 100
+PREFILL_BATCH = 1000
+CHART_NAMES = ['cpu', 'gpu', 'daily', 'combos', 'score_hist']
+BENCH_DB = 'system-monitor-bench'
+TARGETS = ['app', 'app_demo']
+
+
+def percentiles(values):
+    """{'p50', 'p95', 'p99'} in ms for latencies in seconds"""
+    if not values:
+        return {'p50': None, 'p95': None, 'p99': None}
+    ms = sorted(value * 1000 for value in values)
+    cuts = statistics.quantiles(ms, n=100, method='inclusive') if len(ms) > 1 else ms * 99
+    return {'p50': round(cuts[49], 2), 'p95': round(cuts[94], 2), 'p99': round(cuts[98], 2)}
+
+
+def parse_mix(text):
+    """'submit=8,list=1' -> [('submit', 8.0), ('list', 1.0)]"""
+    mix = []
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint '{name}' (one of: {', '.join(ENDPOINTS)})")
+        mix.append((name, float(weight or 1)))
+    return mix
+
+
+def _records(args, n, seed):
+    profile = Profile.load(args.profile) if args.profile else None
+    records = list(generate_records(n, seed=seed, profile=profile))
+    for record in records:
+        # ผู้ใช้จริงไม่ได้ส่ง created_at มา: เซิร์ฟเวอร์เป็นคนกำหนด
+        record.pop('created_at')
+    return records
+
+
+def _submit(session, base, records, i):
+    return session.post(f'{base}/submit', json=records[i % len(records)])
+
+
+def _batch(session, base, records, i):
+    start = (i * BATCH_SIZE) % len(records)
+    return session.post(f'{base}/submit/batch', json=records[start:start + BATCH_SIZE])
+
+
+def _list(session, base, records, i):
+    return session.get(f'{base}/list', params={'limit': 100})
+
+
+def _admin(session, base, records, i):
+    return session.get(f'{base}/admin')
+
+
+def _charts(session, base, records, i):
+    return session.get(f'{base}/api/charts/{CHART_NAMES[i % len(CHART_NAMES)]}')
+
+
+def _health(session, base, records, i):
+    return session.get(f'{base}/health')
+
+
+ENDPOINTS = {
+    'submit': _submit,
+    'batch': _batch,
+    'list': _list,
+    'admin': _admin,
+    'charts': _charts,
+    'health': _health,
+}
+
+
+def serve(target, port):
+    """Child process: serve app.py (mongomock unless MONGODB_URI) or app_demo.py"""
+    import logging
+    from werkzeug.serving import make_server
+
+    if target == 'app_demo':
+        import app_demo as appmod
+    else:
+        os.environ.setdefault('WRITE_BEHIND', '0')
+        import app as appmod
+        if appmod.STORAGE_BACKEND != 'mongodb':
+            pass  # embedded storage opened by app.py (e.g. SQLITE_PATH)
+        elif not os.environ.get('MONGODB_URI'):
+            import mongomock
+            from daily import DailyRollupStore
+            from rollups import RollupStore
+            from sketches import SketchStore
+            from storage import MongoStorage
+
+            db = mongomock.MongoClient()[BENCH_DB]
+            appmod.connection.close()
+            appmod.storage = MongoStorage(db['process'], rollups=RollupStore(db['rollups']),
+                                          daily_rollups=DailyRollupStore(db['daily_rollups']),
+                                          sketches=SketchStore(db['sketches']))
+        elif not appmod.connection.wait(timeout=30):
+            raise SystemExit(f"MongoDB not reachable: {appmod.connection.status()['last_error']}")
+
+    logging.getLogger().setLevel(logging.ERROR)
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', port, appmod.app, threaded=True)
+    print('ready', flush=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    sys.stdin.read()  # parent closes stdin when done
+
+
+def _backend_name():
+    if os.environ.get('STORAGE_BACKEND', 'mongodb') != 'mongodb':
+        return os.environ['STORAGE_BACKEND']
+    return 'mongodb' if os.environ.get('MONGODB_URI') else 'mongomock'
+
+
+def prefill(base, records):
+    import requests
+
+    session = requests.Session()
+    for start in range(0, len(records), PREFILL_BATCH):
+        response = session.post(f'{base}/submit/batch', json=records[start:start + PREFILL_BATCH])
+        response.raise_for_status()
+
+
+def drive(base, mix, records, concurrency, seconds):
+    """Run the mix for `seconds`; {endpoint: {'latencies': [...], 'ok': n, 'errors': {status: n}}}"""
+    import random
+
+    import requests
+
+    names = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+    deadline = time.monotonic() + seconds
+
+    def client(worker):
+        rnd = random.Random(worker)
+        session = requests.Session()
+        results = {name: {'latencies': [], 'ok': 0, 'errors': {}} for name in names}
+        i = worker
+        while time.monotonic() < deadline:
+            name = rnd.choices(names, weights)[0]
+            result = results[name]
+            start = time.perf_counter()
+            try:
+                status = ENDPOINTS[name](session, base, records, i).status_code
+            except requests.RequestException as e:
+                status = type(e).__name__
+            result['latencies'].append(time.perf_counter() - start)
+            if status == 200:
+                result['ok'] += 1
+            else:
+                result['errors'][str(status)] = result['errors'].get(str(status), 0) + 1
+            i += concurrency
+        return results
+
+    with ThreadPoolExecutor(concurrency) as pool:
+        per_client = list(pool.map(client, range(concurrency)))
+    merged = {name: {'latencies': [], 'ok': 0, 'errors': {}} for name in names}
+    for results in per_client:
+        for name, result in results.items():
+            merged[name]['latencies'] += result['latencies']
+            merged[name]['ok'] += result['ok']
+            for status, n in result['errors'].items():
+                merged[name]['errors'][status] = merged[name]['errors'].get(status, 0) + n
+    return merged
+
+
+def summarize(raw, seconds):
+    endpoints = {}
+    for name, result in raw.items():
+        endpoints[name] = {
+            'requests': len(result['latencies']),
+            'ok': result['ok'],
+            'errors': result['errors'],
+            'throughput': round(result['ok'] / seconds, 1),
+            **percentiles(result['latencies']),
+        }
+    everything = [latency for result in raw.values() for latency in result['latencies']]
+    endpoints['all'] = {
+        'requests': len(everything),
+        'ok': sum(result['ok'] for result in raw.values()),
+        'errors': {},
+        'throughput': round(sum(result['ok'] for result in raw.values()) / seconds, 1),
+        **percentiles(everything),
+    }
+    for result in raw.values():
+        for status, n in result['errors'].items():
+            endpoints['all']['errors'][status] = endpoints['all']['errors'].get(status, 0) + n
+    return endpoints
+
+
+def print_table(endpoints):
+    print(f"{'endpoint':>9} {'requests':>9} {'ok':>8} {'errors':>7} {'req/s':>9} "
+          f"{'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9}")
+    for name, row in endpoints.items():
+        errors = sum(row['errors'].values())
+        cells = ''.join(f" {row[q]:>9.1f}" if row[q] is not None else f" {'-':>9}" for q in ('p50', 'p95', 'p99'))
+        print(f"{name:>9} {row['requests']:>9} {row['ok']:>8} {errors:>7} {row['throughput']:>9.1f}{cells}")
+
+
+def compare(paths):
+    """Print req/s and p95 of each endpoint side by side for saved runs"""
+    runs = []
+    for path in paths:
+        with open(path) as f:
+            runs.append(json.load(f))
+    names = list(dict.fromkeys(name for run in runs for name in run['endpoints']))
+    print(f"{'endpoint':>9}" + ''.join(f" {os.path.basename(path)[:24]:>24}" for path in paths))
+    for name in names:
+        cells = []
+        for run in runs:
+            row = run['endpoints'].get(name)
+            cells.append(f"{row['throughput']:>9.1f} r/s {row['p95'] or 0:>7.1f} p95" if row else '-')
+        print(f"{name:>9}" + ''.join(f" {cell:>24}" for cell in cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('target', nargs='?', default='app', help="'app', 'app_demo' or a base URL")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--mix', default=DEFAULT_MIX,
+                        help=f"endpoint=weight list from: {', '.join(ENDPOINTS)} (default {DEFAULT_MIX})")
+    parser.add_argument('--profile', help='JSON record distribution (see synthetic.py)')
+    parser.add_argument('--prefill', type=int, default=5000, help='records stored before measuring')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--port', type=int, default=5097)
+    parser.add_argument('--output', help='results JSON (default bench-<target>-<time>.json)')
+    parser.add_argument('--compare', nargs='+', metavar='RUN', help='compare saved result files and exit')
+    parser.add_argument('--serve', choices=TARGETS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port)
+        return
+    if args.compare:
+        compare(args.compare)
+        return
+
+    mix = parse_mix(args.mix)
+    records = _records(args, 2000, args.seed)
+    child = None
+    if args.target in TARGETS:
+        base = f'http://127.0.0.1:{args.port}'
+        child = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve', args.target,
+                                  '--port', str(args.port)],
+                                 cwd=os.path.dirname(os.path.abspath(__file__)),
+                                 stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        if child.stdout.readline().strip() != 'ready':
+            raise SystemExit('server failed to start')
+    else:
+        base = args.target.rstrip('/')
+
+    try:
+        if args.prefill:
+            prefill(base, _records(args, args.prefill, args.seed + 1))
+        raw = drive(base, mix, records, args.concurrency, args.seconds)
+    finally:
+        if child is not None:
+            child.stdin.close()
+            child.wait()
+
+    endpoints = summarize(raw, args.seconds)
+    print_table(endpoints)
+    target_name = args.target if args.target in TARGETS else 'url'
+    output = args.output or f"bench-{target_name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    with open(output, 'w') as f:
+        json.dump({
+            'target': args.target,
+            'backend': _backend_name() if args.target == 'app' else None,
+            'started_at': datetime.now(timezone.utc).isoformat(),
+            'config': {'concurrency': args.concurrency, 'seconds': args.seconds, 'mix': dict(mix),
+                       'profile': args.profile, 'prefill': args.prefill, 'seed': args.seed},
+            'host': {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()},
+            'endpoints': endpoints,
+        }, f, indent=2)
+    print(f"saved {output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Storage backend comparison: the same synthetic records through
+storage.MongoStorage (on MONGODB_URI, or mongomock when it is unset) and
+sqlite_storage.SQLiteStorage (a temporary file).
+
+For each backend it times:
+
+* batch insert: ``insert_many`` in /submit/batch sized chunks (records/s)
+* /list pages: a filtered page and a page ordered by ``created_at``
+* /admin stats: all dimensions, and a 7-day window
+* growth counts (the 7-day summary tiles)
+
+The MongoDB stats are the raw aggregation (``query_stats``), i.e. what
+/admin falls back to without rollups.
+
+    python bench_storage.py              # 100k records
+    python bench_storage.py 1000000
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from listing import parse_list_args
+from sqlite_storage import SQLiteStorage
+from storage import MongoStorage
+from synthetic import generate_records
+
+DEFAULT_RECORDS = 100_000
+BATCH_SIZE = 1000
+BENCH_DB = 'system-monitor-bench-storage'
+LIST_PAGES = [{'cpu_model': 'M2', 'ram_gb': '16'}, {'sort': 'created_at', 'mode': 'ai'}]
+
+
+def mongo_storage():
+    from indexes import ensure_indexes
+
+    uri = os.environ.get('MONGODB_URI')
+    if uri:
+        from pymongo import MongoClient
+
+        client = MongoClient(uri)
+        client.drop_database(BENCH_DB)
+        label = 'mongodb'
+    else:
+        import mongomock
+
+        client = mongomock.MongoClient()
+        label = 'mongomock'
+    db = client[BENCH_DB]
+    ensure_indexes(db)
+    return label, MongoStorage(db['process']), lambda: uri and client.drop_database(BENCH_DB)
+
+
+def timed(fn, repeat=3):
+    """Best of `repeat` runs in seconds"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run(storage, records):
+    results = {}
+    start = time.perf_counter()
+    for i in range(0, len(records), BATCH_SIZE):
+        storage.insert_many([dict(record) for record in records[i:i + BATCH_SIZE]])
+    results['insert (rec/s)'] = len(records) / (time.perf_counter() - start)
+
+    for n, args in enumerate(LIST_PAGES, 1):
+        params = parse_list_args(args)
+        results[f'list page {n} (ms)'] = 1000 * timed(lambda: list(storage.find(
+            params['query'], params['projection'], params['sort'], params['limit'])))
+    week = (datetime.now(timezone.utc) - timedelta(days=7), None)
+    results['stats (ms)'] = 1000 * timed(storage.stats)
+    results['stats 7d (ms)'] = 1000 * timed(lambda: storage.stats(window=week))
+    results['growth (ms)'] = 1000 * timed(storage.growth_counts)
+    return results
+
+
+def main(n):
+    records = list(generate_records(n))
+    directory = tempfile.mkdtemp(prefix='bench-storage-')
+    label, mongo, cleanup = mongo_storage()
+    backends = [(label, mongo), ('sqlite', SQLiteStorage(os.path.join(directory, 'bench.db')))]
+    rows = []
+    try:
+        for name, storage in backends:
+            rows.append((name, run(storage, records)))
+            storage.close()
+    finally:
+        cleanup()
+        shutil.rmtree(directory)
+
+    print(f"{n} records")
+    print(f"{'':>18}" + ''.join(f'{name:>12}' for name, _ in rows))
+    for metric in rows[0][1]:
+        print(f'{metric:>18}' + ''.join(f'{results[metric]:>12.1f}' for _, results in rows))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_RECORDS)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Memory per record of the demo store: the previous list of dicts
+(``mock_data``) vs. demo_store.RecordStore with and without indexes.
+
+Memory is what tracemalloc sees allocated while the records are stored.
+It also reports the time to store them (timed in a separate, untraced
+build) and to compute the /admin
+aggregates (pandas DataFrame + value_counts for the list, maintained
+counts for the store).
+pandas comes from requirements-analysis.txt.
+
+    python bench_store.py                  # 100k and 1M records
+    python bench_store.py 10000 500000     # custom sizes
+"""
+
+import gc
+import sys
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timezone
+
+from demo_store import RecordStore
+from synthetic import generate_records
+
+DEFAULT_SIZES = [100_000, 1_000_000]
+
+
+def submissions(n):
+    for record in generate_records(n):
+        record.pop('created_at')
+        yield record
+
+
+def list_of_dicts(records):
+    """What app_demo.py did before demo_store.py"""
+    data = []
+    for record in records:
+        doc = {'_id': str(uuid.uuid4()), **record, 'created_at': datetime.now(timezone.utc)}
+        data.append(doc)
+    return data
+
+
+def list_dashboard(data):
+    import pandas as pd
+
+    df = pd.DataFrame(data)
+    return (df['cpu_model'].value_counts().head(10), df['gpu_model'].value_counts().head(10),
+            df['ram_gb'].value_counts(), df['cpu_brand'].value_counts(), df['gpu_brand'].value_counts(),
+            pd.to_datetime(df['created_at']).dt.date.value_counts().sort_index(), df['ram_gb'].mean())
+
+
+def store_dashboard(store):
+    return ([store.value_counts(field) for field in ('cpu_model', 'gpu_model', 'ram_gb', 'cpu_brand', 'gpu_brand')],
+            store.day_counts(), store.ram_mean())
+
+
+def measure(build, records):
+    gc.collect()
+    start = time.perf_counter()
+    stored = build(records)
+    elapsed = time.perf_counter() - start
+    del stored
+    gc.collect()
+    tracemalloc.start()
+    stored = build(records)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return stored, current, elapsed
+
+
+def timed(fn, arg):
+    start = time.perf_counter()
+    fn(arg)
+    return time.perf_counter() - start
+
+
+def main(sizes):
+    print(f"{'store':>22} {'records':>9} {'bytes/record':>13} {'total (MB)':>11} {'store (s)':>10} {'dashboard (s)':>14}")
+    for n in sizes:
+        records = list(submissions(n))
+        variants = [
+            ('list of dicts', list_of_dicts, list_dashboard),
+            ('RecordStore', lambda docs: _store(docs, RecordStore()), store_dashboard),
+            ('RecordStore, no index', lambda docs: _store(docs, RecordStore(indexes=())), store_dashboard),
+        ]
+        for name, build, dashboard in variants:
+            stored, size, elapsed = measure(build, records)
+            dashboard_s = timed(dashboard, stored)
+            print(f"{name:>22} {n:>9} {size / n:>13.0f} {size / 2 ** 20:>11.1f} {elapsed:>10.2f} {dashboard_s:>14.3f}")
+            del stored
+
+
+def _store(docs, store):
+    for doc in docs:
+        store.append(doc)
+    return store
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
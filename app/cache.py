@@ -0,0 +1,90 @@
+"""
+Versioned, TTL-bounded cache for rendered dashboard payloads.
+
+Values are the final rendered payloads (stat card context, per-chart JSON
+strings), keyed by name, so a hit skips both the aggregation and
+``json.dumps``. An entry is served while its data version is current and
+its TTL has not expired; ``invalidate()`` (called by /submit) bumps the
+version for every key.
+Concurrent misses on the same key are coalesced: one request computes, the
+others wait for its result.
+
+Keys include the dashboard window (``?from=&to=``), so the number of
+entries is capped at ``max_entries``; the oldest entry is dropped first.
+
+The cache is per process. Other gunicorn workers pick up new data when
+their own entry expires, so staleness across workers is bounded by the TTL.
+"""
+
+import threading
+import time
+
+DEFAULT_TTL = 30.0
+DEFAULT_MAX_ENTRIES = 256
+
+
+class _Flight:
+    """One in-progress computation that concurrent callers wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class DashboardCache:
+
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._version = 0
+        self._entries = {}  # key -> (version, expires_at, value)
+        self._flights = {}
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def version(self):
+        return self._version
+
+    def invalidate(self):
+        """Mark every cached payload stale (new data was written)"""
+        with self._lock:
+            self._version += 1
+
+    def get(self, key, compute):
+        """Cached value for key, or the result of compute() shared with concurrent callers"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == self._version and entry[1] > time.monotonic():
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                version = self._version
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = compute()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if flight.error is None and self.ttl > 0:
+                    self._entries.pop(key, None)
+                    while len(self._entries) >= self.max_entries:
+                        del self._entries[next(iter(self._entries))]
+                    self._entries[key] = (version, time.monotonic() + self.ttl, flight.value)
+                del self._flights[key]
+            flight.done.set()
+        return flight.value
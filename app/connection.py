@@ -0,0 +1,156 @@
+"""
+Background MongoDB connection manager.
+
+The app starts serving right away in degraded (demo) mode while a daemon
+thread connects: each attempt pings the server with a short
+``serverSelectionTimeoutMS``; failures wait with exponential backoff
+(plus jitter) up to ``backoff_max`` and try again, forever. The first
+successful ping calls ``on_connect(client)``, which is where app.py
+switches its collection and stores from degraded to live.
+
+``status()`` is what /health reports::
+
+    {'state': 'backoff', 'attempts': 3, 'last_error': '...',
+     'next_attempt_in': 3.7, 'connected_at': None}
+
+States: ``idle`` (not started), ``connecting``, ``backoff``, ``connected``.
+Once connected, reconnects after outages are left to PyMongo's own
+server monitoring.
+
+The client is built with the pool options from pool.py and a
+``PoolMetrics`` listener. It must not cross a fork: ``after_fork()`` (called
+in the child, e.g. gunicorn workers with ``--preload``) drops the inherited
+client without touching its sockets and the next ``start()`` connects anew.
+
+Tuned with ``MONGO_CONNECT_TIMEOUT_MS``, ``MONGO_BACKOFF_INITIAL`` and
+``MONGO_BACKOFF_MAX`` (seconds).
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from datetime import datetime, timezone
+
+from pymongo import MongoClient
+
+from pool import PoolMetrics, client_options
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONNECT_TIMEOUT_MS = 2000
+DEFAULT_BACKOFF_INITIAL = 0.5
+DEFAULT_BACKOFF_MAX = 30.0
+BACKOFF_FACTOR = 2
+
+
+class MongoConnection:
+
+    def __init__(self, uri, on_connect=None, connect_timeout_ms=DEFAULT_CONNECT_TIMEOUT_MS,
+                 backoff_initial=DEFAULT_BACKOFF_INITIAL, backoff_max=DEFAULT_BACKOFF_MAX,
+                 client_options=None, client_factory=MongoClient):
+        self.uri = uri
+        self.on_connect = on_connect
+        self.connect_timeout_ms = connect_timeout_ms
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.client_options = client_options or {}
+        self.client_factory = client_factory
+        self._reset()
+
+    def _reset(self):
+        self.client = None
+        self.pool_metrics = PoolMetrics()
+        self.state = 'idle'
+        self.attempts = 0
+        self.last_error = None
+        self.connected_at = None
+        self._next_attempt = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @classmethod
+    def from_env(cls, uri, on_connect=None):
+        return cls(
+            uri,
+            on_connect=on_connect,
+            connect_timeout_ms=int(os.environ.get('MONGO_CONNECT_TIMEOUT_MS', DEFAULT_CONNECT_TIMEOUT_MS)),
+            backoff_initial=float(os.environ.get('MONGO_BACKOFF_INITIAL', DEFAULT_BACKOFF_INITIAL)),
+            backoff_max=float(os.environ.get('MONGO_BACKOFF_MAX', DEFAULT_BACKOFF_MAX)),
+            client_options=client_options(),
+        )
+
+    def start(self):
+        """Start connecting in the background (no-op once started or connected)"""
+        # เรียกซ้ำได้: หลัง gunicorn fork เธรดเดิมไม่ตามมา จึงเริ่มใหม่ใน process ที่รับ request
+        if self.state == 'connected' or (self._thread is not None and self._thread.is_alive()):
+            return self
+        with self._lock:
+            if self.state != 'connected' and (self._thread is None or not self._thread.is_alive()):
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name='mongo-connect', daemon=True)
+                self._thread.start()
+        return self
+
+    def connected(self):
+        return self.state == 'connected'
+
+    def wait(self, timeout=None):
+        """Block until connected or timeout; True when connected (scripts and tests)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.connected():
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def after_fork(self):
+        """In a forked child: forget the parent's client, thread and locks"""
+        # ห้ามใช้หรือ close client ของ parent ใน child: socket และ lock ภายในเป็นของ process แม่
+        self._reset()
+
+    def close(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+
+    def status(self):
+        next_attempt = self._next_attempt
+        return {
+            'state': self.state,
+            'attempts': self.attempts,
+            'last_error': self.last_error,
+            'next_attempt_in': round(max(next_attempt - time.monotonic(), 0), 1) if next_attempt else None,
+            'connected_at': self.connected_at.isoformat() if self.connected_at else None,
+        }
+
+    def _run(self):
+        delay = self.backoff_initial
+        while not self._stopping.is_set():
+            self.state = 'connecting'
+            self.attempts += 1
+            try:
+                if self.client is None:
+                    self.client = self.client_factory(self.uri, serverSelectionTimeoutMS=self.connect_timeout_ms,
+                                                      event_listeners=[self.pool_metrics], **self.client_options)
+                self.client.admin.command('ping')
+                if self.on_connect is not None:
+                    self.on_connect(self.client)
+            except Exception as e:
+                self.last_error = str(e)
+                # jitter: workers that lost the server together don't retry in lockstep
+                wait = random.uniform(delay / 2, delay)
+                self._next_attempt = time.monotonic() + wait
+                self.state = 'backoff'
+                logger.warning(f"MongoDB connection attempt {self.attempts} failed, retrying in {wait:.1f}s: {e}")
+                self._stopping.wait(wait)
+                delay = min(delay * BACKOFF_FACTOR, self.backoff_max)
+                continue
+            self._next_attempt = None
+            self.last_error = None
+            self.connected_at = datetime.now(timezone.utc)
+            self.state = 'connected'
+            logger.info(f"Successfully connected to MongoDB (attempt {self.attempts})")
+            return
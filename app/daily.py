@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Pre-bucketed daily time series.
+
+Every accepted /submit document bumps one document per UTC day in the
+``daily_rollups`` collection:
+
+    {'_id': '2024-06-04', 'count': 41, 'score_sum': 3120.5, 'score_count': 39,
+     'device_type': {'CPU': 30, 'GPU': 11},
+     'cpu_brand': {'AMD': 18, 'Intel': 23},
+     'gpu_brand': {'NVIDIA': 35, 'AMD': 6}}
+
+The daily chart (and any trend chart) reads O(days) documents instead of
+scanning every test. Breakdown keys are escaped so brand names containing
+``.`` or ``$`` are valid field names.
+
+Backfill from existing data, or compare the stored buckets with the raw
+``process`` collection:
+
+    python daily.py rebuild
+    python daily.py check [--from 2024-06-01] [--to 2024-06-30]
+"""
+
+import argparse
+import logging
+import math
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+from pymongo import MongoClient, UpdateOne
+
+from dashboard import extract_score
+from queries import parse_window, window_query
+from rollups import _utc_day
+
+logger = logging.getLogger(__name__)
+
+DAILY_COLLECTION = 'daily_rollups'
+DAILY_BREAKDOWNS = ['device_type', 'cpu_brand', 'gpu_brand']
+REBUILD_BATCH_SIZE = 1000
+
+_DAILY_PROJECTION = {'_id': 0, 'created_at': 1, 'test_device_type': 1, 'cpu_brand': 1, 'gpu_brand': 1,
+                     'test_details.avg_score': 1}
+
+
+def encode_key(key):
+    """Breakdown value -> field name ('.', '$' and '%' percent-escaped)"""
+    key = 'unknown' if key is None else str(key)
+    return key.replace('%', '%25').replace('.', '%2E').replace('$', '%24')
+
+
+def decode_key(field):
+    return field.replace('%24', '$').replace('%2E', '.').replace('%25', '%')
+
+
+def daily_increments(docs):
+    """{day: {field: increment}} for a group of documents, merged per day"""
+    merged = {}
+    for doc in docs:
+        created_at = doc.get('created_at') or datetime.now(timezone.utc)
+        # วันตาม UTC เหมือน rollups (created_at ที่มี timezone อื่นต้องแปลงก่อน)
+        inc = merged.setdefault(_utc_day(created_at), {'count': 0})
+        inc['count'] += 1
+        values = {
+            'device_type': doc.get('test_device_type'),
+            'cpu_brand': doc.get('cpu_brand'),
+            'gpu_brand': doc.get('gpu_brand'),
+        }
+        for breakdown in DAILY_BREAKDOWNS:
+            field = f'{breakdown}.{encode_key(values[breakdown])}'
+            inc[field] = inc.get(field, 0) + 1
+        score = extract_score(doc.get('test_details'))
+        if score is not None:
+            inc['score_sum'] = inc.get('score_sum', 0.0) + score
+            inc['score_count'] = inc.get('score_count', 0) + 1
+    return merged
+
+
+def daily_updates(docs):
+    """UpdateOne operations ($inc upserts), one per distinct day in the batch"""
+    return [UpdateOne({'_id': day}, {'$inc': inc}, upsert=True) for day, inc in daily_increments(docs).items()]
+
+
+def _row(doc):
+    """Stored daily document -> plain dict with decoded breakdown keys"""
+    row = {
+        'day': doc['_id'],
+        'count': doc.get('count', 0),
+        'score_sum': doc.get('score_sum', 0.0),
+        'score_count': doc.get('score_count', 0),
+    }
+    for breakdown in DAILY_BREAKDOWNS:
+        row[breakdown] = {decode_key(key): n for key, n in doc.get(breakdown, {}).items()}
+    return row
+
+
+def _day_range(window):
+    """Day-id filter covering every day a created_at window touches"""
+    if window is None:
+        return {}
+    start, end = window
+    bounds = {}
+    if start is not None:
+        bounds['$gte'] = start.date().isoformat()
+    if end is not None:
+        bounds['$lte'] = (end - timedelta(microseconds=1)).date().isoformat()
+    return {'_id': bounds}
+
+
+class DailyRollupStore:
+    """Per-day counters kept in a MongoDB collection"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def record_many(self, docs):
+        """Add a batch of submitted documents to their days (single round trip)"""
+        updates = daily_updates(docs)
+        if updates:
+            self.collection.bulk_write(updates, ordered=False)
+
+    def series(self, window=None):
+        """Daily rows (see _row) in day order, optionally only the days a window touches"""
+        return [_row(doc) for doc in self.collection.find(_day_range(window), sort=[('_id', 1)])]
+
+    def day_counts(self):
+        """{day: test count} for the daily chart"""
+        return {doc['_id']: doc.get('count', 0) for doc in self.collection.find({}, {'count': 1})}
+
+    def rebuild(self, source, batch_size=REBUILD_BATCH_SIZE):
+        """
+        Recompute every day from the raw collection in a scratch collection
+        and swap it in with a rename (see RollupStore.rebuild).
+        """
+        db = self.collection.database
+        scratch = db[f'{self.collection.name}_rebuild']
+        scratch.drop()
+
+        processed = 0
+        pending = []
+        for doc in source.find({}, _DAILY_PROJECTION, batch_size=batch_size):
+            pending.append(doc)
+            processed += 1
+            if len(pending) == batch_size:
+                scratch.bulk_write(daily_updates(pending), ordered=False)
+                pending = []
+                logger.info(f"Bucketed {processed} documents")
+        if pending:
+            scratch.bulk_write(daily_updates(pending), ordered=False)
+
+        if processed:
+            scratch.rename(self.collection.name, dropTarget=True)
+        else:
+            self.collection.drop()
+        logger.info(f"Daily rollup rebuild finished: {processed} documents")
+        return processed
+
+    def check(self, source, window=None, batch_size=REBUILD_BATCH_SIZE):
+        """
+        Compare stored days with the raw collection. Returns a list of
+        mismatches ``{'day', 'field', 'expected', 'actual'}``; empty when
+        consistent. With a window, only whole days inside it are compared.
+        """
+        expected = {}
+        for doc in source.find(window_query(window), _DAILY_PROJECTION, batch_size=batch_size):
+            for day, inc in daily_increments([doc]).items():
+                totals = expected.setdefault(day, {})
+                for field, n in inc.items():
+                    totals[field] = totals.get(field, 0) + n
+
+        stored = {}
+        for doc in self.collection.find(_day_range(window)):
+            fields = {key: doc[key] for key in ('count', 'score_sum', 'score_count') if key in doc}
+            for breakdown in DAILY_BREAKDOWNS:
+                for key, n in doc.get(breakdown, {}).items():
+                    fields[f'{breakdown}.{key}'] = n
+            stored[doc['_id']] = fields
+
+        if window is not None:
+            # Days cut by the window are only partially scanned
+            start, end = window
+            partial = set()
+            if start is not None and (start.hour, start.minute, start.second, start.microsecond) != (0, 0, 0, 0):
+                partial.add(start.date().isoformat())
+            if end is not None and (end.hour, end.minute, end.second, end.microsecond) != (0, 0, 0, 0):
+                partial.add(end.date().isoformat())
+            for day in partial:
+                expected.pop(day, None)
+                stored.pop(day, None)
+
+        mismatches = []
+        for day in sorted(set(expected) | set(stored)):
+            want, have = expected.get(day, {}), stored.get(day, {})
+            for field in sorted(set(want) | set(have)):
+                a, b = want.get(field, 0), have.get(field, 0)
+                if not math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-6):
+                    mismatches.append({'day': day, 'field': field, 'expected': a, 'actual': b})
+        return mismatches
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Maintain the daily_rollups collection')
+    parser.add_argument('command', choices=['rebuild', 'check'])
+    parser.add_argument('--from', dest='start', help='check: first day (ISO date)')
+    parser.add_argument('--to', dest='end', help='check: last day (ISO date, inclusive)')
+    args = parser.parse_args(argv[1:])
+
+    logging.basicConfig(level=logging.INFO)
+    client = MongoClient(os.environ.get('MONGODB_URI', 'mongodb://localhost:27017'))
+    db = client["system-monitor"]
+    store = DailyRollupStore(db[DAILY_COLLECTION])
+    if args.command == 'rebuild':
+        processed = store.rebuild(db["process"])
+        print(f"✅ Rebuilt daily rollups from {processed} documents")
+        return 0
+
+    mismatches = store.check(db["process"], parse_window({'from': args.start, 'to': args.end}))
+    for mismatch in mismatches:
+        print(f"❌ {mismatch['day']} {mismatch['field']}: expected {mismatch['expected']}, stored {mismatch['actual']}")
+    if mismatches:
+        print(f"{len(mismatches)} mismatch(es); run: python daily.py rebuild")
+        return 1
+    print("✅ Daily rollups match the process collection")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,456 @@
+"""
+Dashboard statistics and chart builders for the admin page.
+
+Every data source (pre-aggregated rollups or a raw document scan) reduces
+to the same ``stats`` dict, and the charts are rendered from that dict only:
+
+    {
+        'total': int,                      # number of tests
+        'ram_sum': float, 'ram_count': int,
+        'counts': {dimension: {key: count}},
+        'score_sums': {'mode' | 'cpu_model': {key: [score_sum, score_count]}},
+        'score_sum': float, 'score_count': int,
+        'score_bins': {floor(avg_score): count},
+        'score_hists': {'mode' | 'cpu_model': {key: {floor(avg_score): count}}},
+        'tests_last_7d': int, 'tests_prev_7d': int,
+        'distinct': {dimension: int},      # sketch estimates, when counts holds only the top-K
+    }
+
+For MongoDB sources the two 7-day counters are filled in separately by
+``queries.growth_counts`` (range counts on the indexed created_at).
+"""
+
+import json
+import math
+
+COUNT_DIMENSIONS = ['cpu_model', 'gpu_model', 'cpu_brand', 'gpu_brand', 'ram_gb',
+                    'day', 'mode', 'device_type', 'combo', 'brand_pair']
+SCORE_DIMENSIONS = ['mode', 'cpu_model']
+# per-key score histograms: stats['score_hists'] key -> rollup dimension
+SCORE_HIST_DIMENSIONS = {'mode': 'mode_score_bin', 'cpu_model': 'cpu_score_bin'}
+SCORE_QUANTILES = [0.5, 0.9, 0.99]
+
+RAM_TIERS = [(8, '<=8 GB'), (16, '9-16 GB'), (32, '17-32 GB'), (64, '33-64 GB'), (float('inf'), '65+ GB')]
+
+
+def empty_stats():
+    """Stats dict with every counter present and zeroed"""
+    return {
+        'total': 0,
+        'ram_sum': 0.0,
+        'ram_count': 0,
+        'counts': {dim: {} for dim in COUNT_DIMENSIONS},
+        'score_sums': {dim: {} for dim in SCORE_DIMENSIONS},
+        'score_sum': 0.0,
+        'score_count': 0,
+        'score_bins': {},
+        'score_hists': {dim: {} for dim in SCORE_DIMENSIONS},
+        'tests_last_7d': 0,
+        'tests_prev_7d': 0,
+        'distinct': {},
+    }
+
+
+def merge_stats(stats, other):
+    """Add the counters of `other` (a disjoint set of tests) into `stats`, returns `stats`"""
+    for key in ('total', 'ram_sum', 'ram_count', 'score_sum', 'score_count', 'tests_last_7d', 'tests_prev_7d'):
+        stats[key] += other[key]
+    for dim, counts in other['counts'].items():
+        counter = stats['counts'].setdefault(dim, {})
+        for key, n in counts.items():
+            counter[key] = counter.get(key, 0) + n
+    for dim, sums in other['score_sums'].items():
+        target = stats['score_sums'].setdefault(dim, {})
+        for key, (score_sum, score_count) in sums.items():
+            current = target.get(key, [0.0, 0])
+            target[key] = [current[0] + score_sum, current[1] + score_count]
+    for score_bin, n in other['score_bins'].items():
+        stats['score_bins'][score_bin] = stats['score_bins'].get(score_bin, 0) + n
+    for dim, hists in other['score_hists'].items():
+        target = stats['score_hists'].setdefault(dim, {})
+        for key, bins in hists.items():
+            hist = target.setdefault(key, {})
+            for score_bin, n in bins.items():
+                hist[score_bin] = hist.get(score_bin, 0) + n
+    return stats
+
+
+def extract_mode(test_details):
+    """Test mode stored inside test_details, 'unknown' if absent or null (like $ifNull in queries.py)"""
+    if isinstance(test_details, dict) and test_details.get('mode') is not None:
+        return test_details['mode']
+    return 'unknown'
+
+
+def extract_score(test_details):
+    """avg_score stored inside test_details as float, None if absent or invalid"""
+    if isinstance(test_details, dict) and 'avg_score' in test_details:
+        try:
+            score = float(test_details['avg_score'])
+        except (TypeError, ValueError):
+            return None
+        return score if math.isfinite(score) else None
+    return None
+
+
+def score_bin(score):
+    """Histogram bucket (1 point wide) for a score"""
+    return int(math.floor(score))
+
+
+def histogram_quantiles(bins, quantiles=SCORE_QUANTILES):
+    """
+    Quantiles of a {floor(score): count} histogram, interpolated linearly
+    inside the bin (off by less than the 1-point bin width). None if empty.
+    """
+    total = sum(bins.values())
+    if not total:
+        return [None for _ in quantiles]
+    items = sorted(bins.items())
+    values = []
+    for q in quantiles:
+        target = q * total
+        seen = 0
+        for bucket, count in items:
+            if count and seen + count >= target:
+                values.append(bucket + (target - seen) / count)
+                break
+            seen += count
+        else:
+            values.append(items[-1][0] + 1.0)
+    return values
+
+
+def ram_tier(ram_gb):
+    """RAM tier label for a RAM size in GB, None if not numeric"""
+    try:
+        ram = float(ram_gb)
+    except (TypeError, ValueError):
+        return None
+    for upper, label in RAM_TIERS:
+        if ram <= upper:
+            return label
+    return None
+
+
+def combo_label(cpu_model, gpu_model):
+    cpu = cpu_model if isinstance(cpu_model, str) else 'Unknown CPU'
+    gpu = gpu_model if isinstance(gpu_model, str) else 'Unknown GPU'
+    return f'{cpu} + {gpu}'
+
+
+def top_counts(counter, n=None):
+    """Counter items sorted by count descending (first-seen order on ties)"""
+    items = sorted(counter.items(), key=lambda item: item[1], reverse=True)
+    return items[:n] if n is not None else items
+
+
+def _bar_h(items, title, x_title, y_title, color, height=400, hovertext=None):
+    trace = {
+        'x': [count for _, count in items],
+        'y': [label for label, _ in items],
+        'type': 'bar',
+        'orientation': 'h',
+        'marker': {'color': color}
+    }
+    if hovertext is not None:
+        trace['hovertext'] = hovertext
+    return {
+        'data': [trace],
+        'layout': {
+            'title': title,
+            'xaxis': {'title': x_title},
+            'yaxis': {'title': y_title},
+            'height': height
+        }
+    }
+
+
+def _pie(items, title, hole):
+    return {
+        'data': [{
+            'labels': [label for label, _ in items],
+            'values': [count for _, count in items],
+            'type': 'pie',
+            'hole': hole
+        }],
+        'layout': {
+            'title': title,
+            'height': 400
+        }
+    }
+
+
+def cpu_chart(stats):
+    # 1. CPU Model Horizontal Bar Chart
+    return _bar_h(top_counts(stats['counts']['cpu_model'], 10), 'CPU Model Usage',
+                  'Number of Tests', 'CPU Model', '#667eea')
+
+
+def gpu_chart(stats):
+    # 2. GPU Model Horizontal Bar Chart
+    return _bar_h(top_counts(stats['counts']['gpu_model'], 10), 'GPU Model Usage',
+                  'Number of Tests', 'GPU Model', '#764ba2')
+
+
+def ram_chart(stats):
+    # 3. RAM Distribution Pie Chart
+    items = [(f'{ram} GB', count) for ram, count in top_counts(stats['counts']['ram_gb'])]
+    return _pie(items, 'RAM Distribution', 0.4)
+
+
+def brand_chart(stats):
+    # 4. CPU vs GPU Brand Distribution
+    cpu_brands = top_counts(stats['counts']['cpu_brand'])
+    gpu_brands = top_counts(stats['counts']['gpu_brand'])
+    return {
+        'data': [
+            {
+                'x': [brand for brand, _ in cpu_brands],
+                'y': [count for _, count in cpu_brands],
+                'type': 'bar',
+                'name': 'CPU Brand',
+                'marker': {'color': '#667eea'}
+            },
+            {
+                'x': [brand for brand, _ in gpu_brands],
+                'y': [count for _, count in gpu_brands],
+                'type': 'bar',
+                'name': 'GPU Brand',
+                'marker': {'color': '#764ba2'}
+            }
+        ],
+        'layout': {
+            'title': 'CPU vs GPU Brand Distribution',
+            'xaxis': {'title': 'Brand'},
+            'yaxis': {'title': 'Number of Tests'},
+            'barmode': 'group',
+            'height': 400
+        }
+    }
+
+
+def daily_chart(stats):
+    # 5. Daily Test Activity Line Chart
+    days = sorted(stats['counts']['day'].items())
+    return {
+        'data': [{
+            'x': [day for day, _ in days],
+            'y': [count for _, count in days],
+            'type': 'scatter',
+            'mode': 'lines+markers',
+            'line': {'color': '#4CAF50', 'width': 3},
+            'marker': {'size': 8}
+        }],
+        'layout': {
+            'title': 'Daily Test Activity',
+            'xaxis': {'title': 'Date'},
+            'yaxis': {'title': 'Number of Tests'},
+            'height': 400
+        }
+    }
+
+
+def mode_chart(stats):
+    # 6. Test Mode Distribution (ถ้ามีข้อมูล)
+    items = top_counts(stats['counts']['mode']) or [('No mode data', 1)]
+    return _pie(items, 'Test Mode Distribution', 0.4)
+
+
+def scores_chart(stats):
+    # 7. Average Scores by Mode (ถ้ามีข้อมูล)
+    mode_scores = sorted(stats['score_sums']['mode'].items(), key=lambda item: str(item[0]))
+    if mode_scores:
+        x = [mode for mode, _ in mode_scores]
+        y = [total / count for _, (total, count) in mode_scores]
+    else:
+        x, y = ['No data'], [0]
+    return {
+        'data': [{
+            'x': x,
+            'y': y,
+            'type': 'bar',
+            'marker': {'color': '#FF6B6B'}
+        }],
+        'layout': {
+            'title': 'Average Scores by Test Mode',
+            'xaxis': {'title': 'Test Mode'},
+            'yaxis': {'title': 'Average Score'},
+            'height': 400
+        }
+    }
+
+
+def device_type_chart(stats):
+    # Device type mix (pie)
+    return _pie(top_counts(stats['counts']['device_type']), 'Device Type Mix', 0.35)
+
+
+def ram_tier_chart(stats):
+    # RAM Tiers
+    tiers = {label: 0 for _, label in RAM_TIERS}
+    for ram, count in stats['counts']['ram_gb'].items():
+        label = ram_tier(ram)
+        if label is not None:
+            tiers[label] += count
+    return _pie(list(tiers.items()), 'RAM Tier Distribution', 0.35)
+
+
+def brand_heatmap_chart(stats):
+    # CPU vs GPU Brand Heatmap
+    pairs = stats['counts']['brand_pair']
+    cpu_brands = sorted({cpu for cpu, _ in pairs}, key=str)
+    gpu_brands = sorted({gpu for _, gpu in pairs}, key=str)
+    return {
+        'data': [{
+            'z': [[pairs.get((cpu, gpu), 0) for gpu in gpu_brands] for cpu in cpu_brands],
+            'x': [str(gpu) for gpu in gpu_brands],
+            'y': [str(cpu) for cpu in cpu_brands],
+            'type': 'heatmap',
+            'colorscale': 'Blues'
+        }],
+        'layout': {
+            'title': 'CPU vs GPU Brand Heatmap',
+            'height': 400
+        }
+    }
+
+
+def combo_chart(stats):
+    # Top CPU+GPU combos (bar)
+    return _bar_h(top_counts(stats['counts']['combo'], 10), 'Top CPU+GPU Combos',
+                  'Count', 'CPU + GPU', '#546de5')
+
+
+def top_cpu_chart(stats):
+    # Top 10 CPUs by average score (marketing insight: stronger CPU -> better AI performance)
+    averages = [(cpu, total / count) for cpu, (total, count) in stats['score_sums']['cpu_model'].items() if count]
+    top_cpu = sorted(averages, key=lambda item: item[1], reverse=True)[:10][::-1]
+    hists = stats['score_hists']['cpu_model']
+    hovertext = [_percentiles_label(hists.get(cpu, {})) for cpu, _ in top_cpu]
+    return _bar_h(top_cpu, 'Top 10 CPUs by Avg Score', 'Average Score', 'CPU Model', '#10b981', height=450,
+                  hovertext=hovertext)
+
+
+def _quantiles_card(bins):
+    values = histogram_quantiles(bins)
+    return 'N/A' if values[0] is None else ' / '.join(f'{value:.1f}' for value in values)
+
+
+def _percentiles_label(bins):
+    values = histogram_quantiles(bins)
+    if values[0] is None:
+        return 'N/A'
+    return ' · '.join(f'p{round(q * 100)} {value:.1f}' for q, value in zip(SCORE_QUANTILES, values))
+
+
+def score_hist_chart(stats):
+    # Score histogram (pre-binned, plotly sums the counts per bin) with p50/p90/p99 markers
+    bins = sorted(stats['score_bins'].items())
+    quantiles = [(q, value) for q, value in zip(SCORE_QUANTILES, histogram_quantiles(stats['score_bins']))
+                 if value is not None]
+    return {
+        'data': [{
+            'x': [bucket + 0.5 for bucket, _ in bins],
+            'y': [count for _, count in bins],
+            'type': 'histogram',
+            'histfunc': 'sum',
+            'marker': {'color': '#f093fb'}
+        }],
+        'layout': {
+            'title': 'Score Distribution',
+            'xaxis': {'title': 'Avg Score'},
+            'yaxis': {'title': 'Frequency'},
+            'height': 400,
+            'shapes': [{'type': 'line', 'xref': 'x', 'yref': 'paper', 'x0': value, 'x1': value, 'y0': 0, 'y1': 1,
+                        'line': {'color': '#374151', 'width': 1, 'dash': 'dot'}} for _, value in quantiles],
+            'annotations': [{'xref': 'x', 'yref': 'paper', 'x': value, 'y': 1, 'yanchor': 'bottom',
+                             'text': f'p{round(q * 100)} {value:.1f}', 'showarrow': False} for q, value in quantiles]
+        }
+    }
+
+
+def score_percentiles_chart(stats):
+    # p50/p90/p99 per test mode from the per-mode score histograms
+    modes = sorted(stats['score_hists']['mode'], key=str)
+    per_mode = [histogram_quantiles(stats['score_hists']['mode'][mode]) for mode in modes]
+    colors = ['#667eea', '#f59e0b', '#ef4444']
+    return {
+        'data': [{
+            'x': [str(mode) for mode in modes],
+            'y': [values[i] for values in per_mode],
+            'name': f'p{round(q * 100)}',
+            'type': 'bar',
+            'marker': {'color': colors[i]}
+        } for i, q in enumerate(SCORE_QUANTILES)],
+        'layout': {
+            'title': 'Score Percentiles by Test Mode',
+            'barmode': 'group',
+            'xaxis': {'title': 'Test Mode'},
+            'yaxis': {'title': 'Avg Score'},
+            'height': 400
+        }
+    }
+
+
+# /api/charts/<name> -> chart builder
+CHARTS = {
+    'cpu': cpu_chart,
+    'gpu': gpu_chart,
+    'ram': ram_chart,
+    'brand': brand_chart,
+    'daily': daily_chart,
+    'mode': mode_chart,
+    'scores': scores_chart,
+    'device_type': device_type_chart,
+    'ram_tier': ram_tier_chart,
+    'heatmap': brand_heatmap_chart,
+    'combos': combo_chart,
+    'top_cpu': top_cpu_chart,
+    'score_hist': score_hist_chart,
+    'score_percentiles': score_percentiles_chart,
+}
+
+# Rollup dimensions each chart reads ('total' is always loaded)
+CHART_DIMENSIONS = {
+    'cpu': ['cpu_model'],
+    'gpu': ['gpu_model'],
+    'ram': ['ram_gb'],
+    'brand': ['cpu_brand', 'gpu_brand'],
+    'daily': ['day'],
+    'mode': ['mode'],
+    'scores': ['mode'],
+    'device_type': ['device_type'],
+    'ram_tier': ['ram_gb'],
+    'heatmap': ['brand_pair'],
+    'combos': ['combo'],
+    'top_cpu': ['cpu_model', 'cpu_score_bin'],
+    'score_hist': ['score_bin'],
+    'score_percentiles': ['mode_score_bin'],
+}
+SUMMARY_DIMENSIONS = ['cpu_model', 'gpu_model', 'combo', 'score_bin']
+# Charts that only show the top entries of one dimension (served from sketches when built)
+TOP_K_CHARTS = ['cpu', 'gpu', 'combos']
+
+
+def chart_json(name, stats):
+    """Plotly figure JSON for one chart"""
+    return json.dumps(CHARTS[name](stats))
+
+
+def build_summary(stats):
+    """Stat card values for ADMIN_TEMPLATE"""
+    total = stats['total']
+    prev_cnt = stats['tests_prev_7d']
+    combos = top_counts(stats['counts']['combo'], 1)
+    return {
+        'total_tests': total,
+        'unique_cpus': stats['distinct'].get('cpu_model', sum(1 for cpu in stats['counts']['cpu_model'] if cpu is not None)),
+        'unique_gpus': stats['distinct'].get('gpu_model', sum(1 for gpu in stats['counts']['gpu_model'] if gpu is not None)),
+        'avg_ram': round(stats['ram_sum'] / stats['ram_count'], 1) if stats['ram_count'] else 0,
+        'tests_last_7d': stats['tests_last_7d'],
+        'growth_7d_pct': round(((stats['tests_last_7d'] - prev_cnt) / (prev_cnt if prev_cnt > 0 else 1)) * 100.0, 1),
+        'avg_score_overall': round(stats['score_sum'] / stats['score_count'], 1) if stats['score_count'] else 0,
+        'top_combo_label': combos[0][0] if combos else 'N/A',
+        'score_percentiles_label': _quantiles_card(stats['score_bins']),
+    }
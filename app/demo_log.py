@@ -0,0 +1,412 @@
+"""
+Persistence for demo_store.RecordStore: an append-only binary log plus
+periodic compacted snapshots, all in one directory (DEMO_DATA_DIR).
+
+    snapshot-<seq>.bin   the whole store before record <seq>
+    log-<seq>.bin        records <seq>, <seq + 1>, ... one frame each
+
+A frame is ``<length u32><crc32 u32><payload>``. The payload is either a
+new dictionary value (``V``) or a record as its column codes (``R``,
+about 90 bytes). Appends go to a buffer that a background thread writes
+and fsyncs every DEMO_LOG_FLUSH_MS, so a crash loses at most that
+unflushed tail. On restore a torn or corrupt last frame is cut off.
+
+After DEMO_SNAPSHOT_EVERY logged records the store is written to a new
+snapshot and a new log is started. Older files are removed once the
+snapshot is in place. Restore maps the newest snapshot with mmap, copies
+each column out of the mapping in one call (the store keeps appending to
+them) and replays the log behind it.
+
+Only one process can own a directory (``StoreLocked`` otherwise):
+
+    python demo_log.py status  data/
+    python demo_log.py seed    data/ 1000000    # synthetic records without HTTP
+    python demo_log.py compact data/
+"""
+
+import fcntl
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+
+from demo_store import CODE_FIELDS, OTHER, RecordStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLUSH_MS = 100
+DEFAULT_SNAPSHOT_EVERY = 50000
+MAGIC = b'DEMOSNAP1\n'
+FRAME = struct.Struct('<II')  # payload length, crc32 of the payload
+VALUE = struct.Struct('<cBI')  # b'V', field (CODE_FIELDS index), code; then the value as JSON
+ROW = struct.Struct(f'<c16sqBBdd{len(CODE_FIELDS)}I')  # b'R', id, created_at, kind, mask, total, avg, codes
+MAX_FRAME = 1 << 24
+
+
+class StoreLocked(Exception):
+    """Raised by open_store() when another process already owns the directory"""
+
+
+def _frame(payload):
+    return FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+def _dumps(value):
+    return json.dumps(value, separators=(',', ':'), default=str).encode()
+
+
+def _files(directory, prefix):
+    """[(seq, path)] of `prefix`<seq>.bin files, oldest first"""
+    found = []
+    for name in os.listdir(directory):
+        if name.startswith(prefix) and name.endswith('.bin') and name[len(prefix):-4].isdigit():
+            found.append((int(name[len(prefix):-4]), os.path.join(directory, name)))
+    return sorted(found)
+
+
+def _fsync_dir(directory):
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+# -- snapshots ------------------------------------------------------------------------------
+
+def capture(store):
+    """Copy of the store's state as (header, [(name, typecode, bytes)]); call with the store lock held"""
+    sections = [('ids', 'B', bytes(store.ids))]
+    for name in ('created_at', 'kind', 'detail_mask', 'total_time', 'avg_score'):
+        column = getattr(store, name)
+        sections.append((name, column.typecode, column.tobytes()))
+    for field in CODE_FIELDS:
+        column = store.columns[field].data
+        sections.append((f'column.{field}', column.typecode, column.tobytes()))
+        sections.append((f'counts.{field}', 'q', store.encodings[field].counts.tobytes()))
+    for field, index in store.indexes.items():
+        # posting lists without their evicted prefix, concatenated per field
+        codes, lengths, postings = array('I'), array('I'), array('I')
+        for code, (seqs, evicted) in index.items():
+            codes.append(code)
+            lengths.append(len(seqs) - evicted)
+            postings.extend(seqs[evicted:])
+        sections += [(f'index.{field}.codes', 'I', codes.tobytes()),
+                     (f'index.{field}.lengths', 'I', lengths.tobytes()),
+                     (f'index.{field}.postings', 'I', postings.tobytes())]
+    header = {
+        'capacity': store.capacity,
+        'next': store._next,
+        'indexes': list(store.indexes),
+        'values': {field: list(store.encodings[field].values) for field in CODE_FIELDS},
+        'other_details': list(store.other_details.items()),
+        'day_counts': list(store.day_counts_.items()),
+        'ram_sum': store.ram_sum,
+        'ram_count': store.ram_count,
+    }
+    return header, sections
+
+
+def write_snapshot(directory, header, sections):
+    """Write snapshot-<next>.bin atomically (temp file, fsync, rename); returns its path"""
+    offset = 0
+    header = dict(header, sections=[])
+    for name, typecode, data in sections:
+        header['sections'].append([name, typecode, offset, len(data)])
+        offset = _align(offset + len(data))
+    encoded = _dumps(header)
+    base = _align(len(MAGIC) + 8 + len(encoded))
+    path = os.path.join(directory, f"snapshot-{header['next']:012d}.bin")
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC + struct.pack('<Q', len(encoded)) + encoded)
+        for (_, _, data), (_, _, start, _) in zip(sections, header['sections']):
+            f.seek(base + start)
+            f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    _fsync_dir(directory)
+    return path
+
+
+def load_snapshot(path):
+    """RecordStore from a snapshot file, with its columns copied out of an mmap of the file"""
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'{path} is not a demo store snapshot')
+        (header_length,) = struct.unpack_from('<Q', mm, len(MAGIC))
+        header = json.loads(mm[len(MAGIC) + 8:len(MAGIC) + 8 + header_length])
+        base = _align(len(MAGIC) + 8 + header_length)
+        sections = {}
+        with memoryview(mm) as view:
+            for name, typecode, start, length in header['sections']:
+                if base + start + length > len(mm):
+                    raise ValueError(f'{path} is truncated')
+                column = array(typecode)
+                with view[base + start:base + start + length] as data:
+                    column.frombytes(data)
+                sections[name] = column
+
+    store = RecordStore(capacity=header['capacity'], indexes=header['indexes'])
+    store._next = header['next']
+    store.ids = bytearray(sections['ids'])
+    for name in ('created_at', 'kind', 'detail_mask', 'total_time', 'avg_score'):
+        setattr(store, name, sections[name])
+    for field in CODE_FIELDS:
+        encoding = store.encodings[field]
+        encoding.values = [sys.intern(value) if isinstance(value, str) else value for value in header['values'][field]]
+        encoding.codes = {value: code for code, value in enumerate(encoding.values)}
+        encoding.counts = sections[f'counts.{field}']
+        store.columns[field].data = sections[f'column.{field}']
+    for field, index in store.indexes.items():
+        postings, start = sections[f'index.{field}.postings'], 0
+        for code, length in zip(sections[f'index.{field}.codes'], sections[f'index.{field}.lengths']):
+            index[code] = [postings[start:start + length], 0]
+            start += length
+    store.other_details = {seq: value for seq, value in header['other_details']}
+    store.day_counts_ = {day: n for day, n in header['day_counts']}
+    store.ram_sum, store.ram_count = header['ram_sum'], header['ram_count']
+    return store
+
+
+# -- log --------------------------------------------------------------------------------------
+
+def replay(store, path):
+    """Apply the frames of one log to `store`, cutting off a torn tail; returns the number of records"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    offset = records = 0
+    while offset + FRAME.size <= len(data):
+        length, crc = FRAME.unpack_from(data, offset)
+        start = offset + FRAME.size
+        payload = data[start:start + length]
+        if length > MAX_FRAME or len(payload) < length or zlib.crc32(payload) != crc:
+            break
+        if payload[:1] == b'V':
+            _, field, code = VALUE.unpack_from(payload)
+            encoding = store.encodings[CODE_FIELDS[field]]
+            if code != len(encoding.values) or encoding.encode(json.loads(payload[VALUE.size:])) != code:
+                logger.error(f'{path}: dictionary value out of order at byte {offset}')
+                break
+        else:
+            row = ROW.unpack_from(payload)
+            other = json.loads(payload[ROW.size:]) if row[3] == OTHER else None
+            store._insert(row[1], row[2], (list(row[7:]), row[3], row[4], row[5], row[6], other))
+            records += 1
+        offset = start + length
+    if offset < len(data):
+        # เขียนค้างอยู่ตอน process ตาย: ตัดส่วนท้ายที่ไม่สมบูรณ์ทิ้งเพื่อให้ต่อท้ายได้ถูกต้อง
+        logger.warning(f'{path}: dropping {len(data) - offset} bytes of torn or corrupt log tail')
+        os.truncate(path, offset)
+    return records
+
+
+def restore(directory, capacity=None):
+    """(store, seq of the log to continue, records in that log) from the newest snapshot and its logs"""
+    store = None
+    for seq, path in reversed(_files(directory, 'snapshot-')):
+        try:
+            store = load_snapshot(path)
+            break
+        except (OSError, ValueError) as e:
+            logger.error(f'Skipping snapshot {path}: {e}')
+    if store is None:
+        store = RecordStore(capacity=capacity)
+    elif store.capacity != capacity:
+        logger.warning(f'Snapshot capacity {store.capacity} kept (DEMO_STORE_CAPACITY={capacity})')
+
+    log_seq, replayed = store._next, 0
+    for seq, path in _files(directory, 'log-'):
+        if seq < store._next:
+            continue  # covered by the snapshot
+        if seq > store._next:
+            logger.error(f'{path} starts at record {seq} but the store ends at {store._next}; not replayed')
+            break
+        log_seq, replayed = seq, replay(store, path)
+    return store, log_seq, replayed
+
+
+class Journal:
+    """
+    Append-only log of one store. RecordStore.append() calls record() under
+    the store lock; a background thread writes and fsyncs the buffered frames
+    and takes a snapshot every `snapshot_every` records.
+    """
+
+    def __init__(self, store, directory, lock_fd, flush_interval=DEFAULT_FLUSH_MS / 1000.0,
+                 snapshot_every=DEFAULT_SNAPSHOT_EVERY):
+        self.store = store
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.snapshot_every = snapshot_every
+        self._lock_fd = lock_fd
+        self._buffer = bytearray()
+        self._lock = threading.Lock()  # buffer
+        self._io_lock = threading.Lock()  # log file; taken before _lock
+        self._snapshot_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._fd = None
+        self._defined = [len(store.encodings[field].values) for field in CODE_FIELDS]
+        self.logged = 0
+        self.snapshots = 0
+
+    def open_log(self, seq, logged=0):
+        self._fd = os.open(os.path.join(self.directory, f'log-{seq:012d}.bin'),
+                           os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        _fsync_dir(self.directory)
+        self.logged = logged
+        self._ensure_started()
+
+    def record(self, store, seq, id_bytes, created_us, row):
+        codes, kind, mask, total_time, avg_score, other = row
+        frames = b''
+        for field, defined in enumerate(self._defined):
+            values = store.encodings[CODE_FIELDS[field]].values
+            for code in range(defined, len(values)):
+                frames += _frame(VALUE.pack(b'V', field, code) + _dumps(values[code]))
+            self._defined[field] = len(values)
+        payload = ROW.pack(b'R', id_bytes, created_us, kind, mask, total_time, avg_score, *codes)
+        if kind == OTHER:
+            payload += _dumps(other)
+        with self._lock:
+            self._buffer += frames
+            self._buffer += _frame(payload)
+            self.logged += 1
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='demo-log-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stopping.wait(self.flush_interval):
+            try:
+                self.flush()
+                if self.logged >= self.snapshot_every:
+                    self.snapshot()
+            except Exception as e:
+                logger.error(f'Demo log flush failed: {e}')
+
+    def _write_buffer(self):
+        """Write and fsync the buffered frames; call with _io_lock held"""
+        with self._lock:
+            data, self._buffer = self._buffer, bytearray()
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self._fd, view):]
+        if data:
+            os.fsync(self._fd)
+
+    def flush(self):
+        with self._io_lock:
+            self._write_buffer()
+
+    def snapshot(self):
+        """Write a snapshot of the store, start a new log and remove the files it replaces"""
+        with self._snapshot_lock:
+            started = time.perf_counter()
+            with self.store._lock:
+                header, sections = capture(self.store)
+                seq, records = self.store._next, len(self.store)
+                # ปิด log เดิมและเปิด log ใหม่ที่จุดเดียวกับ snapshot
+                with self._io_lock:
+                    self._write_buffer()
+                    os.close(self._fd)
+                    self._fd = os.open(os.path.join(self.directory, f'log-{seq:012d}.bin'),
+                                       os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+                self._defined = [len(values) for values in header['values'].values()]
+                self.logged = 0
+            path = write_snapshot(self.directory, header, sections)
+            for prefix in ('snapshot-', 'log-'):
+                for old_seq, old_path in _files(self.directory, prefix):
+                    if old_seq < seq:
+                        os.remove(old_path)
+            self.snapshots += 1
+            logger.info(f'Demo store snapshot {path}: {records} records '
+                        f'in {time.perf_counter() - started:.2f}s')
+            return path
+
+    def close(self):
+        """Flush the log, stop the flusher and release the directory"""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+        self.flush()
+        os.close(self._fd)
+        os.close(self._lock_fd)
+
+
+def open_store(directory, capacity=None, flush_interval=DEFAULT_FLUSH_MS / 1000.0,
+               snapshot_every=DEFAULT_SNAPSHOT_EVERY):
+    """Restore the store persisted in `directory` (created if missing) and log every new record to it"""
+    os.makedirs(directory, exist_ok=True)
+    lock_fd = os.open(os.path.join(directory, 'LOCK'), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(lock_fd)
+        raise StoreLocked(f'{directory} is used by another process')
+    try:
+        store, log_seq, replayed = restore(directory, capacity)
+    except Exception:
+        os.close(lock_fd)
+        raise
+    journal = Journal(store, directory, lock_fd, flush_interval, snapshot_every)
+    journal.open_log(log_seq, replayed)
+    store.journal = journal
+    return store
+
+
+def open_store_from_env(directory):
+    return open_store(
+        directory,
+        capacity=int(os.environ['DEMO_STORE_CAPACITY']) if os.environ.get('DEMO_STORE_CAPACITY') else None,
+        flush_interval=int(os.environ.get('DEMO_LOG_FLUSH_MS', DEFAULT_FLUSH_MS)) / 1000.0,
+        snapshot_every=int(os.environ.get('DEMO_SNAPSHOT_EVERY', DEFAULT_SNAPSHOT_EVERY)),
+    )
+
+
+def main(argv):
+    if len(argv) < 2 or argv[0] not in ('status', 'seed', 'compact'):
+        print(__doc__)
+        return 1
+    command, directory = argv[0], argv[1]
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    started = time.perf_counter()
+    store = open_store_from_env(directory)
+    print(f'Restored {len(store)} records in {time.perf_counter() - started:.2f}s')
+    try:
+        if command == 'status':
+            for prefix in ('snapshot-', 'log-'):
+                for _, path in _files(directory, prefix):
+                    print(f'{os.path.basename(path):>26} {os.path.getsize(path) / 2 ** 20:>9.1f} MB')
+        elif command == 'seed':
+            from synthetic import generate_records
+
+            n = int(argv[2]) if len(argv) > 2 else 100000
+            started = time.perf_counter()
+            for record in generate_records(n, seed=int(time.time())):
+                store.append(record)
+            print(f'Added {n} records in {time.perf_counter() - started:.2f}s')
+            store.journal.snapshot()
+        else:
+            store.journal.snapshot()
+    finally:
+        store.journal.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,324 @@
+"""
+Compact in-memory record store for app_demo.py.
+
+Records are kept column by column instead of one dict each:
+
+* ``_id``: the 16 raw bytes of a uuid4 in one ``bytearray``
+* brands, models, device type, RAM size, test mode and test type:
+  dictionary-encoded ``array('H')`` codes (widened to ``'i'`` past 65535
+  distinct values) over interned values
+* ``created_at``: ``array('q')`` epoch microseconds (UTC)
+* ``test_details``: the usual ``{test_type, mode, total_time, avg_score}``
+  dict as typed columns plus a key mask; free text as an encoded string;
+  anything else in a sparse side table
+
+That is about 60 bytes per record, or about 90 with the default indexes
+(4 bytes per record and indexed field), instead of about 400 for a list of
+dicts (see bench_store.py). Per-category counts, per-day counts and the RAM sum are
+maintained on write, so the dashboard reads them in O(categories).
+
+``capacity`` turns the store into a ring buffer: once full, each new record
+overwrites the oldest one. Per-field hash indexes map a value to the
+sequence numbers of its records and serve equality filters in /list.
+Records are materialized as dicts only when read (``iter_docs``).
+"""
+
+import sys
+import threading
+import uuid
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone
+
+CATEGORICAL_FIELDS = ['test_device_type', 'cpu_brand', 'cpu_model', 'gpu_brand', 'gpu_model', 'ram_gb']
+DETAIL_FIELDS = ['test_type', 'mode', 'total_time', 'avg_score']
+# Dictionary-encoded columns: the categorical fields, test_details.mode/test_type and free-text details
+CODE_FIELDS = CATEGORICAL_FIELDS + ['mode', 'test_type', 'text']
+DEFAULT_INDEXES = ['test_device_type', 'cpu_brand', 'cpu_model', 'gpu_brand', 'gpu_model', 'ram_gb', 'mode']
+
+# test_details kinds
+NO_DETAILS, STRUCTURED, TEXT, OTHER = 0, 1, 2, 3
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+_DAY_US = 86400 * 1000000
+_NAN = float('nan')
+_RAM = CODE_FIELDS.index('ram_gb')
+
+
+def _epoch_us(value):
+    if value.tzinfo is not None:
+        value = value.replace(tzinfo=None) - value.utcoffset()
+    return (value - _EPOCH) // _MICROSECOND
+
+
+class Encoding:
+    """Interned values <-> small integer codes, with a live count per code (code 0 = None)"""
+
+    def __init__(self):
+        self.values = [None]
+        self.codes = {None: 0}
+        self.counts = array('q', [0])
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            if isinstance(value, str):
+                value = sys.intern(value)
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+            self.counts.append(0)
+        return code
+
+    def value_counts(self):
+        """{value: count}, missing (None) values skipped like pandas value_counts()"""
+        return {self.values[code]: n for code, n in enumerate(self.counts) if n and code}
+
+
+class CodeColumn:
+    """array of codes, 'H' until a code needs more than 16 bits"""
+
+    def __init__(self):
+        self.data = array('H')
+
+    def set(self, position, code):
+        if code > 0xFFFF and self.data.typecode == 'H':
+            self.data = array('i', self.data)
+        if position == len(self.data):
+            self.data.append(code)
+        else:
+            self.data[position] = code
+
+
+class RecordStore:
+
+    def __init__(self, capacity=None, indexes=DEFAULT_INDEXES):
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._next = 0
+        self.encodings = {field: Encoding() for field in CODE_FIELDS}
+        self.columns = {field: CodeColumn() for field in CODE_FIELDS}
+        self.ids = bytearray()
+        self.created_at = array('q')
+        self.kind = array('B')
+        self.detail_mask = array('B')
+        self.total_time = array('d')
+        self.avg_score = array('d')
+        self.other_details = {}
+        self.day_counts_ = {}
+        self.ram_sum = 0.0
+        self.ram_count = 0
+        # field -> {code: [array of sequence numbers, number of evicted entries at the front]}
+        self.indexes = {field: {} for field in indexes}
+        # demo_log.Journal when the store is persisted (called under the lock for every append)
+        self.journal = None
+
+    def __len__(self):
+        return self._next - self.oldest
+
+    @property
+    def oldest(self):
+        """Sequence number of the oldest record still stored"""
+        return self._next - self.capacity if self.capacity and self._next > self.capacity else 0
+
+    def _slot(self, seq):
+        return seq % self.capacity if self.capacity else seq
+
+    # -- writes ---------------------------------------------------------------------------
+
+    def append(self, doc):
+        """Store one document (``_id`` and ``created_at`` are assigned); returns its id string"""
+        for field in CATEGORICAL_FIELDS:
+            if not _scalar(doc.get(field)):
+                raise ValueError(f'{field} must be a string or a number')
+        record_id = uuid.uuid4()
+        created_us = _epoch_us(doc.get('created_at') or datetime.now(timezone.utc))
+        with self._lock:
+            row = self._encode(doc)
+            seq = self._insert(record_id.bytes, created_us, row)
+            if self.journal is not None:
+                self.journal.record(self, seq, record_id.bytes, created_us, row)
+        return str(record_id)
+
+    def extend(self, docs):
+        return [self.append(doc) for doc in docs]
+
+    def _encode(self, doc):
+        """doc -> row: (codes in CODE_FIELDS order, kind, detail mask, total_time, avg_score, other details)"""
+        codes = [self.encodings[field].encode(doc.get(field)) for field in CATEGORICAL_FIELDS]
+        details = doc.get('test_details')
+        kind, mask, total_time, avg_score, other = NO_DETAILS, 0, _NAN, _NAN, None
+        text_code = mode_code = type_code = 0
+        if isinstance(details, dict) and details and set(details) <= set(DETAIL_FIELDS) and \
+                _plain(details.get('total_time')) and _plain(details.get('avg_score')) and \
+                isinstance(details.get('mode', ''), str) and isinstance(details.get('test_type', ''), str):
+            kind = STRUCTURED
+            for bit, field in enumerate(DETAIL_FIELDS):
+                if field in details:
+                    mask |= 1 << bit
+            mode_code = self.encodings['mode'].encode(details.get('mode', 'unknown'))
+            type_code = self.encodings['test_type'].encode(details.get('test_type'))
+            total_time = _NAN if details.get('total_time') is None else float(details['total_time'])
+            avg_score = _NAN if details.get('avg_score') is None else float(details['avg_score'])
+        elif isinstance(details, str):
+            kind = TEXT
+            text_code = self.encodings['text'].encode(details)
+        elif details is not None:
+            kind, other = OTHER, details
+        if kind != STRUCTURED:
+            # โหมดของรายการที่ไม่มี dict ตามรูปแบบนับเป็น 'unknown' เหมือน dashboard ของ app.py
+            mode = details.get('mode', 'unknown') if isinstance(details, dict) else 'unknown'
+            mode_code = self.encodings['mode'].encode(mode if isinstance(mode, str) else 'unknown')
+        codes += [mode_code, type_code, text_code]
+        return codes, kind, mask, total_time, avg_score, other
+
+    def _insert(self, id_bytes, created_us, row):
+        """Store an encoded row as the next record, evicting the oldest one if full; returns its seq"""
+        seq = self._next
+        slot = self._slot(seq)
+        if slot < len(self.kind):
+            self._evict(slot, seq - self.capacity)
+        self._put(slot, seq, id_bytes, created_us, row)
+        self._next += 1
+        return seq
+
+    def _put(self, slot, seq, id_bytes, created_us, row):
+        codes, kind, mask, total_time, avg_score, other = row
+        appending = slot == len(self.kind)
+        if appending:
+            self.ids += id_bytes
+        else:
+            self.ids[slot * 16:slot * 16 + 16] = id_bytes
+        if other is not None:
+            self.other_details[seq] = other
+
+        for field, code in zip(CODE_FIELDS, codes):
+            self.columns[field].set(slot, code)
+            self.encodings[field].counts[code] += 1
+            index = self.indexes.get(field)
+            if index is not None:
+                index.setdefault(code, [array('I'), 0])[0].append(seq)
+        for column, value in ((self.created_at, created_us), (self.kind, kind), (self.detail_mask, mask),
+                              (self.total_time, total_time), (self.avg_score, avg_score)):
+            if appending:
+                column.append(value)
+            else:
+                column[slot] = value
+
+        day = created_us // _DAY_US
+        self.day_counts_[day] = self.day_counts_.get(day, 0) + 1
+        ram = self.encodings['ram_gb'].values[codes[_RAM]]
+        if _plain(ram) and ram is not None:
+            self.ram_sum += ram
+            self.ram_count += 1
+
+    def _evict(self, slot, seq):
+        """Forget the record `seq` stored in `slot` before it is overwritten"""
+        for field, column in self.columns.items():
+            code = column.data[slot]
+            self.encodings[field].counts[code] -= 1
+            index = self.indexes.get(field)
+            if index is not None:
+                entry = index[code]
+                # รายการถูกลบตามลำดับ seq (FIFO) จึงเป็นตัวแรกที่ยังไม่ถูกลบใน posting list เสมอ
+                entry[1] += 1
+                postings = entry[0]
+                if entry[1] >= 1024 and entry[1] * 2 >= len(postings):
+                    del postings[:entry[1]]
+                    entry[1] = 0
+        day = self.created_at[slot] // _DAY_US
+        self.day_counts_[day] -= 1
+        if not self.day_counts_[day]:
+            del self.day_counts_[day]
+        ram = self.encodings['ram_gb'].values[self.columns['ram_gb'].data[slot]]
+        if _plain(ram) and ram is not None:
+            self.ram_sum -= ram
+            self.ram_count -= 1
+        self.other_details.pop(seq, None)
+
+    # -- reads ----------------------------------------------------------------------------
+
+    def doc(self, seq):
+        """Materialize record `seq` as a dict (the shape app_demo.py always returned)"""
+        slot = self._slot(seq)
+        doc = {'_id': str(uuid.UUID(bytes=bytes(self.ids[slot * 16:slot * 16 + 16])))}
+        for field in CATEGORICAL_FIELDS:
+            doc[field] = self.encodings[field].values[self.columns[field].data[slot]]
+        kind = self.kind[slot]
+        if kind == STRUCTURED:
+            mask = self.detail_mask[slot]
+            values = {
+                'test_type': self.encodings['test_type'].values[self.columns['test_type'].data[slot]],
+                'mode': self.encodings['mode'].values[self.columns['mode'].data[slot]],
+                'total_time': _none_if_nan(self.total_time[slot]),
+                'avg_score': _none_if_nan(self.avg_score[slot]),
+            }
+            doc['test_details'] = {field: values[field] for bit, field in enumerate(DETAIL_FIELDS) if mask & (1 << bit)}
+        elif kind == TEXT:
+            doc['test_details'] = self.encodings['text'].values[self.columns['text'].data[slot]]
+        else:
+            doc['test_details'] = self.other_details.get(seq)
+        doc['created_at'] = _EPOCH + self.created_at[slot] * _MICROSECOND
+        return doc
+
+    def iter_docs(self, filters=None, limit=None):
+        """
+        Yield stored records oldest first, optionally only those whose fields
+        equal `filters` ({field: value}, ``mode`` = test_details.mode).
+        """
+        start, end = self.oldest, self._next
+        sequences = range(start, end)
+        checks = []
+        for field, value in (filters or {}).items():
+            code = self.encodings[field].codes.get(value)
+            if code is None:
+                return
+            checks.append((self.columns[field], code))
+            index = self.indexes.get(field)
+            if index is not None:
+                postings = index.get(code, [array('I'), 0])[0]
+                candidates = postings[bisect_left(postings, start):]
+                if len(candidates) < len(sequences):
+                    sequences = candidates
+        emitted = 0
+        for seq in sequences:
+            if seq >= end:
+                break
+            with self._lock:
+                # ใน ring buffer รายการอาจถูกเขียนทับระหว่างอ่าน: ตรวจและสร้าง dict ภายใต้ lock
+                if seq < self.oldest:
+                    continue
+                slot = self._slot(seq)
+                if not all(column.data[slot] == code for column, code in checks):
+                    continue
+                doc = self.doc(seq)
+            yield doc
+            emitted += 1
+            if limit is not None and emitted >= limit:
+                return
+
+    def value_counts(self, field):
+        return self.encodings[field].value_counts()
+
+    def distinct(self, field):
+        return sum(1 for n in self.encodings[field].counts[1:] if n)
+
+    def day_counts(self):
+        """{date: n} of the stored records (UTC days)"""
+        epoch_day = _EPOCH.date()
+        return {epoch_day + timedelta(days=day): n for day, n in sorted(self.day_counts_.items())}
+
+    def ram_mean(self):
+        return self.ram_sum / self.ram_count if self.ram_count else 0.0
+
+
+def _scalar(value):
+    return value is None or isinstance(value, (str, int, float))
+
+
+def _plain(value):
+    return value is None or (type(value) in (int, float))
+
+
+def _none_if_nan(value):
+    return None if value != value else value
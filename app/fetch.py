@@ -0,0 +1,32 @@
+"""
+Projection-limited, columnar fetch of dashboard data.
+
+Only the fields the dashboard reads are requested from MongoDB, and the
+cursor is consumed straight into typed column buffers (see aggregate.py):
+dictionary-encoded codes for brands/models/modes, float64 for RAM and
+scores, int64 epoch microseconds for created_at. No list of per-document
+dicts is ever built.
+"""
+
+from aggregate import ColumnBuilder
+
+DASHBOARD_PROJECTION = {
+    '_id': 0,
+    'test_device_type': 1,
+    'cpu_brand': 1,
+    'cpu_model': 1,
+    'gpu_brand': 1,
+    'gpu_model': 1,
+    'ram_gb': 1,
+    'created_at': 1,
+    'test_details.mode': 1,
+    'test_details.avg_score': 1,
+}
+
+FETCH_BATCH_SIZE = 10000
+
+
+def fetch_columns(collection, query=None, batch_size=FETCH_BATCH_SIZE):
+    """Columns (aggregate.Columns) of the dashboard fields for documents matching `query`"""
+    cursor = collection.find(query or {}, DASHBOARD_PROJECTION, batch_size=batch_size)
+    return ColumnBuilder().extend(cursor).build()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Index management for the process, rollups and history collections.
+
+Indexes are ensured at startup (set ENSURE_INDEXES=0 to skip) and can be
+managed by hand:
+
+    python indexes.py ensure     # create any missing index
+    python indexes.py status     # show expected vs. existing indexes
+"""
+
+import json
+import os
+import sys
+
+from pymongo import ASCENDING, IndexModel, MongoClient
+
+from retention import HISTORY_COLLECTION, HISTORY_INDEXES
+from rollups import ROLLUP_COLLECTION, ROLLUP_INDEXES
+
+PROCESS_INDEXES = [
+    IndexModel([('created_at', ASCENDING)], name='created_at_1'),
+    IndexModel([('cpu_model', ASCENDING), ('created_at', ASCENDING)], name='cpu_model_1_created_at_1'),
+    IndexModel([('gpu_model', ASCENDING), ('created_at', ASCENDING)], name='gpu_model_1_created_at_1'),
+    IndexModel([('cpu_brand', ASCENDING), ('gpu_brand', ASCENDING)], name='cpu_brand_1_gpu_brand_1'),
+    IndexModel([('test_details.mode', ASCENDING)], name='test_details.mode_1'),
+]
+
+# collection name -> IndexModels it should have
+EXPECTED_INDEXES = {
+    'process': PROCESS_INDEXES,
+    ROLLUP_COLLECTION: ROLLUP_INDEXES,
+    HISTORY_COLLECTION: HISTORY_INDEXES,
+}
+
+
+def ensure_indexes(db):
+    """Create missing indexes (no-op for existing ones); returns created index names"""
+    created = []
+    for name, models in EXPECTED_INDEXES.items():
+        existing = db[name].index_information()
+        missing = [model for model in models if model.document['name'] not in existing]
+        if missing:
+            created.extend(db[name].create_indexes(missing))
+    return created
+
+
+def index_status(db):
+    """Per collection: expected index names, which are present and which are missing"""
+    status = {}
+    for name, models in EXPECTED_INDEXES.items():
+        existing = db[name].index_information()
+        expected = [model.document['name'] for model in models]
+        status[name] = {
+            'present': [index for index in expected if index in existing],
+            'missing': [index for index in expected if index not in existing],
+        }
+    return status
+
+
+def plan_index_names(explain):
+    """Index names used by the winning plan of an explain() result"""
+    names = []
+
+    def walk(stage):
+        if not isinstance(stage, dict):
+            return
+        if stage.get('indexName'):
+            names.append(stage['indexName'])
+        for child in ('inputStage', 'queryPlan'):
+            walk(stage.get(child))
+        for child in stage.get('inputStages', []):
+            walk(child)
+
+    walk(explain.get('queryPlanner', {}).get('winningPlan'))
+    return names
+
+
+def main(argv):
+    if len(argv) != 2 or argv[1] not in ('ensure', 'status'):
+        print(f"Usage: {argv[0]} ensure|status")
+        return 2
+
+    client = MongoClient(os.environ.get('MONGODB_URI', 'mongodb://localhost:27017'))
+    db = client["system-monitor"]
+    if argv[1] == 'ensure':
+        created = ensure_indexes(db)
+        print(f"✅ Created {len(created)} index(es): {', '.join(created) or '-'}")
+    print(json.dumps(index_status(db), indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,159 @@
+"""
+Write-behind ingest queue for /submit.
+
+Accepted documents go into a bounded in-process queue; a background flusher
+thread groups them into unordered ``insert_many`` calls, flushing when a
+batch fills up or the flush window expires. When the queue is full,
+``put()`` raises ``QueueFull`` so the endpoint can answer 503 with
+Retry-After instead of blocking the worker. ``close()`` drains whatever is
+still queued.
+
+Enabled with ``WRITE_BEHIND=1``; tuned with ``WRITE_BEHIND_QUEUE_SIZE``,
+``WRITE_BEHIND_BATCH_SIZE`` and ``WRITE_BEHIND_FLUSH_MS``.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+
+from bson import ObjectId
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_SIZE = 10000
+DEFAULT_BATCH_SIZE = 500
+DEFAULT_FLUSH_MS = 50
+FLUSH_RETRIES = 3
+DUPLICATE_KEY = 11000
+
+
+class QueueFull(Exception):
+    """Raised by WriteBehindQueue.put() when the queue is at capacity"""
+
+
+class WriteBehindQueue:
+
+    def __init__(self, collection, on_flush=None, max_size=DEFAULT_QUEUE_SIZE,
+                 batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_MS / 1000.0):
+        self.collection = collection
+        self.on_flush = on_flush
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_size)
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.inserted = 0
+        self.failed = 0
+
+    @classmethod
+    def from_env(cls, collection, on_flush=None):
+        return cls(
+            collection,
+            on_flush=on_flush,
+            max_size=int(os.environ.get('WRITE_BEHIND_QUEUE_SIZE', DEFAULT_QUEUE_SIZE)),
+            batch_size=int(os.environ.get('WRITE_BEHIND_BATCH_SIZE', DEFAULT_BATCH_SIZE)),
+            flush_interval=int(os.environ.get('WRITE_BEHIND_FLUSH_MS', DEFAULT_FLUSH_MS)) / 1000.0,
+        )
+
+    def put(self, doc):
+        """Queue a document and return its (pre-assigned) _id"""
+        if self._stopping.is_set():
+            raise QueueFull('Ingest queue is shutting down')
+        self._ensure_started()
+        doc.setdefault('_id', ObjectId())
+        try:
+            self._queue.put_nowait(doc)
+        except queue.Full:
+            raise QueueFull('Ingest queue is full')
+        return doc['_id']
+
+    def depth(self):
+        return self._queue.qsize()
+
+    def _ensure_started(self):
+        # Started lazily so the thread is created in the serving process (after a gunicorn fork)
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='write-behind-flusher', daemon=True)
+                self._thread.start()
+
+    def _next_batch(self):
+        """Block for the first document, then collect until the batch is full or the window closes"""
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                self._flush(batch)
+
+    def _flush(self, batch):
+        failed = set()
+        for attempt in range(1, FLUSH_RETRIES + 1):
+            try:
+                self.collection.insert_many(batch, ordered=False)
+                break
+            except BulkWriteError as e:
+                errors = e.details.get('writeErrors', [])
+                if attempt > 1:
+                    # _id ถูกกำหนดไว้ก่อนส่ง: duplicate key ตอน retry คือเอกสารที่ครั้งก่อนเขียนไปแล้ว
+                    errors = [error for error in errors if error.get('code') != DUPLICATE_KEY]
+                failed = {error['index'] for error in errors}
+                for error in errors:
+                    logger.error(f"Write-behind insert failed: {error.get('errmsg')}")
+                break
+            except AutoReconnect as e:
+                if attempt == FLUSH_RETRIES:
+                    logger.error(f"Write-behind dropped {len(batch)} documents after {attempt} attempts: {e}")
+                    failed = set(range(len(batch)))
+                else:
+                    time.sleep(0.2 * attempt)
+            except Exception as e:
+                logger.error(f"Write-behind dropped {len(batch)} documents: {e}")
+                failed = set(range(len(batch)))
+                break
+
+        inserted = [doc for index, doc in enumerate(batch) if index not in failed]
+        self.inserted += len(inserted)
+        self.failed += len(failed)
+        if inserted and self.on_flush is not None:
+            try:
+                self.on_flush(inserted)
+            except Exception as e:
+                logger.error(f"Write-behind flush callback failed: {e}")
+
+    def close(self, timeout=10.0):
+        """Stop accepting documents and flush everything already queued"""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if not self._queue.empty():
+            # Flusher never started or did not finish in time: drain inline
+            remaining = []
+            while True:
+                try:
+                    remaining.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            for start in range(0, len(remaining), self.batch_size):
+                self._flush(remaining[start:start + self.batch_size])
+        logger.info(f"Write-behind queue closed: {self.inserted} inserted, {self.failed} failed")
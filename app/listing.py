@@ -0,0 +1,128 @@
+"""
+Query-string parsing for the /list endpoint: limit, keyset cursor,
+field projection and equality filters.
+
+Pages are ordered by ``_id`` (default) or ``created_at`` and continued with
+the ``after`` cursor returned in the ``X-Next-Cursor`` header:
+
+    /list?limit=500
+    /list?limit=500&after=665f1c2e9b1e8a3d4c2b1a09
+    /list?sort=created_at&after=2024-06-04T10:15:00,665f1c2e9b1e8a3d4c2b1a09
+    /list?cpu_brand=AMD&mode=ai&fields=cpu_model,gpu_model,created_at
+    /list?format=ndjson          # stream every matching document
+"""
+
+from datetime import datetime
+
+from bson import ObjectId
+from bson.errors import InvalidId
+
+DEFAULT_LIMIT = 1000
+MAX_LIMIT = 10000
+STREAM_BATCH_SIZE = 1000
+
+SORT_FIELDS = ['_id', 'created_at']
+LIST_FIELDS = ['test_device_type', 'cpu_brand', 'cpu_model', 'gpu_brand', 'gpu_model',
+               'ram_gb', 'test_details', 'created_at']
+# query parameter -> document field (exact match)
+LIST_FILTERS = {
+    'test_device_type': 'test_device_type',
+    'cpu_brand': 'cpu_brand',
+    'cpu_model': 'cpu_model',
+    'gpu_brand': 'gpu_brand',
+    'gpu_model': 'gpu_model',
+    'ram_gb': 'ram_gb',
+    'mode': 'test_details.mode',
+}
+
+
+def _parse_limit(value, default):
+    if value is None:
+        return default
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    if not 1 <= limit <= MAX_LIMIT:
+        raise ValueError(f'limit must be between 1 and {MAX_LIMIT}')
+    return limit
+
+
+def _parse_object_id(value):
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        raise ValueError(f'Invalid cursor id: {value}')
+
+
+def _parse_timestamp(value):
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'Invalid cursor timestamp: {value}')
+
+
+def _cursor_filter(sort, after):
+    """Keyset condition for documents strictly after the cursor"""
+    if sort == '_id':
+        return {'_id': {'$gt': _parse_object_id(after)}}
+    timestamp, _, last_id = after.partition(',')
+    created_at = _parse_timestamp(timestamp)
+    if not last_id:
+        return {'created_at': {'$gt': created_at}}
+    return {'$or': [
+        {'created_at': {'$gt': created_at}},
+        {'created_at': created_at, '_id': {'$gt': _parse_object_id(last_id)}},
+    ]}
+
+
+def parse_list_args(args, stream=False):
+    """
+    Turn /list query parameters into find() arguments plus the fields
+    (``hidden``) to strip from each document before it is returned.
+    Raises ValueError with a client-facing message on bad input.
+    """
+    sort = args.get('sort', '_id')
+    if sort not in SORT_FIELDS:
+        raise ValueError(f"sort must be one of: {', '.join(SORT_FIELDS)}")
+
+    query = {}
+    for param, field in LIST_FILTERS.items():
+        value = args.get(param)
+        if value is None:
+            continue
+        if param == 'ram_gb':
+            try:
+                value = float(value)
+            except ValueError:
+                raise ValueError('ram_gb must be a number')
+        query[field] = value
+
+    after = args.get('after')
+    if after:
+        query = {'$and': [query, _cursor_filter(sort, after)]} if query else _cursor_filter(sort, after)
+
+    fields = args.get('fields')
+    projection = None
+    hidden = ['_id']
+    if fields:
+        requested = [field.strip() for field in fields.split(',') if field.strip()]
+        unknown = [field for field in requested if field not in LIST_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+        projection = {field: 1 for field in requested}
+        # created_at is needed to build the next cursor when ordering by time
+        if sort == 'created_at' and 'created_at' not in projection:
+            projection['created_at'] = 1
+            hidden.append('created_at')
+
+    order = [('created_at', 1), ('_id', 1)] if sort == 'created_at' else [('_id', 1)]
+    limit = _parse_limit(args.get('limit'), None if stream else DEFAULT_LIMIT)
+    return {'query': query, 'projection': projection, 'sort': order, 'limit': limit, 'hidden': hidden}
+
+
+def next_cursor(doc, sort):
+    """`after` value that continues a listing after `doc`"""
+    if sort == '_id':
+        return str(doc['_id'])
+    return f"{doc['created_at'].isoformat()},{doc['_id']}"
@@ -0,0 +1,175 @@
+"""
+MongoClient pool settings and pool-utilization metrics.
+
+Each process (gunicorn worker) owns its own client, created after the fork
+by connection.py with ``client_options()``:
+
+* ``MONGO_MAX_POOL_SIZE`` (default 10)   - connections per server per worker
+* ``MONGO_MIN_POOL_SIZE`` (default 0)    - connections kept open when idle
+* ``MONGO_MAX_IDLE_TIME_MS`` (default 60000) - idle connections closed after this
+* ``MONGO_WRITE_CONCERN`` (e.g. ``majority`` or ``1``) and ``MONGO_WTIMEOUT_MS``
+* ``MONGO_COMPRESSORS`` (e.g. ``zstd,snappy,zlib``) - wire compression in order
+  of preference; ``zstd`` needs ``zstandard`` and ``snappy`` needs
+  ``python-snappy`` installed, unavailable ones are skipped with a warning
+
+Unset options fall back to the connection string (or PyMongo's defaults).
+
+``PoolMetrics`` is a ConnectionPoolListener counting open / checked-out
+connections, the peak number in use, checkout waits and failures, so
+``WEB_CONCURRENCY x maxPoolSize`` can be sized against the cluster's
+connection limit (see /diagnostics).
+"""
+
+import importlib.util
+import logging
+import os
+import threading
+import time
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_POOL_SIZE = 10
+DEFAULT_MIN_POOL_SIZE = 0
+DEFAULT_MAX_IDLE_TIME_MS = 60000
+# compressor -> module PyMongo needs for it (zlib is in the standard library)
+COMPRESSOR_MODULES = {'zstd': 'zstandard', 'snappy': 'snappy', 'zlib': 'zlib'}
+# Each server also gets monitoring connections outside the pool
+MONITOR_CONNECTIONS_PER_SERVER = 2
+
+
+def available_compressors(names):
+    """Requested compressors whose module is installed, in the requested order"""
+    available = []
+    for name in (name.strip() for name in names.split(',')):
+        if not name:
+            continue
+        module = COMPRESSOR_MODULES.get(name)
+        if module is None:
+            logger.warning(f"Unknown MongoDB compressor '{name}' ignored")
+        elif importlib.util.find_spec(module) is None:
+            logger.warning(f"MongoDB compressor '{name}' needs the {module} package, skipped")
+        else:
+            available.append(name)
+    return available
+
+
+def client_options(environ=None):
+    """MongoClient keyword options from the environment"""
+    environ = os.environ if environ is None else environ
+    options = {
+        'maxPoolSize': int(environ.get('MONGO_MAX_POOL_SIZE', DEFAULT_MAX_POOL_SIZE)),
+        'minPoolSize': int(environ.get('MONGO_MIN_POOL_SIZE', DEFAULT_MIN_POOL_SIZE)),
+        'maxIdleTimeMS': int(environ.get('MONGO_MAX_IDLE_TIME_MS', DEFAULT_MAX_IDLE_TIME_MS)),
+    }
+    write_concern = environ.get('MONGO_WRITE_CONCERN')
+    if write_concern:
+        options['w'] = int(write_concern) if write_concern.isdigit() else write_concern
+    if environ.get('MONGO_WTIMEOUT_MS'):
+        options['wTimeoutMS'] = int(environ['MONGO_WTIMEOUT_MS'])
+    compressors = available_compressors(environ.get('MONGO_COMPRESSORS', ''))
+    if compressors:
+        options['compressors'] = ','.join(compressors)
+    return options
+
+
+def connection_budget(max_pool_size, workers=None, servers=1, clients=1):
+    """Worst-case connections of the whole deployment against one server (`clients` pools per worker)"""
+    workers = int(os.environ.get('WEB_CONCURRENCY', 1)) if workers is None else workers
+    budget = {
+        'workers': workers,
+        'max_pool_size': max_pool_size,
+        'max_connections': workers * clients * (max_pool_size + MONITOR_CONNECTIONS_PER_SERVER * servers),
+    }
+    if clients != 1:
+        budget['clients_per_worker'] = clients
+    return budget
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Connection pool counters for this process (all servers combined, peaks per server)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # เวลาเริ่ม checkout เก็บต่อเธรด: event ของ checkout ถูกเรียกในเธรดที่ขอ connection เอง
+        self._local = threading.local()
+        self.open = {}
+        self.checked_out = {}
+        self.peak_checked_out = 0
+        self.checkouts = 0
+        self.checkout_failures = {}
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.pools_cleared = 0
+
+    def _adjust(self, counter, address, delta):
+        counter[address] = counter.get(address, 0) + delta
+        return counter[address]
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pools_cleared += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self._adjust(self.open, event.address, 1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self._adjust(self.open, event.address, -1)
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def _waited(self):
+        started = getattr(self._local, 'started', None)
+        self._local.started = None
+        return time.perf_counter() - started if started is not None else 0.0
+
+    def connection_check_out_failed(self, event):
+        waited = self._waited()
+        with self._lock:
+            self.checkout_failures[event.reason] = self.checkout_failures.get(event.reason, 0) + 1
+            self.wait_max = max(self.wait_max, waited)
+
+    def connection_checked_out(self, event):
+        waited = self._waited()
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            in_use = self._adjust(self.checked_out, event.address, 1)
+            self.peak_checked_out = max(self.peak_checked_out, in_use)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self._adjust(self.checked_out, event.address, -1)
+
+    def snapshot(self, max_pool_size=None):
+        with self._lock:
+            snapshot = {
+                'open': sum(self.open.values()),
+                'checked_out': sum(self.checked_out.values()),
+                'peak_checked_out': self.peak_checked_out,
+                'checkouts': self.checkouts,
+                'checkout_failures': dict(self.checkout_failures),
+                'avg_wait_ms': round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                'max_wait_ms': round(self.wait_max * 1000, 3),
+                'pools_cleared': self.pools_cleared,
+            }
+        if max_pool_size:
+            snapshot['peak_utilization'] = round(snapshot['peak_checked_out'] / max_pool_size, 3)
+        return snapshot
@@ -0,0 +1,212 @@
+"""
+Server-side dashboard aggregations.
+
+All dashboard statistics are expressed as one ``$facet`` aggregation so that
+MongoDB does the grouping and only the small per-key result sets cross the
+network. Stores that cannot run the pipeline (mongomock in local demos and
+tests) fall back to a projected columnar fetch (``fetch.fetch_columns``)
+reduced by the columnar engine in aggregate.py.
+
+A dashboard window (``/admin?from=2024-06-01&to=2024-06-07``) is applied as
+a leading ``$match`` on the indexed ``created_at``, so the pipeline only
+reads the documents inside it. The 7-day growth counters are two range
+``count_documents`` calls on the same index.
+"""
+
+import logging
+from datetime import datetime, time, timedelta, timezone
+
+from dashboard import empty_stats
+
+logger = logging.getLogger(__name__)
+
+# Derived fields shared by every facet
+_PROJECT = {'$project': {
+    '_id': 0,
+    'cpu_model': 1,
+    'gpu_model': 1,
+    'cpu_brand': 1,
+    'gpu_brand': 1,
+    'ram_gb': 1,
+    'test_device_type': 1,
+    'device_type': {'$ifNull': ['$test_device_type', 'unknown']},
+    'mode': {'$ifNull': ['$test_details.mode', 'unknown']},
+    'score': {'$convert': {'input': '$test_details.avg_score', 'to': 'double', 'onError': None, 'onNull': None}},
+    'day': {'$dateToString': {
+        'format': '%Y-%m-%d',
+        'date': {'$convert': {'input': '$created_at', 'to': 'date', 'onError': None, 'onNull': None}},
+        'onNull': None,
+    }},
+    'combo': {'$concat': [
+        {'$ifNull': ['$cpu_model', 'Unknown CPU']}, ' + ', {'$ifNull': ['$gpu_model', 'Unknown GPU']}
+    ]},
+}}
+
+_HAS_SCORE = {'$match': {'score': {'$ne': None}}}
+
+
+def _count_by(field):
+    return [{'$group': {'_id': f'${field}', 'count': {'$sum': 1}}}]
+
+
+def _score_by(field):
+    return [_HAS_SCORE, {'$group': {'_id': f'${field}', 'score_sum': {'$sum': '$score'}, 'score_count': {'$sum': 1}}}]
+
+
+def _score_bins_by(field):
+    return [_HAS_SCORE, {'$group': {'_id': {'key': f'${field}', 'bin': {'$floor': '$score'}}, 'count': {'$sum': 1}}}]
+
+
+DASHBOARD_PIPELINE = [
+    _PROJECT,
+    {'$facet': {
+        'total': [{'$group': {
+            '_id': None,
+            'count': {'$sum': 1},
+            'ram_sum': {'$sum': '$ram_gb'},
+            'ram_count': {'$sum': {'$cond': [{'$isNumber': '$ram_gb'}, 1, 0]}},
+            'score_sum': {'$sum': '$score'},
+            'score_count': {'$sum': {'$cond': [{'$isNumber': '$score'}, 1, 0]}},
+        }}],
+        'cpu_model': _count_by('cpu_model'),
+        'gpu_model': _count_by('gpu_model'),
+        'cpu_brand': _count_by('cpu_brand'),
+        'gpu_brand': _count_by('gpu_brand'),
+        'ram_gb': _count_by('ram_gb'),
+        'day': [{'$match': {'day': {'$ne': None}}}] + _count_by('day'),
+        'mode': _count_by('mode'),
+        'device_type': _count_by('device_type'),
+        'combo': _count_by('combo'),
+        'brand_pair': [
+            {'$match': {'test_device_type': {'$ne': None}, 'cpu_brand': {'$ne': None}, 'gpu_brand': {'$ne': None}}},
+            {'$group': {'_id': {'cpu': '$cpu_brand', 'gpu': '$gpu_brand'}, 'count': {'$sum': 1}}},
+        ],
+        'mode_scores': _score_by('mode'),
+        'cpu_scores': _score_by('cpu_model'),
+        'score_bins': [_HAS_SCORE, {'$group': {'_id': {'$floor': '$score'}, 'count': {'$sum': 1}}}],
+        'mode_score_bins': _score_bins_by('mode'),
+        'cpu_score_bins': _score_bins_by('cpu_model'),
+    }},
+]
+
+
+def supports_pipelines(collection):
+    """True for real MongoDB collections, False for in-process mock stores"""
+    return type(collection).__module__.split('.')[0] != 'mongomock'
+
+
+def stats_from_facets(facets):
+    """Convert the single $facet result document into a dashboard stats dict"""
+    stats = empty_stats()
+    if facets['total']:
+        total = facets['total'][0]
+        stats['total'] = total['count']
+        stats['ram_sum'] = total['ram_sum']
+        stats['ram_count'] = total['ram_count']
+        stats['score_sum'] = total['score_sum']
+        stats['score_count'] = total['score_count']
+
+    for dim, counter in stats['counts'].items():
+        for row in facets[dim]:
+            key = (row['_id']['cpu'], row['_id']['gpu']) if dim == 'brand_pair' else row['_id']
+            counter[key] = row['count']
+    for dim, facet in (('mode', 'mode_scores'), ('cpu_model', 'cpu_scores')):
+        for row in facets[facet]:
+            stats['score_sums'][dim][row['_id']] = [row['score_sum'], row['score_count']]
+    for row in facets['score_bins']:
+        stats['score_bins'][int(row['_id'])] = row['count']
+    for dim, facet in (('mode', 'mode_score_bins'), ('cpu_model', 'cpu_score_bins')):
+        for row in facets[facet]:
+            stats['score_hists'][dim].setdefault(row['_id']['key'], {})[int(row['_id']['bin'])] = row['count']
+    return stats
+
+
+def _parse_bound(value, name, end=False):
+    """ISO date or datetime -> aware UTC datetime; a bare `to` date includes that whole day"""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'{name} must be an ISO date or datetime: {value}')
+    if end and len(value) == 10:
+        parsed = datetime.combine(parsed.date() + timedelta(days=1), time())
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def parse_window(args):
+    """
+    (start, end) from the ``from``/``to`` query parameters, either may be
+    None; None when neither is given. Raises ValueError on bad input.
+    """
+    start = _parse_bound(args['from'], 'from') if args.get('from') else None
+    end = _parse_bound(args['to'], 'to', end=True) if args.get('to') else None
+    if start is None and end is None:
+        return None
+    if start is not None and end is not None and start >= end:
+        raise ValueError('from must be before to')
+    return start, end
+
+
+def window_query(window):
+    """created_at filter for a (start, end) window, start inclusive, end exclusive"""
+    if window is None:
+        return {}
+    start, end = window
+    bounds = {}
+    if start is not None:
+        bounds['$gte'] = start
+    if end is not None:
+        bounds['$lt'] = end
+    return {'created_at': bounds}
+
+
+def newest_created_at(collection, window=None):
+    """created_at (aware UTC) of the newest test in the window, None when there is none"""
+    latest = collection.find_one(window_query(window), {'_id': 0, 'created_at': 1}, sort=[('created_at', -1)])
+    anchor = latest.get('created_at') if latest else None
+    if not isinstance(anchor, datetime):
+        return None
+    return anchor.replace(tzinfo=timezone.utc) if anchor.tzinfo is None else anchor
+
+
+def growth_counts(collection, window=None, anchor=None):
+    """
+    (last 7 days, previous 7 days) test counts, ending at the newest test in
+    the window (or at `anchor`). One indexed find_one for the anchor plus
+    two range counts.
+    """
+    if anchor is None:
+        anchor = newest_created_at(collection, window)
+    if anchor is None:
+        return 0, 0
+    start = window[0] if window is not None else None
+
+    def count(after, until):
+        # same half-open windows as aggregate.stats_from_columns: (anchor - 7d, anchor], (anchor - 14d, anchor - 7d]
+        bounds = {'$gt': after, '$lte': until}
+        if start is not None and start > after:
+            bounds = {'$gte': start, '$lte': until}
+        return collection.count_documents({'created_at': bounds})
+
+    last_start = anchor - timedelta(days=7)
+    return count(last_start, anchor), count(anchor - timedelta(days=14), last_start)
+
+
+def aggregate_stats(collection, window=None):
+    """Dashboard stats computed server-side with DASHBOARD_PIPELINE"""
+    pipeline = ([{'$match': window_query(window)}] if window is not None else []) + DASHBOARD_PIPELINE
+    facets = next(collection.aggregate(pipeline, allowDiskUse=True), None)
+    return stats_from_facets(facets) if facets else empty_stats()
+
+
+def query_stats(collection, window=None):
+    """Dashboard stats from the raw collection (optionally a created_at window), pushed down to MongoDB when possible"""
+    if supports_pipelines(collection):
+        return aggregate_stats(collection, window)
+    logger.info("Aggregation pipelines not supported by this store, using columnar fallback")
+    # NumPy is imported on first use, not when the app starts
+    from aggregate import stats_from_columns
+    from fetch import fetch_columns
+
+    return stats_from_columns(fetch_columns(collection, window_query(window)))
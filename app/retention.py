@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Retention of raw submissions, with long-term per-day aggregates.
+
+With ``RETENTION_DAYS`` set, raw ``process`` documents expire through a
+TTL index on ``created_at`` (the existing ``created_at_1`` index gets
+``expireAfterSeconds``). Before a day expires, ``python retention.py run``
+folds it into the ``history`` collection: the rollup counters of
+rollups.py, kept per UTC day,
+
+    {'_id': {'day': '2024-06-04', 'dim': 'cpu_model', 'key': 'i5-13600K'},
+     'count': 12, 'score_sum': 931.5, 'score_count': 11}
+
+so the per-model, per-mode and daily charts of old windows keep working
+after the raw documents are gone. ``history.folded_until`` is the
+watermark: every day before it is served from ``history``, the rest from
+the raw documents, so no test is counted twice.
+
+A run folds the whole days that expire within ``RETENTION_FOLD_LEAD_DAYS``.
+Each day is read with one cursor in batches of ``RETENTION_BATCH_SIZE``
+(from a secondary when there is one), with a ``RETENTION_PAUSE_MS`` pause
+between batches so /submit keeps the disk. The day's counters are written
+with replace-upserts and the watermark moves afterwards, so an interrupted
+run simply folds that day again. The TTL index is only set once the
+watermark covers everything it would delete. Run it daily (cron):
+
+    python retention.py run
+    python retention.py status
+    python retention.py disable     # drop the TTL (history is kept)
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime, time as day_start, timedelta, timezone
+
+from pymongo import ASCENDING, IndexModel, MongoClient, ReadPreference, ReplaceOne
+
+from dashboard import empty_stats
+from rollups import add_rollup_rows, rollup_increments
+
+logger = logging.getLogger(__name__)
+
+HISTORY_COLLECTION = 'history'
+STATE_COLLECTION = 'retention_state'
+TTL_INDEX = 'created_at_1'
+DEFAULT_LEAD_DAYS = 7
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_PAUSE_MS = 50
+
+# stats(window) selects whole days
+HISTORY_INDEXES = [
+    IndexModel([('_id.day', ASCENDING)], name='_id.day_1'),
+]
+
+# fields rollup_keys() reads
+_FOLD_PROJECTION = {'_id': 0, 'created_at': 1, 'test_device_type': 1, 'cpu_brand': 1, 'cpu_model': 1,
+                    'gpu_brand': 1, 'gpu_model': 1, 'ram_gb': 1, 'test_details': 1}
+
+
+def _midnight(value):
+    """Start of the UTC day of an aware or naive-UTC datetime (aware)"""
+    value = value.astimezone(timezone.utc) if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+    return datetime.combine(value.date(), day_start(), tzinfo=timezone.utc)
+
+
+def _aware(value):
+    return value.replace(tzinfo=timezone.utc) if value is not None and value.tzinfo is None else value
+
+
+def retention_from_env(environ=os.environ):
+    """(retention days, lead days) or None when RETENTION_DAYS is unset"""
+    if not environ.get('RETENTION_DAYS'):
+        return None
+    days = float(environ['RETENTION_DAYS'])
+    lead = float(environ.get('RETENTION_FOLD_LEAD_DAYS', DEFAULT_LEAD_DAYS))
+    # growth_counts() reads the last 14 days of raw documents
+    if days - lead < 14:
+        raise ValueError('RETENTION_DAYS must be at least RETENTION_FOLD_LEAD_DAYS + 14')
+    return days, lead
+
+
+class HistoryStore:
+    """Per-day rollup counters of folded (expiring) documents"""
+
+    def __init__(self, collection, state=None):
+        self.collection = collection
+        self.state = state if state is not None else collection.database[STATE_COLLECTION]
+
+    def folded_until(self):
+        """Watermark: documents created before it are counted in history (aware UTC), None before the first run"""
+        doc = self.state.find_one({'_id': 'folded_until'})
+        return _aware(doc['value']) if doc else None
+
+    def _set_folded_until(self, value):
+        self.state.replace_one({'_id': 'folded_until'}, {'value': value}, upsert=True)
+
+    def stats(self, window=None):
+        """Dashboard stats dict of the folded days a created_at window touches (whole days)"""
+        start, end = window or (None, None)
+        days = {}
+        if start is not None:
+            days['$gte'] = _midnight(start).date().isoformat()
+        if end is not None:
+            days['$lt'] = end.astimezone(timezone.utc).date().isoformat() if end == _midnight(end) else \
+                (_midnight(end) + timedelta(days=1)).date().isoformat()
+        return add_rollup_rows(empty_stats(), self.collection.find({'_id.day': days} if days else {}))
+
+    def fold_day(self, source, day, batch_size=DEFAULT_BATCH_SIZE, pause=DEFAULT_PAUSE_MS / 1000.0):
+        """Write the counters of the documents created on `day` (aware midnight); returns how many"""
+        merged = {}
+        batch = []
+        folded = 0
+        cursor = source.find({'created_at': {'$gte': day, '$lt': day + timedelta(days=1)}}, _FOLD_PROJECTION,
+                             batch_size=batch_size)
+        for doc in cursor:
+            batch.append(doc)
+            if len(batch) == batch_size:
+                rollup_increments(batch, merged, by_day=True)
+                folded += len(batch)
+                batch = []
+                # พักระหว่าง batch ให้ /submit ใช้ disk ได้เต็มที่
+                time.sleep(pause)
+        rollup_increments(batch, merged, by_day=True)
+        folded += len(batch)
+        # replace (ไม่ใช่ $inc): รันวันเดิมซ้ำหลังหยุดกลางทางได้ผลเท่าเดิม
+        updates = [ReplaceOne({'_id': counter_id}, inc, upsert=True) for counter_id, inc in merged.values()]
+        if updates:
+            self.collection.bulk_write(updates, ordered=False)
+        return folded
+
+    def fold(self, source, until, batch_size=DEFAULT_BATCH_SIZE, pause=DEFAULT_PAUSE_MS / 1000.0):
+        """Fold every whole day before `until` that is not folded yet; returns the number of documents"""
+        until = _midnight(until)
+        day = self.folded_until()
+        if day is None:
+            oldest = source.find_one({'created_at': {'$lt': until}}, {'_id': 0, 'created_at': 1},
+                                     sort=[('created_at', ASCENDING)])
+            day = _midnight(oldest['created_at']) if oldest else until
+        folded = 0
+        while day < until:
+            n = self.fold_day(source, day, batch_size, pause)
+            folded += n
+            day += timedelta(days=1)
+            self._set_folded_until(day)
+            if n:
+                logger.info(f"Folded {n} documents of {(day - timedelta(days=1)).date().isoformat()}")
+        if self.folded_until() is None:
+            self._set_folded_until(until)
+        return folded
+
+
+def ttl_seconds(collection):
+    """expireAfterSeconds of the created_at index, None without TTL"""
+    index = collection.index_information().get(TTL_INDEX, {})
+    return index.get('expireAfterSeconds')
+
+
+def set_ttl(collection, seconds):
+    """Turn the existing created_at index into a TTL index (MongoDB 5.1+), or change its expiry"""
+    if ttl_seconds(collection) == seconds:
+        return False
+    collection.database.command('collMod', collection.name,
+                                index={'keyPattern': {'created_at': 1}, 'expireAfterSeconds': int(seconds)})
+    return True
+
+
+def drop_ttl(collection):
+    """created_at index without expiry again (rebuilt, the TTL option cannot be removed in place)"""
+    from indexes import PROCESS_INDEXES
+
+    if ttl_seconds(collection) is None:
+        return False
+    collection.drop_index(TTL_INDEX)
+    collection.create_indexes([model for model in PROCESS_INDEXES if model.document['name'] == TTL_INDEX])
+    return True
+
+
+def run(db, days, lead, batch_size=DEFAULT_BATCH_SIZE, pause=DEFAULT_PAUSE_MS / 1000.0, now=None):
+    """Fold the days expiring within `lead` days, then make sure the TTL index is set; returns documents folded"""
+    now = now or datetime.now(timezone.utc)
+    history = HistoryStore(db[HISTORY_COLLECTION])
+    db[HISTORY_COLLECTION].create_indexes(HISTORY_INDEXES)
+    source = db['process'].with_options(read_preference=ReadPreference.SECONDARY_PREFERRED)
+    folded = history.fold(source, now - timedelta(days=days - lead), batch_size, pause)
+    # TTL ลบเอกสารก่อน now - days: ตั้งได้เมื่อ watermark ครอบคลุมช่วงนั้นแล้วเท่านั้น
+    if history.folded_until() >= now - timedelta(days=days) and set_ttl(db['process'], days * 86400):
+        logger.info(f"TTL on process.created_at set to {days} days")
+    return folded
+
+
+def status(db, retention=None, now=None):
+    now = now or datetime.now(timezone.utc)
+    history = HistoryStore(db[HISTORY_COLLECTION])
+    folded_until = history.folded_until()
+    oldest = db['process'].find_one({}, {'_id': 0, 'created_at': 1}, sort=[('created_at', ASCENDING)])
+    ttl = ttl_seconds(db['process'])
+    result = {
+        'retention_days': retention[0] if retention else None,
+        'fold_lead_days': retention[1] if retention else None,
+        'ttl_days': ttl / 86400 if ttl is not None else None,
+        'folded_until': folded_until.isoformat() if folded_until else None,
+        'oldest_raw': _aware(oldest['created_at']).isoformat() if oldest else None,
+        'history_rows': db[HISTORY_COLLECTION].estimated_document_count(),
+    }
+    if ttl is not None and (folded_until is None or folded_until < now - timedelta(seconds=ttl)):
+        # เอกสารหมดอายุไปก่อนถูกพับเข้า history
+        result['warning'] = 'TTL deletes documents that are not folded yet; run: python retention.py run'
+    return result
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Fold expiring submissions into history and manage the TTL')
+    parser.add_argument('command', choices=['run', 'status', 'disable'])
+    args = parser.parse_args(argv[1:])
+
+    logging.basicConfig(level=logging.INFO)
+    retention = retention_from_env()
+    client = MongoClient(os.environ.get('MONGODB_URI', 'mongodb://localhost:27017'))
+    db = client["system-monitor"]
+    if args.command == 'status':
+        print(json.dumps(status(db, retention), indent=2))
+        return 0
+    if args.command == 'disable':
+        dropped = drop_ttl(db['process'])
+        print("✅ TTL removed from process.created_at" if dropped else "No TTL on process.created_at")
+        return 0
+    if retention is None:
+        print("RETENTION_DAYS is not set")
+        return 2
+    if os.environ.get('ARCHIVE_DIR'):
+        # archive.py ย้ายเอกสารเก่าออกไปแล้ว: วันที่ถูกพับแล้วถูก archive ด้วยจะนับซ้ำ
+        print("RETENTION_DAYS and ARCHIVE_DIR are exclusive: old days are either archived or folded")
+        return 2
+    folded = run(db, *retention, batch_size=int(os.environ.get('RETENTION_BATCH_SIZE', DEFAULT_BATCH_SIZE)),
+                 pause=float(os.environ.get('RETENTION_PAUSE_MS', DEFAULT_PAUSE_MS)) / 1000.0)
+    print(f"✅ Folded {folded} documents into {HISTORY_COLLECTION}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Incrementally maintained dashboard aggregates.
+
+Every accepted /submit document bumps a set of counters in the ``rollups``
+collection, one small document per (dimension, key):
+
+    {'_id': {'dim': 'cpu_model', 'key': 'i5-13600K'},
+     'count': 12, 'score_sum': 931.5, 'score_count': 11, 'ram_sum': 384}
+
+/admin reads those counters back (size depends on the number of distinct
+models/brands, not on the number of tests) instead of rescanning the
+whole ``process`` collection.
+
+Backfill or repair the counters from existing data with:
+
+    python rollups.py rebuild
+"""
+
+import logging
+import os
+import sys
+from datetime import timezone
+
+from pymongo import ASCENDING, IndexModel, MongoClient, UpdateOne
+
+from dashboard import SCORE_HIST_DIMENSIONS, combo_label, empty_stats, extract_mode, extract_score, score_bin
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_COLLECTION = 'rollups'
+REBUILD_BATCH_SIZE = 1000
+
+# snapshot(dims) filters on the dimension
+ROLLUP_INDEXES = [
+    IndexModel([('_id.dim', ASCENDING)], name='_id.dim_1'),
+]
+
+
+def rollup_keys(doc):
+    """(dimension, key) pairs a document contributes to; missing fields contribute nothing"""
+    test_details = doc.get('test_details')
+    keys = [('total', 'all')]
+    for dim in ('cpu_model', 'gpu_model', 'cpu_brand', 'gpu_brand', 'ram_gb'):
+        if doc.get(dim) is not None:
+            keys.append((dim, doc[dim]))
+    keys += [
+        ('mode', extract_mode(test_details)),
+        ('device_type', doc.get('test_device_type') or 'unknown'),
+        ('combo', combo_label(doc.get('cpu_model'), doc.get('gpu_model'))),
+    ]
+    # เหมือน DASHBOARD_PIPELINE: นับคู่ยี่ห้อเฉพาะเมื่อรู้ประเภทอุปกรณ์และยี่ห้อทั้งสอง
+    if all(doc.get(field) is not None for field in ('test_device_type', 'cpu_brand', 'gpu_brand')):
+        keys.append(('brand_pair', [doc['cpu_brand'], doc['gpu_brand']]))
+    score = extract_score(test_details)
+    if score is not None:
+        bucket = score_bin(score)
+        keys.append(('score_bin', bucket))
+        # histogram ต่อ mode / ต่อ CPU สำหรับ percentile (p50/p90/p99)
+        keys.append(('mode_score_bin', [extract_mode(test_details), bucket]))
+        if doc.get('cpu_model') is not None:
+            keys.append(('cpu_score_bin', [doc['cpu_model'], bucket]))
+    return keys
+
+
+def _utc_day(created_at):
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc)
+    return created_at.date().isoformat()
+
+
+def rollup_increments(docs, merged=None, by_day=False):
+    """
+    {hashable key: (counter _id, increments)} for a group of documents,
+    added into `merged` when given. The _id is ``{'dim', 'key'}``, or
+    ``{'day', 'dim', 'key'}`` per UTC day of created_at with `by_day`.
+    """
+    merged = {} if merged is None else merged
+    for doc in docs:
+        score = extract_score(doc.get('test_details'))
+        day = _utc_day(doc['created_at']) if by_day else None
+        for dim, key in rollup_keys(doc):
+            hashable = (day, dim, tuple(key) if isinstance(key, list) else key)
+            entry = merged.get(hashable)
+            if entry is None:
+                counter_id = {'day': day, 'dim': dim, 'key': key} if by_day else {'dim': dim, 'key': key}
+                entry = merged[hashable] = (counter_id, {'count': 0})
+            inc = entry[1]
+            inc['count'] += 1
+            if score is not None:
+                inc['score_sum'] = inc.get('score_sum', 0.0) + score
+                inc['score_count'] = inc.get('score_count', 0) + 1
+            if dim == 'total':
+                try:
+                    inc['ram_sum'] = inc.get('ram_sum', 0.0) + float(doc.get('ram_gb'))
+                    inc['ram_count'] = inc.get('ram_count', 0) + 1
+                except (TypeError, ValueError):
+                    pass
+    return merged
+
+
+def rollup_updates(docs):
+    """
+    UpdateOne operations ($inc upserts) for a group of documents.
+    Increments for the same (dimension, key) are merged client-side, so a
+    batch costs one operation per distinct key rather than per document.
+    """
+    return [UpdateOne({'_id': counter_id}, {'$inc': inc}, upsert=True)
+            for counter_id, inc in rollup_increments(docs).values()]
+
+
+def add_rollup_rows(stats, rows):
+    """
+    Add counter rows (``rollups`` documents, or per-day ones from
+    retention.py) into a dashboard stats dict; returns `stats`.
+    """
+    hist_dims = {rollup_dim: dim for dim, rollup_dim in SCORE_HIST_DIMENSIONS.items()}
+    counts = stats['counts']
+    for row in rows:
+        dim, key = row['_id']['dim'], row['_id']['key']
+        if key is None or isinstance(key, list) and key[0] is None:
+            # counter ของฟิลด์ที่ไม่มีค่า จาก rollup_keys() รุ่นก่อน (history ที่พับไว้แล้ว)
+            continue
+        count = row.get('count', 0)
+        if dim == 'total':
+            stats['total'] += count
+            stats['ram_sum'] += row.get('ram_sum', 0.0)
+            stats['ram_count'] += row.get('ram_count', 0)
+            stats['score_sum'] += row.get('score_sum', 0.0)
+            stats['score_count'] += row.get('score_count', 0)
+            if 'day' in row['_id']:
+                counts['day'][row['_id']['day']] = counts['day'].get(row['_id']['day'], 0) + count
+        elif dim == 'score_bin':
+            stats['score_bins'][key] = stats['score_bins'].get(key, 0) + count
+        elif dim in hist_dims:
+            hist = stats['score_hists'][hist_dims[dim]].setdefault(key[0], {})
+            hist[key[1]] = hist.get(key[1], 0) + count
+        elif dim in counts:
+            key = tuple(key) if dim == 'brand_pair' else key
+            counts[dim][key] = counts[dim].get(key, 0) + count
+        if dim in stats['score_sums'] and row.get('score_count'):
+            score_sum, score_count = stats['score_sums'][dim].get(key, [0.0, 0])
+            stats['score_sums'][dim][key] = [score_sum + row['score_sum'], score_count + row['score_count']]
+    return stats
+
+
+class RollupStore:
+    """Dashboard counters kept in a MongoDB collection"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def record(self, doc):
+        """Add one submitted document to the counters (single round trip)"""
+        self.record_many([doc])
+
+    def record_many(self, docs):
+        """Add a batch of submitted documents to the counters (single round trip)"""
+        updates = rollup_updates(docs)
+        if updates:
+            self.collection.bulk_write(updates, ordered=False)
+
+    def is_empty(self):
+        """True before anything was recorded (or rebuilt)"""
+        total = self.collection.find_one({'_id': {'dim': 'total', 'key': 'all'}}, {'count': 1})
+        return not (total and total.get('count'))
+
+    def snapshot(self, dims=None):
+        """
+        Read the counters back as a dashboard stats dict, optionally only
+        for some dimensions (the 'total' row is always read).
+        """
+        query = {'_id.dim': {'$in': ['total'] + list(dims)}} if dims is not None else {}
+        return add_rollup_rows(empty_stats(), self.collection.find(query))
+
+    def rebuild(self, source, batch_size=REBUILD_BATCH_SIZE):
+        """
+        Recompute every counter from the raw collection.
+
+        Counters are built in a scratch collection and swapped in with a
+        rename, so /admin keeps reading the old counters until the rebuild
+        finishes. Submits that land during the rebuild are not included;
+        run it while ingest is quiet.
+        """
+        db = self.collection.database
+        scratch = db[f'{self.collection.name}_rebuild']
+        scratch.drop()
+
+        processed = 0
+        pending = []
+        for doc in source.find({}, batch_size=batch_size):
+            pending.append(doc)
+            processed += 1
+            if len(pending) == batch_size:
+                scratch.bulk_write(rollup_updates(pending), ordered=False)
+                pending = []
+                logger.info(f"Rolled up {processed} documents")
+        if pending:
+            scratch.bulk_write(rollup_updates(pending), ordered=False)
+
+        if processed:
+            scratch.create_indexes(ROLLUP_INDEXES)
+            scratch.rename(self.collection.name, dropTarget=True)
+        else:
+            self.collection.drop()
+        logger.info(f"Rollup rebuild finished: {processed} documents")
+        return processed
+
+
+def main(argv):
+    if len(argv) != 2 or argv[1] != 'rebuild':
+        print(f"Usage: {argv[0]} rebuild")
+        return 2
+
+    logging.basicConfig(level=logging.INFO)
+    client = MongoClient(os.environ.get('MONGODB_URI', 'mongodb://localhost:27017'))
+    db = client["system-monitor"]
+    processed = RollupStore(db[ROLLUP_COLLECTION]).rebuild(db["process"])
+    print(f"✅ Rebuilt rollups from {processed} documents")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
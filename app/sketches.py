@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+"""
+Streaming sketches for model cardinality and top-K.
+
+* ``HyperLogLog`` estimates the number of distinct values in 2**p one-byte
+  registers (4 KB at the default p=12). Relative standard error is
+  1.04 / sqrt(2**p), about 1.6% at p=12; small cardinalities (such as
+  tens of CPU models) use linear counting and are close to exact.
+* ``SpaceSaving`` keeps the k most frequent items seen. Each count is an
+  overestimate by at most its stored ``error``, which is at most N/k
+  (N = items added). Every item more frequent than N/k is guaranteed to be
+  in the sketch.
+
+``SketchStore`` keeps one HyperLogLog and one SpaceSaving per dimension
+(CPU model, GPU model, CPU+GPU combo). It is updated on every /submit and
+merged into a single MongoDB document at most every ``flush_interval``
+seconds, and on exit. Both sketch types merge losslessly with respect to
+their bounds, so every worker folds its local increments into the shared
+document (compare-and-swap on a version number) and reads back the others'.
+
+The store is only used to serve the dashboard once it has been built from
+the full collection (``complete``):
+
+    python sketches.py rebuild
+"""
+
+import hashlib
+import logging
+import math
+import os
+import sys
+import threading
+import time
+
+from bson import Binary
+from pymongo import MongoClient
+from pymongo.errors import DuplicateKeyError
+
+from dashboard import combo_label
+
+logger = logging.getLogger(__name__)
+
+SKETCH_COLLECTION = 'sketches'
+SKETCH_ID = 'dashboard'
+SKETCH_DIMENSIONS = ['cpu_model', 'gpu_model', 'combo']
+DEFAULT_PRECISION = 12
+DEFAULT_TOP_K = 256
+DEFAULT_FLUSH_INTERVAL = 30.0
+REBUILD_BATCH_SIZE = 1000
+CAS_RETRIES = 5
+
+_PROJECTION = {'_id': 0, 'cpu_model': 1, 'gpu_model': 1}
+
+
+def _hash64(value):
+    return int.from_bytes(hashlib.blake2b(repr(value).encode(), digest_size=8).digest(), 'big')
+
+
+class HyperLogLog:
+
+    def __init__(self, p=DEFAULT_PRECISION, registers=None):
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(registers) if registers is not None else bytearray(self.m)
+
+    def add(self, value):
+        h = _hash64(value)
+        index = h >> (64 - self.p)
+        rest = h & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def count(self):
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def merge(self, other):
+        """Union with another sketch of the same precision (in place)"""
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def to_doc(self):
+        return {'p': self.p, 'registers': Binary(bytes(self.registers))}
+
+    @classmethod
+    def from_doc(cls, doc):
+        return cls(doc['p'], doc['registers'])
+
+
+class SpaceSaving:
+
+    def __init__(self, k=DEFAULT_TOP_K):
+        self.k = k
+        self.total = 0
+        self.counters = {}  # item -> [count, error]
+
+    def add(self, item, n=1):
+        self.total += n
+        counter = self.counters.get(item)
+        if counter is not None:
+            counter[0] += n
+        elif len(self.counters) < self.k:
+            self.counters[item] = [n, 0]
+        else:
+            # แทนที่ item ที่นับได้น้อยที่สุด (O(k), k เล็ก)
+            victim = min(self.counters, key=lambda key: self.counters[key][0])
+            floor = self.counters.pop(victim)[0]
+            self.counters[item] = [floor + n, floor]
+
+    def _floor(self):
+        """Upper bound on the count of any item not in the sketch"""
+        if len(self.counters) < self.k:
+            return 0
+        return min(counter[0] for counter in self.counters.values())
+
+    def merge(self, other):
+        """Combine with another sketch (in place); error stays within (N1 + N2) / k"""
+        floor, other_floor = self._floor(), other._floor()
+        merged = {}
+        for item in set(self.counters) | set(other.counters):
+            mine = self.counters.get(item, [floor, floor])
+            theirs = other.counters.get(item, [other_floor, other_floor])
+            merged[item] = [mine[0] + theirs[0], mine[1] + theirs[1]]
+        keep = sorted(merged, key=lambda item: merged[item][0], reverse=True)[:self.k]
+        self.counters = {item: merged[item] for item in keep}
+        self.total += other.total
+        return self
+
+    def top(self, n=None):
+        """[(item, estimated count)] most frequent first"""
+        items = sorted(self.counters.items(), key=lambda entry: entry[1][0], reverse=True)
+        return [(item, counter[0]) for item, counter in items[:n]]
+
+    def to_doc(self):
+        return {'k': self.k, 'total': self.total,
+                'counters': [[item, count, error] for item, (count, error) in self.counters.items()]}
+
+    @classmethod
+    def from_doc(cls, doc):
+        sketch = cls(doc['k'])
+        sketch.total = doc['total']
+        sketch.counters = {item: [count, error] for item, count, error in doc['counters']}
+        return sketch
+
+
+def sketch_values(doc):
+    """{dimension: value} a document contributes to the sketches"""
+    return {
+        'cpu_model': doc.get('cpu_model'),
+        'gpu_model': doc.get('gpu_model'),
+        'combo': combo_label(doc.get('cpu_model'), doc.get('gpu_model')),
+    }
+
+
+class SketchSet:
+    """One HyperLogLog and one SpaceSaving per dimension"""
+
+    def __init__(self, p=DEFAULT_PRECISION, k=DEFAULT_TOP_K):
+        self.distinct = {dim: HyperLogLog(p) for dim in SKETCH_DIMENSIONS}
+        self.top = {dim: SpaceSaving(k) for dim in SKETCH_DIMENSIONS}
+
+    def add(self, doc):
+        for dim, value in sketch_values(doc).items():
+            if value is not None:
+                self.distinct[dim].add(value)
+            self.top[dim].add(value)
+
+    def merge(self, other):
+        for dim in SKETCH_DIMENSIONS:
+            self.distinct[dim].merge(other.distinct[dim])
+            self.top[dim].merge(other.top[dim])
+        return self
+
+    def to_doc(self):
+        return {
+            'distinct': {dim: sketch.to_doc() for dim, sketch in self.distinct.items()},
+            'top': {dim: sketch.to_doc() for dim, sketch in self.top.items()},
+        }
+
+    @classmethod
+    def from_doc(cls, doc):
+        sketches = cls()
+        sketches.distinct = {dim: HyperLogLog.from_doc(doc['distinct'][dim]) for dim in SKETCH_DIMENSIONS}
+        sketches.top = {dim: SpaceSaving.from_doc(doc['top'][dim]) for dim in SKETCH_DIMENSIONS}
+        return sketches
+
+
+class SketchStore:
+    """In-process sketches for the dashboard, periodically merged into MongoDB"""
+
+    def __init__(self, collection, flush_interval=DEFAULT_FLUSH_INTERVAL, p=DEFAULT_PRECISION, k=DEFAULT_TOP_K):
+        self.collection = collection
+        self.flush_interval = flush_interval
+        self.p = p
+        self.k = k
+        self._lock = threading.Lock()
+        self._view = SketchSet(p, k)    # persisted state + local increments
+        self._delta = SketchSet(p, k)   # local increments not yet persisted
+        self._pending = 0
+        self._complete = False
+        self._synced_at = None
+
+    def record_many(self, docs):
+        """Add submitted documents; persists when the flush interval has passed"""
+        with self._lock:
+            for doc in docs:
+                self._view.add(doc)
+                self._delta.add(doc)
+            self._pending += len(docs)
+        self._maybe_sync()
+
+    def _maybe_sync(self):
+        if self._synced_at is None or time.monotonic() - self._synced_at >= self.flush_interval:
+            try:
+                self.sync()
+            except Exception as e:
+                logger.error(f"Failed to sync sketches: {e}")
+
+    def sync(self):
+        """Merge local increments into the shared document and read back everyone else's"""
+        with self._lock:
+            delta, pending = self._delta, self._pending
+            self._delta, self._pending = SketchSet(self.p, self.k), 0
+            self._synced_at = time.monotonic()
+        try:
+            stored = self._merge_into_store(delta, pending)
+        except Exception:
+            # คืน increment ที่ยังไม่ได้บันทึก แล้วลองใหม่รอบหน้า
+            with self._lock:
+                self._delta.merge(delta)
+                self._pending += pending
+            raise
+        with self._lock:
+            if stored is not None:
+                self._view = SketchSet.from_doc(stored['sketches']).merge(self._delta)
+                self._complete = stored.get('complete', False)
+
+    def _merge_into_store(self, delta, pending):
+        for _ in range(CAS_RETRIES):
+            stored = self.collection.find_one({'_id': SKETCH_ID})
+            if not pending:
+                return stored
+            if stored is None:
+                doc = {'_id': SKETCH_ID, 'version': 1, 'complete': False, 'sketches': delta.to_doc()}
+                try:
+                    self.collection.insert_one(doc)
+                    return doc
+                except DuplicateKeyError:
+                    continue  # another worker created it first
+            merged = SketchSet.from_doc(stored['sketches']).merge(delta)
+            result = self.collection.update_one(
+                {'_id': SKETCH_ID, 'version': stored['version']},
+                {'$set': {'sketches': merged.to_doc()}, '$inc': {'version': 1}},
+            )
+            if result.matched_count:
+                stored.update(sketches=merged.to_doc(), version=stored['version'] + 1)
+                return stored
+        raise RuntimeError(f'Sketch update conflicted {CAS_RETRIES} times')
+
+    def ready(self):
+        """True once the sketches cover the whole collection (see rebuild)"""
+        self._maybe_sync()
+        return self._complete
+
+    def fill(self, stats, top_n=DEFAULT_TOP_K):
+        """Put distinct counts and top-K counts into a dashboard stats dict"""
+        with self._lock:
+            for dim in SKETCH_DIMENSIONS:
+                stats['distinct'][dim] = self._view.distinct[dim].count()
+                stats['counts'][dim] = dict(self._view.top[dim].top(top_n))
+        return stats
+
+    def rebuild(self, source, batch_size=REBUILD_BATCH_SIZE):
+        """
+        Build the sketches from the whole collection and mark them complete.
+        Like the rollup rebuild, run it while ingest is quiet: increments that
+        workers have not flushed yet are added on top.
+        """
+        sketches = SketchSet(self.p, self.k)
+        processed = 0
+        for doc in source.find({}, _PROJECTION, batch_size=batch_size):
+            sketches.add(doc)
+            processed += 1
+        with self._lock:
+            self._delta, self._pending = SketchSet(self.p, self.k), 0
+            self.collection.replace_one(
+                {'_id': SKETCH_ID},
+                {'version': int(time.time() * 1000), 'complete': True, 'sketches': sketches.to_doc()},
+                upsert=True,
+            )
+            self._view, self._complete, self._synced_at = sketches, True, time.monotonic()
+        logger.info(f"Sketch rebuild finished: {processed} documents")
+        return processed
+
+
+def main(argv):
+    if len(argv) != 2 or argv[1] != 'rebuild':
+        print(f"Usage: {argv[0]} rebuild")
+        return 2
+
+    logging.basicConfig(level=logging.INFO)
+    client = MongoClient(os.environ.get('MONGODB_URI', 'mongodb://localhost:27017'))
+    db = client["system-monitor"]
+    processed = SketchStore(db[SKETCH_COLLECTION]).rebuild(db["process"])
+    print(f"✅ Built sketches from {processed} documents")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
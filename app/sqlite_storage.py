@@ -0,0 +1,353 @@
+"""
+Embedded storage backend on SQLite (``STORAGE_BACKEND=sqlite``).
+
+One local file (``SQLITE_PATH``) in WAL mode: readers never block the
+writer, so /admin and /list keep answering during ingest. Each document is
+one row:
+
+* ``id``: the ObjectId as hex (clustered primary key), so /list keeps its
+  ``_id`` order and ``after`` cursors
+* ``created_at``: epoch microseconds (UTC)
+* the dashboard fields as plain columns: the categorical fields as sent
+  (objects and lists are stored as NULL), ``mode`` (test_details.mode),
+  ``ram`` and ``score`` as floats
+* ``doc``: the submitted document as JSON, returned by /list as is
+
+The indexes mirror the MongoDB ones in indexes.py. The dashboard is one
+GROUP BY per stats dimension, run by the engine inside a single read
+transaction, so only the per-key counts reach Python. The results are
+the same as aggregate.stats_from_documents over the same documents.
+Connections are per thread (and re-opened after a fork).
+
+    python sqlite_storage.py status [path]
+"""
+
+import json
+import logging
+import math
+import os
+import sqlite3
+import sys
+import threading
+from datetime import date, datetime, timedelta, timezone
+
+from bson import ObjectId
+
+from dashboard import SCORE_DIMENSIONS, empty_stats, extract_score
+from storage import Storage
+
+logger = logging.getLogger(__name__)
+
+CATEGORICAL_FIELDS = ['test_device_type', 'cpu_brand', 'cpu_model', 'gpu_brand', 'gpu_model', 'ram_gb']
+# /list query field -> column
+COLUMNS = {field: field for field in CATEGORICAL_FIELDS}
+COLUMNS.update({'_id': 'id', 'created_at': 'created_at', 'test_details.mode': 'mode'})
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS process (
+    id TEXT PRIMARY KEY,
+    created_at INTEGER,
+    test_device_type, cpu_brand, cpu_model, gpu_brand, gpu_model, ram_gb,
+    mode, ram REAL, score REAL,
+    doc TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS process_created_at ON process (created_at);
+CREATE INDEX IF NOT EXISTS process_cpu_model_created_at ON process (cpu_model, created_at);
+CREATE INDEX IF NOT EXISTS process_gpu_model_created_at ON process (gpu_model, created_at);
+CREATE INDEX IF NOT EXISTS process_cpu_brand_gpu_brand ON process (cpu_brand, gpu_brand);
+CREATE INDEX IF NOT EXISTS process_mode ON process (mode);
+'''
+INSERT = ('INSERT INTO process (id, created_at, test_device_type, cpu_brand, cpu_model, gpu_brand, gpu_model, '
+          'ram_gb, mode, ram, score, doc) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)')
+
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_EPOCH_DAY = date(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+_DAY_US = 86400 * 1000000
+_WEEK_US = 7 * _DAY_US
+
+_MODE = "COALESCE(mode, 'unknown')"
+_FLOOR_SCORE = 'CAST(score AS INTEGER) - (score < CAST(score AS INTEGER))'
+# stats dimension -> (key expressions, extra condition); NULL keys are skipped like aggregate.count_by
+_COUNTS = {
+    'cpu_model': (['cpu_model'], None),
+    'gpu_model': (['gpu_model'], None),
+    'cpu_brand': (['cpu_brand'], None),
+    'gpu_brand': (['gpu_brand'], None),
+    'ram_gb': (['ram_gb'], None),
+    'day': ([f'created_at / {_DAY_US}'], 'created_at IS NOT NULL'),
+    'mode': ([_MODE], None),
+    'device_type': (["COALESCE(test_device_type, 'unknown')"], None),
+    'combo': (["CASE WHEN typeof(cpu_model) = 'text' THEN cpu_model ELSE 'Unknown CPU' END || ' + ' || "
+               "CASE WHEN typeof(gpu_model) = 'text' THEN gpu_model ELSE 'Unknown GPU' END"], None),
+    'brand_pair': (['cpu_brand', 'gpu_brand'], 'test_device_type IS NOT NULL'),
+}
+# score histogram dimension -> (stats['score_hists'] key, key expression)
+_SCORE_HISTS = {'mode_score_bin': ('mode', _MODE), 'cpu_score_bin': ('cpu_model', 'cpu_model')}
+
+
+def _epoch_us(value):
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if not isinstance(value, datetime):
+        return None
+    return (value - (_EPOCH if value.tzinfo is None else _EPOCH_UTC)) // _MICROSECOND
+
+
+def _scalar(value):
+    return value if value is None or isinstance(value, (str, int, float)) else None
+
+
+def _float(value):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def _row(doc):
+    details = doc.get('test_details')
+    mode = score = None
+    if isinstance(details, dict):
+        mode = _scalar(details.get('mode', 'unknown'))
+        score = extract_score(details)
+    body = {key: value for key, value in doc.items() if key not in ('_id', 'created_at')}
+    return (str(doc['_id']), _epoch_us(doc.get('created_at')),
+            *[_scalar(doc.get(field)) for field in CATEGORICAL_FIELDS],
+            mode, _float(doc.get('ram_gb')), score, json.dumps(body, default=str))
+
+
+def _value(field, value):
+    if field == '_id':
+        return str(value)
+    if field == 'created_at':
+        return _epoch_us(value)
+    return value
+
+
+def where(query, params):
+    """SQL condition for a /list query (listing.parse_list_args); appends bind values to `params`"""
+    clauses = []
+    for field, condition in query.items():
+        if field in ('$and', '$or'):
+            parts = [where(part, params) for part in condition]
+            clauses.append('(' + (' AND ' if field == '$and' else ' OR ').join(parts) + ')')
+            continue
+        if field not in COLUMNS:
+            raise ValueError(f'Unsupported filter field: {field}')
+        column = COLUMNS[field]
+        if isinstance(condition, dict):
+            for op, value in condition.items():
+                sql_op = {'$gt': '>', '$gte': '>=', '$lt': '<', '$lte': '<='}.get(op)
+                if sql_op is None:
+                    raise ValueError(f'Unsupported filter operator: {op}')
+                clauses.append(f'{column} {sql_op} ?')
+                params.append(_value(field, value))
+        else:
+            clauses.append(f'{column} = ?')
+            params.append(_value(field, condition))
+    return ' AND '.join(clauses) or '1'
+
+
+def _window_sql(window, params):
+    if window is None:
+        return '1'
+    start, end = window
+    clauses = []
+    if start is not None:
+        clauses.append('created_at >= ?')
+        params.append(_epoch_us(start))
+    if end is not None:
+        clauses.append('created_at < ?')
+        params.append(_epoch_us(end))
+    return ' AND '.join(clauses)
+
+
+class SQLiteStorage(Storage):
+    """Storage backend on a local SQLite file"""
+
+    name = 'sqlite'
+
+    def __init__(self, path, synchronous=None):
+        self.path = path
+        self.synchronous = synchronous or os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute(f'PRAGMA synchronous={self.synchronous}')
+        self._local.conn, self._local.pid = conn, os.getpid()
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    # -- writes -----------------------------------------------------------------------------
+
+    def insert(self, doc):
+        self.insert_many([doc])
+        return doc['_id']
+
+    def insert_many(self, docs):
+        for doc in docs:
+            doc.setdefault('_id', ObjectId())
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.executemany(INSERT, [_row(doc) for doc in docs])
+        return []
+
+    def delete(self, ids):
+        conn = self._connect()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            deleted = conn.total_changes
+            conn.executemany('DELETE FROM process WHERE id = ?', [(str(record_id),) for record_id in ids])
+            return conn.total_changes - deleted
+
+    # -- reads ------------------------------------------------------------------------------
+
+    def find(self, query, projection=None, sort=None, limit=None):
+        params = []
+        sql = f'SELECT id, created_at, doc FROM process WHERE {where(query or {}, params)}'
+        order = [COLUMNS[field] + (' DESC' if direction < 0 else '') for field, direction in sort or [('_id', 1)]]
+        sql += ' ORDER BY ' + ', '.join(order)
+        if limit:
+            sql += f' LIMIT {int(limit)}'
+        return _Cursor(self._connect().execute(sql, params), projection)
+
+    def stats(self, dims=None, window=None):
+        """Dashboard stats for `dims` (rollup dimension names, all when None) in a created_at window"""
+        stats = empty_stats()
+        window_params = []
+        window_sql = _window_sql(window, window_params)
+        conn = self._connect()
+        conn.execute('BEGIN')
+        try:
+            def rows(sql, condition=None):
+                sql_where = window_sql + (f' AND {condition}' if condition else '')
+                return conn.execute(sql.format(where=sql_where), window_params)
+
+            total, ram_sum, ram_count, score_sum, score_count = next(rows(
+                'SELECT COUNT(*), TOTAL(ram), COUNT(ram), TOTAL(score), COUNT(score) FROM process WHERE {where}'))
+            stats.update(total=total, ram_sum=ram_sum, ram_count=ram_count, score_sum=score_sum,
+                         score_count=score_count)
+            if not total:
+                return stats
+            for dim, (keys, condition) in _COUNTS.items():
+                if dims is not None and dim not in dims:
+                    continue
+                with_scores = dim in SCORE_DIMENSIONS
+                not_null = ' AND '.join(f'{key} IS NOT NULL' for key in keys)
+                sql = (f"SELECT {', '.join(keys)}, COUNT(*)"
+                       + (', TOTAL(score), COUNT(score)' if with_scores else '')
+                       + f" FROM process WHERE {{where}} AND {not_null} GROUP BY {', '.join(keys)}")
+                counter = stats['counts'][dim]
+                for row in rows(sql, condition):
+                    key = tuple(row[:len(keys)]) if len(keys) > 1 else row[0]
+                    if dim == 'day':
+                        key = (_EPOCH_DAY + timedelta(days=key)).isoformat()
+                    counter[key] = row[len(keys)]
+                    if with_scores and row[-1]:
+                        stats['score_sums'][dim][key] = [row[-2], row[-1]]
+            if dims is None or 'score_bin' in dims:
+                for score_bin, n in rows(f'SELECT {_FLOOR_SCORE} AS bin, COUNT(*) FROM process '
+                                         'WHERE {where} AND score IS NOT NULL GROUP BY bin'):
+                    stats['score_bins'][score_bin] = n
+            for hist_dim, (dim, key) in _SCORE_HISTS.items():
+                if dims is not None and hist_dim not in dims:
+                    continue
+                hists = stats['score_hists'][dim]
+                for value, score_bin, n in rows(f'SELECT {key}, {_FLOOR_SCORE} AS bin, COUNT(*) FROM process '
+                                                f'WHERE {{where}} AND score IS NOT NULL AND {key} IS NOT NULL '
+                                                f'GROUP BY {key}, bin'):
+                    hists.setdefault(value, {})[score_bin] = n
+        finally:
+            conn.execute('COMMIT')
+        return stats
+
+    def newest(self, window=None):
+        params = []
+        (newest,) = self._connect().execute(f'SELECT MAX(created_at) FROM process WHERE {_window_sql(window, params)}',
+                                            params).fetchone()
+        return None if newest is None else _EPOCH_UTC + newest * _MICROSECOND
+
+    def growth_counts(self, window=None, anchor=None):
+        """Same windows as queries.growth_counts, anchored at the newest test in the window"""
+        if anchor is None:
+            anchor = self.newest(window)
+        if anchor is None:
+            return 0, 0
+        anchor = _epoch_us(anchor)
+        conn = self._connect()
+        start = _epoch_us(window[0]) if window is not None and window[0] is not None else None
+
+        def count(after, until):
+            if start is not None and start > after:
+                return conn.execute('SELECT COUNT(*) FROM process WHERE created_at >= ? AND created_at <= ?',
+                                    (start, until)).fetchone()[0]
+            return conn.execute('SELECT COUNT(*) FROM process WHERE created_at > ? AND created_at <= ?',
+                                (after, until)).fetchone()[0]
+
+        return count(anchor - _WEEK_US, anchor), count(anchor - 2 * _WEEK_US, anchor - _WEEK_US)
+
+    def ping(self):
+        self._connect().execute('SELECT 1')
+
+    def status(self):
+        conn = self._connect()
+        return {
+            'path': os.path.abspath(self.path),
+            'documents': conn.execute('SELECT COUNT(*) FROM process').fetchone()[0],
+            'journal_mode': conn.execute('PRAGMA journal_mode').fetchone()[0],
+            'size_bytes': os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+        }
+
+    def close(self):
+        with self._lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._connections = []
+        self._local = threading.local()
+
+
+class _Cursor:
+    """Rows of a find() as MongoDB-shaped documents (naive UTC created_at, ObjectId _id)"""
+
+    def __init__(self, cursor, projection):
+        self._cursor = cursor
+        self._projection = projection
+
+    def __iter__(self):
+        fields = set(self._projection) | {'_id'} if self._projection else None
+        while True:
+            rows = self._cursor.fetchmany(1000)
+            if not rows:
+                return
+            for record_id, created_at, body in rows:
+                doc = {'_id': ObjectId(record_id), **json.loads(body)}
+                if created_at is not None:
+                    doc['created_at'] = _EPOCH + created_at * _MICROSECOND
+                yield {key: value for key, value in doc.items() if key in fields} if fields else doc
+
+    def close(self):
+        self._cursor.close()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] != 'status':
+        print(__doc__)
+        sys.exit(1)
+    print(json.dumps(SQLiteStorage(sys.argv[2] if len(sys.argv) > 2 else 'system-monitor.db').status(), indent=2))
@@ -0,0 +1,198 @@
+"""
+Storage backends behind /submit, /list and /admin.
+
+Routes only talk to a ``Storage``:
+
+    storage.insert(doc)                      # one document, sets doc['_id']
+    storage.insert_many(docs)                # -> write errors [{'index', 'errmsg'}]
+    storage.find(query, projection, sort, limit)   # parse_list_args() params -> documents
+    storage.stats(dims, window)              # dashboard stats dict (dashboard.py)
+    storage.growth_counts(window)            # (tests in the last 7 days, previous 7 days)
+    storage.after_insert(docs)               # fold stored documents into derived data
+    storage.delete(ids)                      # archive.py moves old documents out
+
+With ``ARCHIVE_DIR`` set, the backend is wrapped in
+``archive.ArchivedStorage``, which adds the Parquet archive to find(),
+stats() and growth_counts().
+
+Backends (``STORAGE_BACKEND``):
+
+* ``mongodb`` (default) - ``MongoStorage``: the ``process`` collection,
+  with the dashboard read from rollups, daily rollups and sketches, and
+  the days past the retention period from history (retention.py)
+* ``sqlite`` - ``sqlite_storage.SQLiteStorage``: one local file
+  (``SQLITE_PATH``), no external service; the dashboard GROUP BYs run in
+  the engine (see sqlite_storage.py)
+"""
+
+import logging
+import os
+
+from pymongo.errors import BulkWriteError
+
+from dashboard import merge_stats
+from queries import growth_counts, newest_created_at, query_stats
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ['mongodb', 'sqlite']
+DEFAULT_SQLITE_PATH = 'system-monitor.db'
+
+
+class Storage:
+    """Interface shared by the backends"""
+
+    name = None
+    # sketches.SketchStore when the backend keeps one (top-K charts and distinct counts)
+    sketches = None
+    # archive.Archive queried together with this backend (archive.ArchivedStorage)
+    archive = None
+
+    def insert(self, doc):
+        raise NotImplementedError
+
+    def insert_many(self, docs):
+        raise NotImplementedError
+
+    def find(self, query, projection=None, sort=None, limit=None):
+        """Iterable of documents (with ``close()``) in `sort` order"""
+        raise NotImplementedError
+
+    def delete(self, ids):
+        """Remove the documents with these ``_id`` values (archive.py moves them out)"""
+        raise NotImplementedError
+
+    def stats(self, dims=None, window=None):
+        raise NotImplementedError
+
+    def stats_include_removed(self, window=None):
+        """True when stats(window) come from counters that still count deleted documents (rollups)"""
+        return False
+
+    def newest(self, window=None):
+        """created_at (aware UTC) of the newest document in the window, None when empty"""
+        raise NotImplementedError
+
+    def growth_counts(self, window=None, anchor=None):
+        """(last 7 days, previous 7 days) counts ending at `anchor` (default: newest())"""
+        raise NotImplementedError
+
+    def after_insert(self, docs):
+        pass
+
+    def ping(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class MongoStorage(Storage):
+
+    name = 'mongodb'
+
+    def __init__(self, collection, rollups=None, daily_rollups=None, sketches=None, history=None):
+        self.collection = collection
+        self.rollups = rollups
+        self.daily_rollups = daily_rollups
+        self.sketches = sketches
+        self.history = history
+
+    def insert(self, doc):
+        return self.collection.insert_one(doc).inserted_id
+
+    def insert_many(self, docs):
+        try:
+            self.collection.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            return e.details.get('writeErrors', [])
+        return []
+
+    def delete(self, ids):
+        return self.collection.delete_many({'_id': {'$in': list(ids)}}).deleted_count
+
+    def find(self, query, projection=None, sort=None, limit=None):
+        from listing import STREAM_BATCH_SIZE
+
+        cursor = self.collection.find(query, projection, sort=sort, batch_size=STREAM_BATCH_SIZE)
+        return cursor.limit(limit) if limit else cursor
+
+    def stats(self, dims=None, window=None):
+        if window is not None or self.rollups is None:
+            # ช่วงเวลาที่เลือก: aggregate เฉพาะเอกสารในช่วงนั้น (ใช้ index created_at)
+            return self._window_stats(window)
+        # อ่านสถิติที่คำนวณไว้แล้ว (rollups) แทนการดึงข้อมูลทั้งหมด
+        stats = self.rollups.snapshot(dims)
+        if not stats['total']:
+            logger.warning("Rollups are empty, aggregating process collection (run: python rollups.py rebuild)")
+            return query_stats(self.collection)
+        if (dims is None or 'day' in dims) and self.daily_rollups is not None:
+            # กราฟรายวันอ่านจาก daily_rollups (หนึ่งเอกสารต่อวัน)
+            day_counts = self.daily_rollups.day_counts()
+            if not day_counts:
+                # rollups มีข้อมูลแต่ daily_rollups ว่าง (rebuild ไม่ครบหรือ record_many ล้มเหลว)
+                logger.warning("Daily rollups are empty, aggregating process collection (run: python daily.py rebuild)")
+                day_counts = query_stats(self.collection)['counts']['day']
+            stats['counts']['day'] = day_counts
+        return stats
+
+    def _window_stats(self, window):
+        folded_until = self.history.folded_until() if self.history is not None else None
+        start, end = window or (None, None)
+        if folded_until is None or (start is not None and start >= folded_until):
+            return query_stats(self.collection, window)
+        # วันที่พับเข้า history แล้ว (retention.py) อ่านจาก history เพราะ TTL อาจลบเอกสารดิบไปแล้ว
+        stats = self.history.stats((start, folded_until if end is None else min(end, folded_until)))
+        if end is None or end > folded_until:
+            merge_stats(stats, query_stats(self.collection, (folded_until, end)))
+        return stats
+
+    def stats_include_removed(self, window=None):
+        # stats() อ่าน rollups เฉพาะเมื่อมีข้อมูลแล้ว ไม่งั้น fallback ไป aggregate เอกสารที่ยังอยู่
+        return window is None and self.rollups is not None and not self.rollups.is_empty()
+
+    def newest(self, window=None):
+        return newest_created_at(self.collection, window)
+
+    def growth_counts(self, window=None, anchor=None):
+        return growth_counts(self.collection, window, anchor)
+
+    def after_insert(self, docs):
+        """Fold newly stored documents into the rollups, daily rollups and sketches"""
+        if self.rollups is not None:
+            try:
+                self.rollups.record_many(docs)
+            except Exception as e:
+                # The raw documents are saved; `python rollups.py rebuild` repairs the counters
+                logger.error(f"Failed to update rollups: {e}")
+        if self.daily_rollups is not None:
+            try:
+                self.daily_rollups.record_many(docs)
+            except Exception as e:
+                logger.error(f"Failed to update daily rollups (run: python daily.py rebuild): {e}")
+        if self.sketches is not None:
+            try:
+                self.sketches.record_many(docs)
+            except Exception as e:
+                logger.error(f"Failed to update sketches: {e}")
+
+    def ping(self):
+        self.collection.database.client.admin.command('ping')
+
+    def close(self):
+        if self.sketches is not None:
+            self.sketches.sync()
+
+
+def backend_from_env(environ=os.environ):
+    backend = environ.get('STORAGE_BACKEND', 'mongodb').lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"STORAGE_BACKEND must be one of: {', '.join(BACKENDS)}")
+    return backend
+
+
+def embedded_storage_from_env(environ=os.environ):
+    """The local backend selected by STORAGE_BACKEND (MongoStorage is built once connected)"""
+    from sqlite_storage import SQLiteStorage
+
+    return SQLiteStorage(environ.get('SQLITE_PATH', DEFAULT_SQLITE_PATH))
@@ -0,0 +1,121 @@
+"""
+Validation of /submit payloads, shared by the single and batch endpoints.
+"""
+
+import json
+from datetime import datetime, timezone
+
+REQUIRED_FIELDS = ['test_device_type', 'cpu_brand', 'cpu_model', 'gpu_brand', 'gpu_model', 'ram_gb']
+MAX_BATCH_SIZE = 1000
+
+
+def build_document(data):
+    """
+    Validate one submitted record and return the document to store.
+    Raises ValueError with a client-facing message.
+    """
+    if not data:
+        raise ValueError('No JSON data provided')
+    if not isinstance(data, dict):
+        raise ValueError('Record must be a JSON object')
+
+    # Validate required fields
+    for field in REQUIRED_FIELDS:
+        if field not in data:
+            raise ValueError(f'Missing field: {field}')
+
+    # Prepare document
+    return {
+        'test_device_type': data['test_device_type'], # ประเภทอุปกรณ์ที่ใช้ทดสอบ (CPU/GPU)
+        'cpu_brand': data['cpu_brand'],           # ยี่ห้อ CPU
+        'cpu_model': data['cpu_model'],           # รุ่น CPU
+        'gpu_brand': data['gpu_brand'],           # ยี่ห้อ GPU
+        'gpu_model': data['gpu_model'],           # รุ่น GPU
+        'ram_gb': data['ram_gb'],                 # จำนวนแรม (GB)
+        'test_details': data.get('test_details'), # ข้อมูลอื่นๆ (optional)
+        'created_at': datetime.now(timezone.utc)  # เวลาบันทึก (timezone-aware)
+    }
+
+
+def parse_batch(body, content_type):
+    """
+    Records of a batch request: a JSON array, or NDJSON (one object per line)
+    when sent as application/x-ndjson. Lines that are not valid JSON are
+    returned as ValueError instances so they can be reported per record.
+    """
+    text = body.decode('utf-8')
+    if content_type and content_type.split(';')[0].strip() == 'application/x-ndjson':
+        records = []
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError as e:
+                records.append(ValueError(f'Invalid JSON: {e}'))
+    else:
+        try:
+            records = json.loads(text)
+        except ValueError as e:
+            raise ValueError(f'Invalid JSON: {e}')
+        if not isinstance(records, list):
+            raise ValueError('Batch body must be a JSON array or NDJSON')
+
+    if not records:
+        raise ValueError('No records provided')
+    if len(records) > MAX_BATCH_SIZE:
+        raise ValueError(f'Batch too large: {len(records)} records (max {MAX_BATCH_SIZE})')
+    return records
+
+
+def validate_batch(records):
+    """
+    Split parsed records into (documents to insert, per-record results).
+    Results for invalid records are filled in; valid ones are completed
+    after the insert. Each document is paired with its record index.
+    """
+    documents = []
+    results = [None] * len(records)
+    for index, record in enumerate(records):
+        try:
+            if isinstance(record, ValueError):
+                raise record
+            documents.append((index, build_document(record)))
+        except ValueError as e:
+            results[index] = {'index': index, 'status': 'error', 'message': str(e)}
+    return documents, results
+
+
+def apply_write_errors(documents, results, write_errors):
+    """
+    Complete `results` after an unordered insert_many of `documents`.
+    `write_errors` come from BulkWriteError.details (their index is the
+    position in the insert). Returns the documents that were stored.
+    """
+    failed = {error['index']: error.get('errmsg', 'Write failed') for error in write_errors}
+    inserted = []
+    for position, (index, doc) in enumerate(documents):
+        if position in failed:
+            results[index] = {'index': index, 'status': 'error', 'message': failed[position]}
+        else:
+            results[index] = {'index': index, 'status': 'ok', 'document_id': str(doc['_id'])}
+            inserted.append(doc)
+    return inserted
+
+
+def demo_results(documents, results):
+    """Mock ids for a batch accepted in Demo Mode"""
+    for index, doc in documents:
+        results[index] = {'index': index, 'status': 'ok', 'document_id': 'demo-' + str(hash(str(doc)))}
+
+
+def batch_response(results, demo):
+    """/submit/batch response body"""
+    saved = sum(1 for result in results if result['status'] == 'ok')
+    return {
+        'status': 'ok' if saved == len(results) else 'partial',
+        'message': f'{saved} of {len(results)} records saved' + (' (Demo Mode).' if demo else '.'),
+        'saved': saved,
+        'failed': len(results) - saved,
+        'results': results
+    }
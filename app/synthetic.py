@@ -0,0 +1,146 @@
+"""
+Synthetic benchmark submissions for load tests and benchmarks.
+
+The mix of hardware, test modes and timestamps is described by a
+``Profile``; the default is uniform over the lists below. A profile can be
+loaded from JSON (see bench_load.py --profile)::
+
+    {
+      "cpu_weights": {"i5-13600K": 5, "Ryzen 7 7700X": 3, "M2": 1},
+      "gpu_weights": {"RTX 4070": 4, "RTX 3060": 4},
+      "ram_weights": {"16": 5, "32": 4, "64": 1},
+      "mode_weights": {"ai": 2, "all": 1},
+      "device_weights": {"CPU": 1, "GPU": 3},
+      "free_text_rate": 0.05,
+      "missing_score_rate": 0.1,
+      "score_mean": 70, "score_sd": 12,
+      "timestamps": "recent"
+    }
+
+Models, RAM sizes and modes missing from a weights dict are not generated.
+``timestamps`` is ``uniform`` (over the last `days` days), ``recent``
+(exponentially more tests towards the end) or ``diurnal`` (uniform days,
+more tests during the day than at night, UTC).
+"""
+
+import json
+import random
+from datetime import datetime, timedelta, timezone
+
+CPUS = [
+    ('Intel', 'i5-13600K'), ('Intel', 'i7-13700K'), ('Intel', 'i9-13900K'), ('Intel', 'i5-12400F'),
+    ('AMD', 'Ryzen 5 7600X'), ('AMD', 'Ryzen 7 5800X'), ('AMD', 'Ryzen 7 7700X'), ('AMD', 'Ryzen 9 7900X'),
+    ('AMD', 'Ryzen 9 7950X'), ('Apple', 'M2'), ('Apple', 'M3 Pro'),
+]
+GPUS = [
+    ('NVIDIA', 'RTX 3060'), ('NVIDIA', 'RTX 3080'), ('NVIDIA', 'RTX 4070'), ('NVIDIA', 'RTX 4080'),
+    ('NVIDIA', 'RTX 4090'), ('AMD', 'RX 6700 XT'), ('AMD', 'RX 7800 XT'), ('AMD', 'RX 7900 XTX'),
+    ('Intel', 'Arc A770'), ('Apple', 'M2 GPU'),
+]
+RAM_SIZES = [8, 16, 32, 64, 128]
+MODES = ['ai', 'all', 'cpu', 'gpu']
+DEVICE_TYPES = ['CPU', 'GPU']
+TIMESTAMP_SHAPES = ['uniform', 'recent', 'diurnal']
+# Relative test volume per UTC hour for 'diurnal' (quiet at night, peak in the evening)
+HOURLY_WEIGHTS = [1, 1, 1, 1, 1, 2, 3, 4, 5, 6, 6, 6, 6, 6, 6, 7, 8, 9, 10, 10, 9, 6, 4, 2]
+
+
+class Choice:
+    """Uniform or weighted choice over a fixed list of values"""
+
+    def __init__(self, values, weights=None, key=str):
+        if weights is None:
+            self.values, self.weights = list(values), None
+            return
+        by_key = {key(value): value for value in values}
+        unknown = [name for name in weights if str(name) not in by_key]
+        if unknown:
+            raise ValueError(f"Unknown value(s): {', '.join(map(str, unknown))}")
+        self.values = [by_key[str(name)] for name in weights]
+        self.weights = [float(weight) for weight in weights.values()]
+
+    def pick(self, rnd):
+        if self.weights is None:
+            return rnd.choice(self.values)
+        return rnd.choices(self.values, self.weights)[0]
+
+
+class Profile:
+    """Distribution of generated records (uniform by default)"""
+
+    def __init__(self, cpu_weights=None, gpu_weights=None, ram_weights=None, mode_weights=None,
+                 device_weights=None, free_text_rate=0.1, missing_score_rate=0.1, score_mean=70, score_sd=12,
+                 timestamps='uniform'):
+        if timestamps not in TIMESTAMP_SHAPES:
+            raise ValueError(f"timestamps must be one of: {', '.join(TIMESTAMP_SHAPES)}")
+        self.cpus = Choice(CPUS, cpu_weights, key=lambda cpu: cpu[1])
+        self.gpus = Choice(GPUS, gpu_weights, key=lambda gpu: gpu[1])
+        self.ram = Choice(RAM_SIZES, ram_weights)
+        self.modes = Choice(MODES, mode_weights)
+        self.device_types = Choice(DEVICE_TYPES, device_weights)
+        self.free_text_rate = free_text_rate
+        self.missing_score_rate = missing_score_rate
+        self.score_mean = score_mean
+        self.score_sd = score_sd
+        self.timestamps = timestamps
+
+    @classmethod
+    def from_dict(cls, config):
+        return cls(**config)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    def created_at(self, rnd, end, days):
+        span = days * 86400
+        if self.timestamps == 'recent':
+            # เฉลี่ยราว 1/3 ของช่วงเวลา: วันหลัง ๆ มีการทดสอบมากกว่า
+            return end - timedelta(seconds=min(int(rnd.expovariate(3 / span)), span))
+        if self.timestamps == 'diurnal':
+            day = end - timedelta(days=rnd.randrange(days))
+            hour = rnd.choices(range(24), HOURLY_WEIGHTS)[0]
+            created = day.replace(hour=hour, minute=rnd.randrange(60), second=rnd.randrange(60), microsecond=0)
+            return created if created <= end else created - timedelta(days=1)
+        return end - timedelta(seconds=rnd.randint(0, span))
+
+
+DEFAULT_PROFILE = Profile()
+
+
+def generate_records(n, seed=42, days=90, end=None, profile=None):
+    """
+    Yield n /submit documents with created_at spread over the last `days` days.
+    With the default profile about 1 in 10 has a free-text test_details and
+    1 in 10 has no avg_score, mirroring what older clients send.
+    """
+    profile = profile or DEFAULT_PROFILE
+    rnd = random.Random(seed)
+    end = end or datetime.now(timezone.utc)
+    no_score = profile.free_text_rate + profile.missing_score_rate
+    for _ in range(n):
+        cpu_brand, cpu_model = profile.cpus.pick(rnd)
+        gpu_brand, gpu_model = profile.gpus.pick(rnd)
+        roll = rnd.random()
+        if roll < profile.free_text_rate:
+            test_details = 'Gaming performance test'
+        elif roll < no_score:
+            test_details = {'test_type': 'ai', 'mode': profile.modes.pick(rnd)}
+        else:
+            test_details = {
+                'test_type': 'ai',
+                'mode': profile.modes.pick(rnd),
+                'total_time': round(rnd.uniform(30, 300), 1),
+                'avg_score': round(rnd.gauss(profile.score_mean, profile.score_sd), 1),
+            }
+        yield {
+            'test_device_type': profile.device_types.pick(rnd),
+            'cpu_brand': cpu_brand,
+            'cpu_model': cpu_model,
+            'gpu_brand': gpu_brand,
+            'gpu_model': gpu_model,
+            'ram_gb': profile.ram.pick(rnd),
+            'test_details': test_details,
+            'created_at': profile.created_at(rnd, end, days),
+        }
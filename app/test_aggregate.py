@@ -0,0 +1,47 @@
+import mongomock
+import pytest
+
+from aggregate import stats_from_columns
+from fetch import fetch_columns
+
+from test_storage import approx_stats, records
+
+pytest.importorskip('pandas')
+
+
+@pytest.fixture(scope='module')
+def collection():
+    docs = records(1500)
+    # records() already has missing test_details, a missing cpu_model and a missing ram_gb
+    docs[6]['gpu_brand'] = None
+    docs[7]['test_device_type'] = None
+    docs[8].pop('test_device_type')
+    docs[9]['ram_gb'] = 'lots'
+    docs[10]['ram_gb'] = None
+    docs[11]['test_details'] = {'mode': 'cpu', 'avg_score': 'n/a'}
+    collection = mongomock.MongoClient().db['process']
+    collection.insert_many(docs)
+    return collection
+
+
+def test_columns_match_pandas_stats(collection):
+    from bench_engine import legacy_stats
+
+    stats = stats_from_columns(fetch_columns(collection))
+    expected = legacy_stats(list(collection.find()))
+    assert approx_stats(stats) == approx_stats(expected)
+    assert (stats['tests_last_7d'], stats['tests_prev_7d']) == (expected['tests_last_7d'], expected['tests_prev_7d'])
+
+    counts = stats['counts']
+    assert None not in counts['gpu_brand'] and None not in counts['cpu_model'] and None not in counts['ram_gb']
+    assert counts['device_type']['unknown'] >= 2
+    # a brand pair needs a device type and both brands
+    assert sum(counts['brand_pair'].values()) == 1500 - counts['device_type']['unknown'] - 1
+    assert stats['ram_count'] == 1500 - 3
+
+
+def test_query_selects_documents(collection):
+    newest = collection.find_one(sort=[('created_at', -1)])['created_at']
+    stats = stats_from_columns(fetch_columns(collection, {'created_at': {'$gte': newest}}, batch_size=7))
+    assert stats['total'] == collection.count_documents({'created_at': {'$gte': newest}})
+    assert stats_from_columns(fetch_columns(collection, {'cpu_brand': 'nobody'}))['total'] == 0
@@ -0,0 +1,80 @@
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip('quart')
+pytest.importorskip('motor')
+
+import app as sync_app  # noqa: E402
+import app_async  # noqa: E402
+from listing import parse_list_args  # noqa: E402
+from sqlite_storage import SQLiteStorage  # noqa: E402
+from synthetic import generate_records  # noqa: E402
+
+
+@pytest.fixture(autouse=True, scope='module')
+def stop_connecting():
+    yield
+    sync_app.connection.close()
+
+
+def record():
+    doc = next(iter(generate_records(1)))
+    doc.pop('created_at')
+    return doc
+
+
+def call(method, path, **kwargs):
+    async def run():
+        async with app_async.app.test_app() as test_app:
+            response = await getattr(test_app.test_client(), method)(path, **kwargs)
+            return response.status_code, response.headers, await response.get_json()
+    return asyncio.run(run())
+
+
+def test_degraded_submit_answers_503(monkeypatch):
+    monkeypatch.setattr(sync_app, 'storage', None)
+    monkeypatch.setattr(sync_app, 'DEMO_FALLBACK', False)
+    status, headers, body = call('post', '/submit', json=record())
+    assert status == 503 and headers['Retry-After']
+    status, _, body = call('get', '/health')
+    assert status == 200 and body['status'] == 'degraded' and 'state' in body['mongodb']
+
+
+def test_demo_mode_matches_sync_contract(monkeypatch):
+    monkeypatch.setattr(sync_app, 'storage', None)
+    monkeypatch.setattr(sync_app, 'DEMO_FALLBACK', True)
+    status, _, body = call('post', '/submit', json=record())
+    assert status == 200 and body['document_id'].startswith('demo-')
+    status, _, body = call('post', '/submit', json={'cpu_model': 'x'})
+    assert status == 400 and body['status'] == 'error'
+    status, _, body = call('post', '/submit/batch', json=[record(), {}])
+    assert status == 200 and (body['status'], body['saved'], body['failed']) == ('partial', 1, 1)
+    assert call('get', '/list')[2] == []
+    assert call('get', '/api/charts/unknown')[0] == 404
+
+
+def test_embedded_ndjson_streams_in_chunks(monkeypatch, tmp_path):
+    storage = SQLiteStorage(str(tmp_path / 'stream.db'))
+    storage.insert_many(list(generate_records(2500)))
+    monkeypatch.setattr(sync_app, 'storage', storage)
+    monkeypatch.setattr(sync_app, 'STORAGE_BACKEND', 'sqlite')
+    monkeypatch.setattr(app_async, 'motor_client', None)
+    monkeypatch.setattr(app_async, 'collection', None)
+
+    async def run():
+        async with app_async.app.test_app() as test_app:
+            response = await test_app.test_client().get('/list?format=ndjson&sort=created_at')
+            async with app_async.app.app_context():
+                params = parse_list_args({'sort': 'created_at'}, stream=True)
+                chunks = [chunk async for chunk in app_async._ndjson_in_thread(storage, params)]
+            return response.status_code, await response.get_data(), chunks
+    status, body, chunks = asyncio.run(run())
+    assert status == 200
+    # one chunk per STREAM_BATCH_SIZE documents instead of one string
+    assert len(chunks) == 3 and b''.join(chunks) == body
+    docs = [json.loads(line) for line in body.decode().splitlines()]
+    expected = storage.find({}, sort=[('created_at', 1), ('_id', 1)])
+    assert [doc['cpu_model'] for doc in docs] == [doc.get('cpu_model') for doc in expected]
+    storage.close()
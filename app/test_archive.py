@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta, timezone
+
+import mongomock
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from archive import Archive, ArchivedStorage, archive_older_than
+from listing import next_cursor, parse_list_args
+from rollups import RollupStore
+from sqlite_storage import SQLiteStorage
+from storage import MongoStorage
+
+from test_storage import approx_stats, records
+
+
+@pytest.fixture(params=['mongodb', 'sqlite'])
+def stores(request, tmp_path):
+    """(hot + archive, reference backend holding every document)"""
+    docs = records(3000)
+    reference = SQLiteStorage(str(tmp_path / 'reference.db'))
+    reference.insert_many(docs)
+    docs = list(reference.find({}))
+    hot = (MongoStorage(mongomock.MongoClient().db['process']) if request.param == 'mongodb'
+           else SQLiteStorage(str(tmp_path / 'hot.db')))
+    hot.insert_many([dict(doc) for doc in docs])
+    archive = Archive(str(tmp_path / 'archive'))
+    cutoff = datetime.now(timezone.utc) - timedelta(days=12)
+    moved = archive_older_than(hot, archive, cutoff, batch_size=700)
+    assert 0 < moved < len(docs)
+    yield ArchivedStorage(hot, archive), reference
+    reference.close()
+
+
+def dashboard(stats):
+    # the 7-day counters come from growth_counts() (compared separately)
+    return approx_stats(dict(stats, tests_last_7d=0, tests_prev_7d=0))
+
+
+def pages(storage, args):
+    """Every document of a /list query, fetched page by page through the `after` cursor"""
+    results = []
+    while True:
+        params = parse_list_args(args)
+        page = list(storage.find(params['query'], params['projection'], params['sort'], params['limit']))
+        results += page
+        if len(page) < params['limit']:
+            return results
+        args = dict(args, after=next_cursor(page[-1], params['sort'][0][0]))
+
+
+def test_archive_is_partitioned_by_day(stores):
+    storage, reference = stores
+    status = storage.archive.status()
+    assert status['documents'] + len(list(storage.hot.find({}))) == 3000
+    assert status['partitions'] >= 15 and status['files'] > status['partitions']
+    for day, directory in storage.archive.partitions():
+        assert directory.endswith(f'date={day.isoformat()}')
+
+    before = list(storage.find({}, sort=[('_id', 1)]))
+    assert storage.archive.compact()
+    assert storage.archive.status()['files'] == storage.archive.status()['partitions']
+    assert list(storage.find({}, sort=[('_id', 1)])) == before
+
+
+def test_list_merges_hot_and_archive(stores):
+    storage, reference = stores
+    for args in [{'limit': '250'}, {'limit': '300', 'sort': 'created_at'},
+                 {'limit': '40', 'cpu_model': 'M2', 'ram_gb': '16'},
+                 {'limit': '100', 'mode': 'ai', 'sort': 'created_at', 'fields': 'cpu_model,test_details'}]:
+        assert pages(storage, args) == pages(reference, args), args
+
+
+def test_dashboard_adds_archived_days(stores):
+    storage, reference = stores
+    assert dashboard(storage.stats()) == dashboard(reference.stats())
+    for days in (5, 20, 40):
+        window = (datetime.now(timezone.utc) - timedelta(days=days), None)
+        assert dashboard(storage.stats(window=window)) == dashboard(reference.stats(window=window)), days
+        assert storage.growth_counts(window) == reference.growth_counts(window), days
+    window = (datetime.now(timezone.utc) - timedelta(days=25), datetime.now(timezone.utc) - timedelta(days=15))
+    assert dashboard(storage.stats(window=window)) == dashboard(reference.stats(window=window))
+    assert storage.growth_counts(window) == reference.growth_counts(window) != (0, 0)
+
+
+
+def test_empty_rollups_fall_back_with_archive(stores):
+    storage, reference = stores
+    if not isinstance(storage.hot, MongoStorage):
+        pytest.skip('rollups are MongoDB only')
+    storage.hot.rollups = RollupStore(mongomock.MongoClient().db['rollups'])
+    # no counters yet: stats() aggregates the live documents, so the archive must be added
+    assert not storage.stats_include_removed()
+    assert dashboard(storage.stats()) == dashboard(reference.stats())
+    storage.hot.rollups.record_many(list(reference.find({})))
+    assert storage.stats_include_removed()
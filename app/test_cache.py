@@ -0,0 +1,124 @@
+import threading
+import time
+
+import pytest
+
+import cache
+from cache import DashboardCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, 'monotonic', clock)
+    return clock
+
+
+def counter():
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return len(calls)
+    return calls, compute
+
+
+def test_entry_expires_after_ttl(clock):
+    dashboard_cache = DashboardCache(ttl=30)
+    calls, compute = counter()
+    assert dashboard_cache.get('summary', compute) == 1
+    clock.now += 29.9
+    assert dashboard_cache.get('summary', compute) == 1
+    clock.now += 0.2
+    assert dashboard_cache.get('summary', compute) == 2
+    assert (dashboard_cache.hits, dashboard_cache.misses) == (1, 2)
+
+
+def test_invalidate_bumps_every_key(clock):
+    dashboard_cache = DashboardCache(ttl=30)
+    calls, compute = counter()
+    dashboard_cache.get('summary', compute)
+    dashboard_cache.get('chart:cpu', compute)
+    dashboard_cache.invalidate()
+    assert dashboard_cache.version == 1
+    assert dashboard_cache.get('summary', compute) == 3
+    assert dashboard_cache.get('chart:cpu', compute) == 4
+    assert dashboard_cache.get('summary', compute) == 3
+
+
+def test_zero_ttl_and_max_entries(clock):
+    calls, compute = counter()
+    uncached = DashboardCache(ttl=0)
+    uncached.get('summary', compute)
+    uncached.get('summary', compute)
+    assert len(calls) == 2
+
+    small = DashboardCache(ttl=30, max_entries=2)
+    for key in ('a', 'b', 'c'):
+        small.get(key, compute)
+    # 'a' was the oldest entry
+    assert small.get('c', compute) == 5 and small.get('a', compute) == 6
+
+
+def test_concurrent_misses_compute_once():
+    dashboard_cache = DashboardCache(ttl=30)
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'payload'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(dashboard_cache.get('summary', compute)))
+               for _ in range(8)]
+    threads[0].start()
+    assert started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert results == ['payload'] * 8 and len(calls) == 1
+
+
+def test_waiters_see_the_error():
+    dashboard_cache = DashboardCache(ttl=30)
+    started, release = threading.Event(), threading.Event()
+
+    def compute():
+        started.set()
+        release.wait(5)
+        raise RuntimeError('aggregation failed')
+
+    errors = []
+
+    def call():
+        try:
+            dashboard_cache.get('summary', compute)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    assert started.wait(5)
+    follower = threading.Thread(target=call)
+    follower.start()
+    time.sleep(0.05)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    assert errors == ['aggregation failed'] * 2
+    # failures are not cached
+    assert dashboard_cache.get('summary', lambda: 'ok') == 'ok'
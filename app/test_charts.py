@@ -0,0 +1,69 @@
+import json
+
+import mongomock
+import pytest
+
+import app as sync_app
+from daily import DailyRollupStore
+from dashboard import CHARTS
+from queries import parse_window
+from rollups import RollupStore
+from storage import MongoStorage
+
+from test_storage import records
+
+
+@pytest.fixture(autouse=True, scope='module')
+def stop_connecting():
+    yield
+    sync_app.connection.close()
+
+
+@pytest.fixture(scope='module')
+def filled():
+    db = mongomock.MongoClient().db
+    docs = records(800, days=30)
+    db['process'].insert_many([dict(doc) for doc in docs])
+    storage = MongoStorage(db['process'], RollupStore(db['rollups']), DailyRollupStore(db['daily_rollups']))
+    storage.after_insert(docs)
+    return storage
+
+
+@pytest.fixture
+def client(monkeypatch, filled):
+    monkeypatch.setattr(sync_app, 'storage', filled)
+    # ไม่ให้ผลที่ cache ไว้จาก test อื่นปนกัน
+    monkeypatch.setattr(sync_app, 'dashboard_cache', sync_app.DashboardCache(ttl=0))
+    return sync_app.app.test_client(), filled
+
+
+def test_unknown_chart(client):
+    response = client[0].get('/api/charts/nope')
+    assert response.status_code == 404
+    assert response.get_json() == {'status': 'error', 'message': 'Unknown chart: nope'}
+
+
+@pytest.mark.parametrize('query', ['from=yesterday', 'to=2024-13-01', 'from=2024-06-10&to=2024-06-01'])
+def test_bad_window(client, query):
+    response = client[0].get(f'/api/charts/cpu?{query}')
+    assert response.status_code == 400
+    assert response.get_json()['status'] == 'error'
+
+
+@pytest.mark.parametrize('name', sorted(CHARTS))
+def test_every_chart_matches_the_full_dashboard(client, name):
+    client, storage = client
+    response = client.get(f'/api/charts/{name}')
+    assert response.status_code == 200 and response.mimetype == 'application/json'
+    # rollups of only the chart's dimensions give the same figure as all of them
+    assert response.get_json() == json.loads(json.dumps(CHARTS[name](storage.stats())))
+
+
+def test_windowed_chart(client):
+    client, storage = client
+    newest = max(doc['created_at'] for doc in storage.collection.find({}, {'created_at': 1}))
+    start = newest.date().isoformat()
+    response = client.get(f'/api/charts/daily?from={start}')
+    figure = response.get_json()
+    assert figure == json.loads(json.dumps(CHARTS['daily'](storage.stats(None, parse_window({'from': start})))))
+    assert figure['data'][0]['x'] == [start]
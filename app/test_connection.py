@@ -0,0 +1,59 @@
+import mongomock
+
+from connection import MongoConnection
+
+
+class FlakyClient:
+    """mongomock client whose ping fails until the server 'comes up'"""
+
+    failures = 0
+
+    def __init__(self, uri, **kwargs):
+        self._client = mongomock.MongoClient()
+        self.admin = self
+
+    def command(self, name):
+        if FlakyClient.failures:
+            FlakyClient.failures -= 1
+            raise ConnectionError('server selection timeout')
+        return {'ok': 1}
+
+
+def test_connects_after_backoff():
+    FlakyClient.failures = 3
+    connected = []
+    connection = MongoConnection('mongodb://flaky', on_connect=connected.append, client_factory=FlakyClient,
+                                 backoff_initial=0.01, backoff_max=0.04).start()
+    assert connection.wait(timeout=5)
+    status = connection.status()
+    assert status['state'] == 'connected'
+    assert status['attempts'] == 4
+    assert status['last_error'] is None and status['connected_at']
+    assert connected == [connection.client]
+
+
+def test_reports_backoff_state_without_blocking():
+    FlakyClient.failures = 10 ** 6
+    connection = MongoConnection('mongodb://down', client_factory=FlakyClient,
+                                 backoff_initial=0.01, backoff_max=60).start()
+    assert not connection.wait(timeout=0.3)
+    status = connection.status()
+    assert status['state'] in ('connecting', 'backoff')
+    assert status['attempts'] >= 2
+    assert 'server selection timeout' in status['last_error']
+    connection.close()
+
+
+def test_on_connect_failure_is_retried():
+    FlakyClient.failures = 0
+    calls = []
+
+    def on_connect(client):
+        calls.append(client)
+        if len(calls) == 1:
+            raise RuntimeError('index build failed')
+
+    connection = MongoConnection('mongodb://ok', on_connect=on_connect, client_factory=FlakyClient,
+                                 backoff_initial=0.01).start()
+    assert connection.wait(timeout=5)
+    assert len(calls) == 2
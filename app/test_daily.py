@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta, timezone
+
+import mongomock
+
+from daily import DailyRollupStore, daily_increments, decode_key, encode_key
+from queries import parse_window
+from rollups import RollupStore, rollup_increments
+from storage import MongoStorage
+
+from test_storage import records
+
+BANGKOK = timezone(timedelta(hours=7))
+
+
+def test_days_are_utc():
+    docs = [
+        # 03:00 in Bangkok is still the previous day in UTC
+        {'created_at': datetime(2024, 6, 5, 3, 0, tzinfo=BANGKOK), 'cpu_brand': 'AMD'},
+        {'created_at': datetime(2024, 6, 4, 23, 30), 'cpu_brand': 'AMD'},
+        {'created_at': datetime(2024, 6, 5, 0, 0, tzinfo=timezone.utc), 'cpu_brand': 'Intel'},
+    ]
+    assert {day: inc['count'] for day, inc in daily_increments(docs).items()} == {'2024-06-04': 2, '2024-06-05': 1}
+    # the same buckets as the per-day rollups
+    by_day = rollup_increments(docs, by_day=True)
+    assert {day for day, dim, _ in by_day if dim == 'total'} == {'2024-06-04', '2024-06-05'}
+
+
+def test_increments_per_day():
+    day = datetime(2024, 6, 4, 10, tzinfo=timezone.utc)
+    docs = [
+        {'created_at': day, 'test_device_type': 'CPU', 'cpu_brand': 'A.B$', 'gpu_brand': 'NVIDIA',
+         'test_details': {'avg_score': 70.0}},
+        {'created_at': day, 'test_device_type': None, 'cpu_brand': 'A.B$', 'gpu_brand': 'NVIDIA',
+         'test_details': 'free text'},
+    ]
+    assert daily_increments(docs) == {'2024-06-04': {
+        'count': 2, 'device_type.CPU': 1, 'device_type.unknown': 1, 'cpu_brand.A%2EB%24': 2,
+        'gpu_brand.NVIDIA': 2, 'score_sum': 70.0, 'score_count': 1}}
+    for key in ('A.B$', '100%', 'plain'):
+        assert decode_key(encode_key(key)) == key
+
+
+def test_check_finds_drift():
+    db = mongomock.MongoClient().db
+    docs = records(600, days=20)
+    db['process'].insert_many([dict(doc) for doc in docs])
+    store = DailyRollupStore(db['daily_rollups'])
+    store.record_many(docs)
+    assert store.check(db['process']) == []
+    assert sum(row['count'] for row in store.series()) == 600
+
+    day = min(store.day_counts())
+    db['daily_rollups'].update_one({'_id': day}, {'$inc': {'count': 1}})
+    mismatches = store.check(db['process'])
+    assert [(m['day'], m['field'], m['actual'] - m['expected']) for m in mismatches] == [(day, 'count', 1)]
+    # a window cutting that day does not compare it
+    start = datetime.fromisoformat(day).replace(hour=12, tzinfo=timezone.utc)
+    assert store.check(db['process'], (start, None)) == []
+    assert store.check(db['process'], parse_window({'from': day})) != []
+
+
+def test_empty_daily_rollups_fall_back():
+    db = mongomock.MongoClient().db
+    docs = records(300, days=10)
+    db['process'].insert_many([dict(doc) for doc in docs])
+    RollupStore(db['rollups']).record_many(docs)
+    storage = MongoStorage(db['process'], RollupStore(db['rollups']), DailyRollupStore(db['daily_rollups']))
+    # rollups rebuilt, daily rollups not
+    expected = DailyRollupStore(db['expected'])
+    expected.record_many(docs)
+    assert storage.stats()['counts']['day'] == expected.day_counts()
+    assert sum(storage.stats(dims=['day'])['counts']['day'].values()) == 300
@@ -0,0 +1,33 @@
+import random
+
+import pytest
+
+from dashboard import histogram_quantiles, score_bin
+
+
+def test_uniform_histogram():
+    bins = {bucket: 1 for bucket in range(100)}
+    assert histogram_quantiles(bins, [0.5, 0.9, 0.99]) == pytest.approx([50.0, 90.0, 99.0])
+    # bins may come in any order, and with empty buckets in between
+    skewed = {90: 10, 10: 10, 50: 0, 0: 0}
+    assert histogram_quantiles(skewed, [0.5, 0.9, 0.99]) == pytest.approx([11.0, 90.8, 90.98])
+
+
+def test_empty_histogram():
+    assert histogram_quantiles({}) == [None, None, None]
+    assert histogram_quantiles({42: 0}, [0.5]) == [None]
+
+
+def test_single_bin():
+    assert histogram_quantiles({70: 10}, [0.0, 0.5, 0.9, 0.99, 1.0]) == pytest.approx([70.0, 70.5, 70.9, 70.99, 71.0])
+
+
+def test_close_to_exact_percentiles():
+    rnd = random.Random(3)
+    scores = sorted(rnd.gauss(65, 12) for _ in range(5000))
+    bins = {}
+    for score in scores:
+        bins[score_bin(score)] = bins.get(score_bin(score), 0) + 1
+    for q, estimate in zip([0.5, 0.9, 0.99], histogram_quantiles(bins, [0.5, 0.9, 0.99])):
+        # within the 1-point bin width of the exact order statistic
+        assert abs(estimate - scores[int(q * len(scores)) - 1]) < 1.0
@@ -0,0 +1,74 @@
+import os
+
+import pytest
+
+from demo_log import StoreLocked, _files, open_store
+from synthetic import generate_records
+
+
+def records(n, seed=1):
+    docs = list(generate_records(n, seed=seed))
+    docs[0]['test_details'] = {'mode': 'ai', 'extra': [1, 2]}
+    docs[1]['test_details'] = None
+    return docs
+
+
+def snapshot_of(store):
+    return list(store.iter_docs()), store.value_counts('cpu_model'), store.day_counts(), store.ram_mean()
+
+
+def test_restore_from_log_and_snapshot(tmp_path):
+    store = open_store(tmp_path, snapshot_every=10 ** 9)
+    store.extend(records(300))
+    store.journal.snapshot()
+    store.extend(records(200, seed=2))
+    expected = snapshot_of(store)
+    store.journal.close()
+
+    assert [seq for seq, _ in _files(tmp_path, 'snapshot-')] == [300]
+    assert [seq for seq, _ in _files(tmp_path, 'log-')] == [300]
+    restored = open_store(tmp_path)
+    assert snapshot_of(restored) == expected
+    assert len(list(restored.iter_docs({'cpu_model': 'M2'}))) == expected[1]['M2']
+    restored.journal.close()
+
+
+def test_ring_buffer_survives_restart(tmp_path):
+    store = open_store(tmp_path, capacity=50, snapshot_every=10 ** 9)
+    store.extend(records(120))
+    store.journal.snapshot()
+    store.extend(records(30, seed=2))
+    expected = snapshot_of(store)
+    store.journal.close()
+
+    restored = open_store(tmp_path, capacity=50)
+    assert len(restored) == 50 and snapshot_of(restored) == expected
+    restored.extend(records(60, seed=3))
+    assert len(restored) == 50
+    restored.journal.close()
+
+
+def test_torn_tail_is_cut_off(tmp_path):
+    store = open_store(tmp_path)
+    store.extend(records(10))
+    store.journal.close()
+    (_, log), = _files(tmp_path, 'log-')
+    size = os.path.getsize(log)
+    with open(log, 'ab') as f:
+        f.write(b'\x50\x00\x00\x00\x01\x02')  # crash in the middle of a frame
+
+    store = open_store(tmp_path)
+    assert len(store) == 10 and os.path.getsize(log) == size
+    store.extend(records(5, seed=2))
+    store.journal.close()
+    store = open_store(tmp_path)
+    assert len(store) == 15
+    store.journal.close()
+
+
+def test_one_process_per_directory(tmp_path):
+    store = open_store(tmp_path)
+    with pytest.raises(StoreLocked):
+        open_store(tmp_path)
+    store.journal.close()
+    open_store(tmp_path).journal.close()
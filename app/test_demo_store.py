@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from demo_store import RecordStore
+
+
+def doc(i, **overrides):
+    record = {
+        'test_device_type': 'GPU',
+        'cpu_brand': 'AMD',
+        'cpu_model': f'Ryzen {i % 3}',
+        'gpu_brand': 'NVIDIA',
+        'gpu_model': 'RTX 4070',
+        'ram_gb': 16 if i % 2 else 32,
+        'test_details': {'test_type': 'ai', 'mode': 'gpu' if i % 2 else 'ai', 'total_time': 12.5, 'avg_score': 80.0},
+    }
+    record.update(overrides)
+    return record
+
+
+def test_roundtrip_keeps_documents():
+    store = RecordStore()
+    created = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+    details = [
+        {'test_type': 'ai', 'mode': 'all', 'total_time': 1.5, 'avg_score': 70.2},
+        {'test_type': 'ai', 'mode': 'cpu'},
+        'Gaming performance test',
+        None,
+        {'mode': 'ai', 'extra': [1, 2]},
+    ]
+    ids = [store.append(doc(i, test_details=d, created_at=created)) for i, d in enumerate(details)]
+    docs = list(store.iter_docs())
+    assert [d['_id'] for d in docs] == ids
+    assert [d['test_details'] for d in docs] == details
+    assert docs[0]['created_at'] == datetime(2024, 5, 1, 12, 30)
+    assert docs[1]['cpu_model'] == 'Ryzen 1' and docs[1]['ram_gb'] == 16
+    # dict ที่ไม่ตรงรูปแบบยังนับโหมดตามที่ส่งมา ส่วนข้อความ/None เป็น 'unknown'
+    assert store.value_counts('mode') == {'all': 1, 'cpu': 1, 'unknown': 2, 'ai': 1}
+
+
+def test_ring_buffer_evicts_oldest():
+    store = RecordStore(capacity=4)
+    start = datetime(2024, 1, 1)
+    for i in range(10):
+        store.append(doc(i, created_at=start + timedelta(days=i)))
+    assert len(store) == 4
+    assert [d['created_at'].day for d in store.iter_docs()] == [7, 8, 9, 10]
+    assert store.value_counts('ram_gb') == {16: 2, 32: 2}
+    assert store.value_counts('cpu_model') == {'Ryzen 0': 2, 'Ryzen 1': 1, 'Ryzen 2': 1}
+    assert sum(store.day_counts().values()) == 4 and store.ram_mean() == 24
+    assert [d['ram_gb'] for d in store.iter_docs({'mode': 'gpu'})] == [16, 16]
+
+
+def test_filters_use_indexes_and_limit():
+    indexed, scanned = RecordStore(), RecordStore(indexes=())
+    for i in range(3000):
+        indexed.append(doc(i))
+        scanned.append(doc(i))
+    filters = {'cpu_model': 'Ryzen 2', 'ram_gb': 16}
+    expected = [d['cpu_model'] for d in scanned.iter_docs(filters)]
+    assert len(expected) == 500
+    assert [d['cpu_model'] for d in indexed.iter_docs(filters)] == expected
+    assert len(list(indexed.iter_docs(filters, limit=7))) == 7
+    assert list(indexed.iter_docs({'cpu_model': 'nope'})) == []
+
+
+def test_rejects_non_scalar_fields():
+    store = RecordStore()
+    with pytest.raises(ValueError):
+        store.append(doc(0, cpu_model={'$gt': ''}))
+    assert len(store) == 0 and store.value_counts('cpu_model') == {}
+
+
+def test_created_at_defaults_to_utc_now():
+    store = RecordStore()
+    before = datetime.now(timezone.utc).replace(tzinfo=None)
+    store.append(doc(0))
+    created = next(store.iter_docs())['created_at']
+    # naive UTC, like documents read back from MongoDB
+    assert created.tzinfo is None
+    assert before - timedelta(seconds=1) <= created <= datetime.now(timezone.utc).replace(tzinfo=None)
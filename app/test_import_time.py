@@ -0,0 +1,38 @@
+import os
+import subprocess
+import sys
+
+# Import cost budget for `import app` (ms), excluding app.py's own top-level code
+# (templates, routes, starting the connection thread). Override with IMPORT_BUDGET_MS on slow machines.
+IMPORT_BUDGET_MS = float(os.environ.get('IMPORT_BUDGET_MS', 300))
+# best of several runs: one run is at the mercy of disk cache and machine load
+IMPORT_RUNS = 3
+# Only needed by /admin fallbacks, benchmarks or the browser; never at import time
+LAZY_MODULES = ['numpy', 'pandas', 'plotly', 'aggregate', 'fetch']
+
+
+def import_times():
+    """{module: (self_us, cumulative_us)} from `python -X importtime -c 'import app'`"""
+    env = dict(os.environ, MONGODB_URI='mongodb://127.0.0.1:1', WRITE_BEHIND='0', ENSURE_INDEXES='0')
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                            cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def test_app_import_within_budget():
+    imports_ms = min((times['app'][1] - times['app'][0]) / 1000
+                     for times in (import_times() for _ in range(IMPORT_RUNS)))
+    assert imports_ms <= IMPORT_BUDGET_MS, f'app imports take {imports_ms:.0f} ms (budget {IMPORT_BUDGET_MS:.0f} ms)'
+
+
+def test_analytics_stack_is_lazy():
+    times = import_times()
+    loaded = [name for name in times if name.split('.')[0] in LAZY_MODULES]
+    assert not loaded, f'imported at startup: {", ".join(loaded)}'
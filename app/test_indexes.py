@@ -0,0 +1,79 @@
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from indexes import PROCESS_INDEXES, ensure_indexes, index_status, plan_index_names
+from synthetic import generate_records
+
+# explain() needs a real server (mongomock has no query planner)
+MONGODB_URI = os.environ.get('MONGODB_URI', 'mongodb://localhost:27017')
+TEST_DB = 'system-monitor-index-test'
+
+
+@pytest.fixture(scope='module')
+def db():
+    client = MongoClient(MONGODB_URI, serverSelectionTimeoutMS=2000)
+    try:
+        client.admin.command('ping')
+    except PyMongoError as e:
+        pytest.skip(f"MongoDB not reachable at {MONGODB_URI}: {e}")
+    client.drop_database(TEST_DB)
+    db = client[TEST_DB]
+    db['process'].insert_many(list(generate_records(2000)))
+    ensure_indexes(db)
+    yield db
+    client.drop_database(TEST_DB)
+    client.close()
+
+
+def winning_indexes(collection, query, sort=None):
+    cursor = collection.find(query)
+    if sort:
+        cursor = cursor.sort(sort)
+    return plan_index_names(cursor.explain())
+
+
+def test_ensure_indexes_is_idempotent(db):
+    """Second run creates nothing and every expected index is present"""
+    assert ensure_indexes(db) == []
+    for name, status in index_status(db).items():
+        assert status['missing'] == [], name
+
+
+def test_time_window_uses_created_at(db):
+    """7-day window queries are index range scans"""
+    since = datetime.now(timezone.utc) - timedelta(days=7)
+    assert 'created_at_1' in winning_indexes(db['process'], {'created_at': {'$gte': since}})
+
+
+def test_model_filters_use_compound_indexes(db):
+    """Per-model time windows use the (model, created_at) indexes"""
+    since = datetime.now(timezone.utc) - timedelta(days=30)
+    cpu = winning_indexes(db['process'], {'cpu_model': 'i5-13600K', 'created_at': {'$gte': since}})
+    gpu = winning_indexes(db['process'], {'gpu_model': 'RTX 4070', 'created_at': {'$gte': since}})
+    assert 'cpu_model_1_created_at_1' in cpu
+    assert 'gpu_model_1_created_at_1' in gpu
+
+
+def test_brand_pair_and_mode_filters(db):
+    """Brand pair and test mode filters are not collection scans"""
+    brands = winning_indexes(db['process'], {'cpu_brand': 'AMD', 'gpu_brand': 'NVIDIA'})
+    mode = winning_indexes(db['process'], {'test_details.mode': 'all'})
+    assert 'cpu_brand_1_gpu_brand_1' in brands
+    assert 'test_details.mode_1' in mode
+
+
+def test_plan_index_names_walks_nested_stages():
+    """Index names are found below FETCH/SORT/OR stages"""
+    explain = {'queryPlanner': {'winningPlan': {
+        'stage': 'FETCH',
+        'inputStage': {'stage': 'OR', 'inputStages': [
+            {'stage': 'IXSCAN', 'indexName': 'created_at_1'},
+            {'stage': 'IXSCAN', 'indexName': 'test_details.mode_1'},
+        ]},
+    }}}
+    assert plan_index_names(explain) == ['created_at_1', 'test_details.mode_1']
+    assert len({model.document['name'] for model in PROCESS_INDEXES}) == len(PROCESS_INDEXES)
@@ -0,0 +1,99 @@
+import threading
+
+import mongomock
+import pytest
+from pymongo.errors import AutoReconnect
+
+from ingest import QueueFull, WriteBehindQueue
+
+
+class RecordingCollection:
+    """mongomock collection that remembers the size of every insert_many batch"""
+
+    def __init__(self):
+        self.collection = mongomock.MongoClient().db['process']
+        self.batches = []
+
+    def insert_many(self, docs, ordered=True):
+        self.batches.append(len(docs))
+        return self.collection.insert_many(docs, ordered=ordered)
+
+
+class BlockingCollection(RecordingCollection):
+    def __init__(self):
+        super().__init__()
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def insert_many(self, docs, ordered=True):
+        self.entered.set()
+        self.release.wait(5)
+        return super().insert_many(docs, ordered)
+
+
+class FlakyCollection(RecordingCollection):
+    """First insert_many writes half the batch, then loses the connection"""
+
+    def insert_many(self, docs, ordered=True):
+        if not self.batches:
+            self.batches.append(len(docs))
+            self.collection.insert_many(docs[:len(docs) // 2], ordered=ordered)
+            raise AutoReconnect('connection reset')
+        return super().insert_many(docs, ordered)
+
+
+def collector():
+    flushed = []
+    return flushed, flushed.extend
+
+
+def test_batches_are_bounded():
+    collection = RecordingCollection()
+    flushed, on_flush = collector()
+    ingest = WriteBehindQueue(collection, on_flush=on_flush, batch_size=10, flush_interval=0.05)
+    ids = [ingest.put({'n': n}) for n in range(25)]
+    ingest.close()
+    assert sum(collection.batches) == 25 and max(collection.batches) <= 10
+    assert sorted(doc['_id'] for doc in flushed) == sorted(ids)
+    assert ingest.inserted == 25 and ingest.failed == 0
+
+
+def test_full_queue_raises():
+    collection = BlockingCollection()
+    ingest = WriteBehindQueue(collection, max_size=3, batch_size=1, flush_interval=0.01)
+    ingest.put({'n': 0})
+    # the flusher is stuck inside insert_many with the first document
+    assert collection.entered.wait(5)
+    for n in range(1, 4):
+        ingest.put({'n': n})
+    with pytest.raises(QueueFull):
+        ingest.put({'n': 4})
+    assert ingest.depth() == 3
+    collection.release.set()
+    ingest.close()
+    assert collection.collection.count_documents({}) == 4
+
+
+def test_close_drains_queue():
+    collection = RecordingCollection()
+    ingest = WriteBehindQueue(collection, batch_size=100, flush_interval=0.2)
+    for n in range(50):
+        ingest.put({'n': n})
+    ingest.close()
+    assert collection.collection.count_documents({}) == 50
+    assert ingest.depth() == 0
+    with pytest.raises(QueueFull):
+        ingest.put({'n': 50})
+
+
+def test_retry_counts_documents_written_before_the_error():
+    collection = FlakyCollection()
+    flushed, on_flush = collector()
+    ingest = WriteBehindQueue(collection, on_flush=on_flush)
+    batch = [{'_id': n, 'n': n} for n in range(10)]
+    ingest._flush(batch)
+    # the retry reports the first half as duplicate keys: they were inserted
+    assert collection.batches == [10, 10]
+    assert collection.collection.count_documents({}) == 10
+    assert ingest.inserted == 10 and ingest.failed == 0
+    assert [doc['_id'] for doc in flushed] == list(range(10))
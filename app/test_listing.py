@@ -0,0 +1,95 @@
+import json
+import re
+from datetime import datetime, timedelta
+
+import mongomock
+import pytest
+from bson import ObjectId
+
+import app as sync_app
+from listing import MAX_LIMIT, next_cursor, parse_list_args
+from storage import MongoStorage
+from synthetic import generate_records
+
+START = datetime(2024, 6, 4, 10, 15)
+
+
+@pytest.fixture(autouse=True, scope='module')
+def stop_connecting():
+    yield
+    sync_app.connection.close()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    collection = mongomock.MongoClient().db['process']
+    docs = list(generate_records(50))
+    for n, doc in enumerate(docs):
+        # three documents per timestamp: the _id breaks the ties
+        doc['created_at'] = START + timedelta(seconds=n // 3)
+    collection.insert_many(docs)
+    monkeypatch.setattr(sync_app, 'storage', MongoStorage(collection))
+    return sync_app.app.test_client(), collection
+
+
+def test_cursor_forms():
+    oid = ObjectId()
+    assert parse_list_args({'after': str(oid)})['query'] == {'_id': {'$gt': oid}}
+    params = parse_list_args({'sort': 'created_at', 'after': f'{START.isoformat()},{oid}'})
+    assert params['sort'] == [('created_at', 1), ('_id', 1)]
+    assert params['query'] == {'$or': [{'created_at': {'$gt': START}}, {'created_at': START, '_id': {'$gt': oid}}]}
+    # timestamp only, combined with a filter
+    params = parse_list_args({'sort': 'created_at', 'after': START.isoformat(), 'cpu_brand': 'AMD'})
+    assert params['query'] == {'$and': [{'cpu_brand': 'AMD'}, {'created_at': {'$gt': START}}]}
+    assert next_cursor({'_id': oid, 'created_at': START}, 'created_at') == f'{START.isoformat()},{oid}'
+    assert next_cursor({'_id': oid}, '_id') == str(oid)
+
+
+@pytest.mark.parametrize('args, message', [
+    ({'after': 'not-an-id'}, 'Invalid cursor id'),
+    ({'sort': 'created_at', 'after': 'yesterday'}, 'Invalid cursor timestamp'),
+    ({'sort': 'created_at', 'after': f'{START.isoformat()},xyz'}, 'Invalid cursor id'),
+    ({'sort': 'cpu_model'}, 'sort must be one of'),
+    ({'limit': 'ten'}, 'limit must be an integer'),
+    ({'limit': '0'}, 'limit must be between'),
+    ({'limit': str(MAX_LIMIT + 1)}, 'limit must be between'),
+    ({'ram_gb': 'lots'}, 'ram_gb must be a number'),
+    ({'fields': 'cpu_model,password'}, 'Unknown field(s): password'),
+])
+def test_bad_arguments_are_rejected(args, message):
+    with pytest.raises(ValueError, match=re.escape(message)):
+        parse_list_args(args)
+
+
+def test_stream_has_no_default_limit():
+    assert parse_list_args({}, stream=True)['limit'] is None
+    assert parse_list_args({})['limit'] == 1000
+
+
+@pytest.mark.parametrize('sort', ['_id', 'created_at'])
+def test_pages_do_not_overlap(client, sort):
+    client, collection = client
+    order = parse_list_args({'sort': sort})['sort']
+    expected = [dict(doc, created_at=doc['created_at'].strftime('%a, %d %b %Y %H:%M:%S GMT'))
+                for doc in collection.find({}, {'_id': 0}, sort=order)]
+    pages = []
+    url = f'/list?limit=7&sort={sort}'
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        pages.append(response.get_json())
+        cursor = response.headers.get('X-Next-Cursor')
+        url = f'/list?limit=7&sort={sort}&after={cursor}' if cursor else None
+    assert [len(page) for page in pages] == [7] * 7 + [1]
+    assert [doc for page in pages for doc in page] == expected
+
+
+def test_ndjson_streams_every_document(client):
+    client, collection = client
+    response = client.get('/list?format=ndjson&sort=created_at&fields=cpu_model')
+    assert response.is_streamed and response.mimetype == 'application/x-ndjson'
+    lines = response.get_data(as_text=True).splitlines()
+    assert len(lines) == 50
+    assert [json.loads(line) for line in lines] == [{'cpu_model': doc.get('cpu_model')} for doc in collection.find(
+        {}, sort=[('created_at', 1), ('_id', 1)])]
+    assert client.get('/list?format=ndjson&limit=5').get_data(as_text=True).count('\n') == 5
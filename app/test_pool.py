@@ -0,0 +1,71 @@
+from pymongo import monitoring
+
+from pool import PoolMetrics, client_options, connection_budget
+
+ADDRESS = ('db.example.net', 27017)
+
+
+def test_client_options_from_env():
+    options = client_options({'MONGO_MAX_POOL_SIZE': '25', 'MONGO_MIN_POOL_SIZE': '2',
+                              'MONGO_WRITE_CONCERN': 'majority', 'MONGO_WTIMEOUT_MS': '5000',
+                              'MONGO_COMPRESSORS': 'zstd, zlib, lz4'})
+    assert options['maxPoolSize'] == 25 and options['minPoolSize'] == 2
+    assert options['maxIdleTimeMS'] == 60000
+    assert options['w'] == 'majority' and options['wTimeoutMS'] == 5000
+    # zlib always works; zstd only with zstandard installed; lz4 is not a MongoDB compressor
+    assert options['compressors'].split(',')[-1] == 'zlib'
+    assert 'lz4' not in options['compressors']
+    assert client_options({'MONGO_WRITE_CONCERN': '1'})['w'] == 1
+    assert 'compressors' not in client_options({})
+
+
+def test_connection_budget():
+    assert connection_budget(10, workers=4) == {'workers': 4, 'max_pool_size': 10, 'max_connections': 48}
+    # app_async.py: Motor plus app.py's PyMongo client in every worker
+    assert connection_budget(10, workers=4, clients=2)['max_connections'] == 96
+
+
+def test_pool_metrics_track_usage():
+    metrics = PoolMetrics()
+    for connection_id in (1, 2, 3):
+        metrics.connection_created(monitoring.ConnectionCreatedEvent(ADDRESS, connection_id))
+    for connection_id in (1, 2, 3):
+        metrics.connection_check_out_started(monitoring.ConnectionCheckOutStartedEvent(ADDRESS))
+        metrics.connection_checked_out(monitoring.ConnectionCheckedOutEvent(ADDRESS, connection_id))
+    metrics.connection_checked_in(monitoring.ConnectionCheckedInEvent(ADDRESS, 3))
+    metrics.connection_check_out_started(monitoring.ConnectionCheckOutStartedEvent(ADDRESS))
+    metrics.connection_check_out_failed(monitoring.ConnectionCheckOutFailedEvent(ADDRESS, 'timeout'))
+    metrics.connection_closed(monitoring.ConnectionClosedEvent(ADDRESS, 3, 'idle'))
+
+    snapshot = metrics.snapshot(max_pool_size=10)
+    assert snapshot['open'] == 2
+    assert snapshot['checked_out'] == 2
+    assert snapshot['peak_checked_out'] == 3
+    assert snapshot['peak_utilization'] == 0.3
+    assert snapshot['checkouts'] == 3
+    assert snapshot['checkout_failures'] == {'timeout': 1}
+    assert snapshot['max_wait_ms'] >= snapshot['avg_wait_ms'] >= 0
+
+
+def test_every_listener_hook_runs():
+    metrics = PoolMetrics()
+    metrics.pool_created(monitoring.PoolCreatedEvent(ADDRESS, {}))
+    metrics.pool_ready(monitoring.PoolReadyEvent(ADDRESS))
+    metrics.connection_created(monitoring.ConnectionCreatedEvent(ADDRESS, 1))
+    metrics.connection_ready(monitoring.ConnectionReadyEvent(ADDRESS, 1))
+    metrics.connection_check_out_started(monitoring.ConnectionCheckOutStartedEvent(ADDRESS))
+    metrics.connection_checked_out(monitoring.ConnectionCheckedOutEvent(ADDRESS, 1))
+    metrics.connection_checked_in(monitoring.ConnectionCheckedInEvent(ADDRESS, 1))
+    metrics.connection_check_out_started(monitoring.ConnectionCheckOutStartedEvent(ADDRESS))
+    metrics.connection_check_out_failed(monitoring.ConnectionCheckOutFailedEvent(ADDRESS, 'connectionError'))
+    metrics.pool_cleared(monitoring.PoolClearedEvent(ADDRESS))
+    metrics.connection_closed(monitoring.ConnectionClosedEvent(ADDRESS, 1, 'poolClosed'))
+    metrics.pool_closed(monitoring.PoolClosedEvent(ADDRESS))
+
+    snapshot = metrics.snapshot()
+    assert snapshot['open'] == 0
+    assert snapshot['checked_out'] == 0
+    assert snapshot['peak_checked_out'] == 1
+    assert snapshot['checkouts'] == 1
+    assert snapshot['checkout_failures'] == {'connectionError': 1}
+    assert snapshot['pools_cleared'] == 1
@@ -0,0 +1,134 @@
+import os
+from datetime import datetime, timedelta, timezone
+
+import mongomock
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from queries import aggregate_stats, growth_counts, parse_window, stats_from_facets
+
+from test_storage import approx_stats, records
+
+MONGODB_URI = os.environ.get('MONGODB_URI', 'mongodb://localhost:27017')
+TEST_DB = 'system-monitor-queries-test'
+
+FIXTURE = [
+    {'cpu_brand': 'AMD', 'cpu_model': 'Ryzen 5 7600X', 'gpu_brand': 'NVIDIA', 'gpu_model': 'RTX 4070', 'ram_gb': 32,
+     'test_device_type': 'CPU', 'test_details': {'mode': 'cpu', 'avg_score': 80.5},
+     'created_at': datetime(2024, 6, 3, 9, 0, tzinfo=timezone.utc)},
+    {'cpu_brand': 'Intel', 'cpu_model': 'i5-13600K', 'gpu_brand': 'NVIDIA', 'gpu_model': 'RTX 4070', 'ram_gb': 16,
+     'test_device_type': 'GPU', 'test_details': {'mode': 'gpu', 'avg_score': 61.0},
+     'created_at': datetime(2024, 6, 4, 10, 0, tzinfo=timezone.utc)},
+    {'cpu_brand': 'Intel', 'cpu_model': 'i5-13600K', 'gpu_brand': 'AMD', 'gpu_model': 'RX 7800 XT', 'ram_gb': 16,
+     'test_device_type': None, 'test_details': 'Gaming performance test',
+     'created_at': datetime(2024, 6, 4, 11, 0, tzinfo=timezone.utc)},
+    {'cpu_brand': 'Apple', 'cpu_model': 'M2', 'gpu_brand': 'Apple', 'gpu_model': 'M2 GPU', 'ram_gb': 8,
+     'test_device_type': 'CPU', 'test_details': {'mode': 'ai'},
+     'created_at': datetime(2024, 6, 4, 12, 0, tzinfo=timezone.utc)},
+]
+
+# what DASHBOARD_PIPELINE returns for FIXTURE ($floor gives float bins)
+FIXTURE_FACETS = {
+    'total': [{'_id': None, 'count': 4, 'ram_sum': 72, 'ram_count': 4, 'score_sum': 141.5, 'score_count': 2}],
+    'cpu_model': [{'_id': 'Ryzen 5 7600X', 'count': 1}, {'_id': 'i5-13600K', 'count': 2}, {'_id': 'M2', 'count': 1}],
+    'gpu_model': [{'_id': 'RTX 4070', 'count': 2}, {'_id': 'RX 7800 XT', 'count': 1}, {'_id': 'M2 GPU', 'count': 1}],
+    'cpu_brand': [{'_id': 'AMD', 'count': 1}, {'_id': 'Intel', 'count': 2}, {'_id': 'Apple', 'count': 1}],
+    'gpu_brand': [{'_id': 'NVIDIA', 'count': 2}, {'_id': 'AMD', 'count': 1}, {'_id': 'Apple', 'count': 1}],
+    'ram_gb': [{'_id': 32, 'count': 1}, {'_id': 16, 'count': 2}, {'_id': 8, 'count': 1}],
+    'day': [{'_id': '2024-06-03', 'count': 1}, {'_id': '2024-06-04', 'count': 3}],
+    'mode': [{'_id': 'cpu', 'count': 1}, {'_id': 'gpu', 'count': 1}, {'_id': 'unknown', 'count': 1},
+             {'_id': 'ai', 'count': 1}],
+    'device_type': [{'_id': 'CPU', 'count': 2}, {'_id': 'GPU', 'count': 1}, {'_id': 'unknown', 'count': 1}],
+    'combo': [{'_id': 'Ryzen 5 7600X + RTX 4070', 'count': 1}, {'_id': 'i5-13600K + RTX 4070', 'count': 1},
+              {'_id': 'i5-13600K + RX 7800 XT', 'count': 1}, {'_id': 'M2 + M2 GPU', 'count': 1}],
+    'brand_pair': [{'_id': {'cpu': 'AMD', 'gpu': 'NVIDIA'}, 'count': 1}, {'_id': {'cpu': 'Intel', 'gpu': 'NVIDIA'}, 'count': 1},
+                   {'_id': {'cpu': 'Apple', 'gpu': 'Apple'}, 'count': 1}],
+    'mode_scores': [{'_id': 'cpu', 'score_sum': 80.5, 'score_count': 1}, {'_id': 'gpu', 'score_sum': 61.0, 'score_count': 1}],
+    'cpu_scores': [{'_id': 'Ryzen 5 7600X', 'score_sum': 80.5, 'score_count': 1},
+                   {'_id': 'i5-13600K', 'score_sum': 61.0, 'score_count': 1}],
+    'score_bins': [{'_id': 80.0, 'count': 1}, {'_id': 61.0, 'count': 1}],
+    'mode_score_bins': [{'_id': {'key': 'cpu', 'bin': 80.0}, 'count': 1}, {'_id': {'key': 'gpu', 'bin': 61.0}, 'count': 1}],
+    'cpu_score_bins': [{'_id': {'key': 'Ryzen 5 7600X', 'bin': 80.0}, 'count': 1},
+                       {'_id': {'key': 'i5-13600K', 'bin': 61.0}, 'count': 1}],
+}
+
+
+def legacy(docs):
+    """The pandas stats dashboard.py computed before the $facet pipeline (bench_engine.py)"""
+    pytest.importorskip('pandas')
+    from bench_engine import legacy_stats
+
+    # the 7-day counters come from growth_counts()
+    return approx_stats(legacy_stats(docs))
+
+
+def test_facets_match_pandas_stats():
+    stats = stats_from_facets(FIXTURE_FACETS)
+    assert stats == legacy(FIXTURE)
+    assert stats['score_bins'] == {80: 1, 61: 1}
+    assert stats['counts']['brand_pair'] == {('AMD', 'NVIDIA'): 1, ('Intel', 'NVIDIA'): 1, ('Apple', 'Apple'): 1}
+
+
+@pytest.fixture(scope='module')
+def db():
+    # mongomock does not implement $convert: the pipeline needs a real server
+    client = MongoClient(MONGODB_URI, serverSelectionTimeoutMS=2000)
+    try:
+        client.admin.command('ping')
+    except PyMongoError as e:
+        pytest.skip(f"MongoDB not reachable at {MONGODB_URI}: {e}")
+    client.drop_database(TEST_DB)
+    yield client[TEST_DB]
+    client.drop_database(TEST_DB)
+    client.close()
+
+
+def test_pipeline_matches_pandas_stats(db):
+    docs = records(2000)
+    db['process'].insert_many([dict(doc) for doc in docs])
+    assert approx_stats(aggregate_stats(db['process'])) == legacy(docs)
+
+
+def test_parse_window_dates_and_datetimes():
+    assert parse_window({}) is None
+    assert parse_window({'from': '', 'to': ''}) is None
+    start, end = parse_window({'from': '2024-06-01', 'to': '2024-06-03'})
+    assert start == datetime(2024, 6, 1, tzinfo=timezone.utc)
+    # a bare `to` date includes that whole day
+    assert end == datetime(2024, 6, 4, tzinfo=timezone.utc)
+    assert parse_window({'from': '2024-06-03', 'to': '2024-06-03'})[1] == datetime(2024, 6, 4, tzinfo=timezone.utc)
+    # datetimes: offsets are converted to UTC, naive ones are UTC, `to` is not extended
+    assert parse_window({'from': '2024-06-01T12:00:00+07:00'}) == (datetime(2024, 6, 1, 5, tzinfo=timezone.utc), None)
+    assert parse_window({'to': '2024-06-01T12:00:00'}) == (None, datetime(2024, 6, 1, 12, tzinfo=timezone.utc))
+
+
+@pytest.mark.parametrize('args, message', [
+    ({'from': 'last week'}, 'from must be an ISO date or datetime'),
+    ({'to': '2024-13-01'}, 'to must be an ISO date or datetime'),
+    ({'from': '2024-06-05', 'to': '2024-06-04'}, 'from must be before to'),
+    ({'from': '2024-06-04T10:00:00', 'to': '2024-06-04T10:00:00'}, 'from must be before to'),
+])
+def test_parse_window_rejects(args, message):
+    with pytest.raises(ValueError, match=message):
+        parse_window(args)
+
+
+def test_growth_count_edges():
+    anchor = datetime(2024, 6, 30, 12, tzinfo=timezone.utc)
+    tick = timedelta(milliseconds=1)
+    collection = mongomock.MongoClient().db['process']
+    # last 7 days: (anchor - 7d, anchor]; previous: (anchor - 14d, anchor - 7d]
+    for created_at in [anchor, anchor - timedelta(days=7) + tick,
+                       anchor - timedelta(days=7), anchor - timedelta(days=14) + tick,
+                       anchor - timedelta(days=14), anchor - timedelta(days=20)]:
+        collection.insert_one({'created_at': created_at})
+    assert growth_counts(collection) == (2, 2)
+    assert growth_counts(collection, anchor=anchor + timedelta(days=7)) == (0, 2)
+    # a window start inside the previous week cuts it (start inclusive)
+    window = (anchor - timedelta(days=10), None)
+    assert growth_counts(collection, window) == (2, 1)
+    # the anchor is the newest test inside the window (here anchor - 7d + 1ms)
+    window = (None, anchor - timedelta(days=1))
+    assert growth_counts(collection, window) == (2, 3)
+    assert growth_counts(mongomock.MongoClient().db['empty']) == (0, 0)
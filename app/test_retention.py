@@ -0,0 +1,96 @@
+import os
+from datetime import datetime, timedelta, timezone
+
+import mongomock
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from aggregate import stats_from_documents
+from indexes import ensure_indexes
+from retention import HistoryStore, drop_ttl, run, status, ttl_seconds
+from storage import MongoStorage
+
+from test_storage import approx_stats, records
+
+MONGODB_URI = os.environ.get('MONGODB_URI', 'mongodb://localhost:27017')
+TEST_DB = 'system-monitor-retention-test'
+
+
+def midnight(days_ago):
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    return today - timedelta(days=days_ago)
+
+
+def in_window(docs, start, end=None):
+    return [doc for doc in docs if doc['created_at'].replace(tzinfo=timezone.utc) >= start
+            and (end is None or doc['created_at'].replace(tzinfo=timezone.utc) < end)]
+
+
+def dashboard(stats):
+    # rollup counters keep a None key for a missing field, the aggregation drops it;
+    # the 7-day counters come from growth_counts()
+    counts = {dim: {key: n for key, n in counter.items() if key is not None} for dim, counter in stats['counts'].items()}
+    return approx_stats(dict(stats, counts=counts, tests_last_7d=0, tests_prev_7d=0))
+
+
+@pytest.fixture
+def folded():
+    """(storage reading history + raw documents, every document), days before 6 days ago folded and expired"""
+    db = mongomock.MongoClient().db
+    # mongomock upserts scan the collection: a small history keeps this quick
+    docs = records(300, days=12)
+    db['process'].insert_many([dict(doc) for doc in docs])
+    docs = list(db['process'].find())
+    history = HistoryStore(db['history'])
+    assert history.fold(db['process'], midnight(6), batch_size=17, pause=0) == len(in_window(docs, midnight(12), midnight(6)))
+    assert history.folded_until() == midnight(6)
+    # สิ่งที่ TTL index จะทำ
+    db['process'].delete_many({'created_at': {'$lt': midnight(6)}})
+    yield MongoStorage(db['process'], history=history), docs
+
+
+def test_stats_include_folded_days(folded):
+    storage, docs = folded
+    assert dashboard(storage.stats()) == dashboard(stats_from_documents(docs))
+    for start, end in [(midnight(9), None), (midnight(3), None), (midnight(11), midnight(8)),
+                       (midnight(8), midnight(4))]:
+        assert dashboard(storage.stats(window=(start, end))) == dashboard(stats_from_documents(in_window(docs, start, end)))
+
+
+def test_refold_is_idempotent(folded):
+    storage, docs = folded
+    history = storage.history
+    rows = sorted(history.collection.find(), key=repr)
+    # หยุดกลางทาง: watermark ย้อนกลับ แล้วพับวันเดิมซ้ำ (เอกสารดิบของวันที่ยังไม่หมดอายุ)
+    history._set_folded_until(midnight(7))
+    storage.collection.insert_many([dict(doc) for doc in in_window(docs, midnight(7), midnight(6))])
+    history.fold(storage.collection, midnight(6), pause=0)
+    assert sorted(history.collection.find(), key=repr) == rows
+    assert history.folded_until() == midnight(6)
+
+
+@pytest.fixture
+def db():
+    # collMod (TTL) needs a real server
+    client = MongoClient(MONGODB_URI, serverSelectionTimeoutMS=2000)
+    try:
+        client.admin.command('ping')
+    except PyMongoError as e:
+        pytest.skip(f"MongoDB not reachable at {MONGODB_URI}: {e}")
+    client.drop_database(TEST_DB)
+    db = client[TEST_DB]
+    db['process'].insert_many(records(500))
+    ensure_indexes(db)
+    yield db
+    client.drop_database(TEST_DB)
+    client.close()
+
+
+def test_ttl_is_set_after_folding(db):
+    assert ttl_seconds(db['process']) is None
+    run(db, 30, 7, pause=0)
+    assert ttl_seconds(db['process']) == 30 * 86400
+    assert 'warning' not in status(db, (30, 7))
+    assert drop_ttl(db['process'])
+    assert ttl_seconds(db['process']) is None
@@ -0,0 +1,110 @@
+from datetime import datetime, timedelta, timezone
+
+import mongomock
+
+from dashboard import empty_stats, extract_mode
+from queries import query_stats
+from rollups import RollupStore, add_rollup_rows, rollup_increments, rollup_keys
+
+from test_storage import approx_stats, records
+
+NOW = datetime(2024, 6, 4, 12, 0, tzinfo=timezone.utc)
+
+
+def doc(**fields):
+    base = {'cpu_brand': 'AMD', 'cpu_model': 'Ryzen 5 7600X', 'gpu_brand': 'NVIDIA', 'gpu_model': 'RTX 4070',
+            'ram_gb': 32, 'test_device_type': 'CPU', 'created_at': NOW,
+            'test_details': {'mode': 'cpu', 'avg_score': 80.0}}
+    return dict(base, **fields)
+
+
+def dashboard(stats):
+    # rollups keep no 'day' counts (daily.py); 7-day counters: growth_counts()
+    counts = {dim: values for dim, values in stats['counts'].items() if dim != 'day'}
+    return approx_stats(dict(stats, counts=counts))
+
+
+def test_increments_merge_per_key():
+    merged = rollup_increments([doc(), doc(ram_gb=16), doc(cpu_model='i5-13600K', test_details='free text')])
+    counter_id, inc = merged[(None, 'cpu_model', 'Ryzen 5 7600X')]
+    assert counter_id == {'dim': 'cpu_model', 'key': 'Ryzen 5 7600X'}
+    assert inc == {'count': 2, 'score_sum': 160.0, 'score_count': 2}
+    assert merged[(None, 'cpu_model', 'i5-13600K')][1] == {'count': 1}
+    assert merged[(None, 'total', 'all')][1] == {'count': 3, 'score_sum': 160.0, 'score_count': 2,
+                                                  'ram_sum': 80.0, 'ram_count': 3}
+    # list keys are hashed as tuples and stored as lists
+    assert merged[(None, 'brand_pair', ('AMD', 'NVIDIA'))][0]['key'] == ['AMD', 'NVIDIA']
+
+    # adding a second batch into the same dict, per UTC day
+    by_day = rollup_increments([doc()], by_day=True)
+    rollup_increments([doc(created_at=NOW + timedelta(hours=13)), doc(created_at=datetime(2024, 6, 4, 23, 30))],
+                      by_day, by_day=True)
+    assert by_day[('2024-06-04', 'total', 'all')][1]['count'] == 2
+    assert by_day[('2024-06-05', 'total', 'all')][0] == {'day': '2024-06-05', 'dim': 'total', 'key': 'all'}
+
+
+def test_ram_sum_skips_values_that_are_not_numbers():
+    inc = rollup_increments([doc(ram_gb='16'), doc(ram_gb='lots'), doc(ram_gb=None), doc(ram_gb=[8])])
+    assert inc[(None, 'total', 'all')][1]['ram_sum'] == 16.0
+    assert inc[(None, 'total', 'all')][1]['ram_count'] == 1
+
+
+def test_rows_become_dashboard_stats():
+    merged = rollup_increments([doc(), doc(gpu_brand='AMD', test_details={'mode': 'ai', 'avg_score': 42.5})],
+                               by_day=True)
+    rows = [dict(inc, _id=counter_id) for counter_id, inc in merged.values()]
+    stats = add_rollup_rows(empty_stats(), rows)
+    assert stats['total'] == 2 and stats['ram_sum'] == 64.0 and stats['score_count'] == 2
+    assert stats['counts']['brand_pair'] == {('AMD', 'NVIDIA'): 1, ('AMD', 'AMD'): 1}
+    assert stats['counts']['day'] == {'2024-06-04': 2}
+    assert stats['counts']['mode'] == {'cpu': 1, 'ai': 1}
+    assert stats['score_sums']['mode'] == {'cpu': [80.0, 1], 'ai': [42.5, 1]}
+    assert sum(stats['score_bins'].values()) == 2
+    # counters from two sources add up
+    assert add_rollup_rows(stats, rows)['total'] == 4
+
+
+def test_snapshot_always_reads_the_total_row():
+    store = RollupStore(mongomock.MongoClient().db['rollups'])
+    assert store.is_empty()
+    store.record_many([doc(), doc(cpu_model='i5-13600K')])
+    assert not store.is_empty()
+    stats = store.snapshot(dims=['gpu_brand'])
+    assert stats['total'] == 2 and stats['ram_count'] == 2
+    assert stats['counts']['gpu_brand'] == {'NVIDIA': 2}
+    assert stats['counts']['cpu_model'] == {}
+
+
+def test_null_mode_is_unknown():
+    assert extract_mode({'mode': None}) == extract_mode({}) == extract_mode('text') == 'unknown'
+    keys = dict((dim, key) for dim, key in rollup_keys(doc(test_details={'mode': None, 'avg_score': 10.0})))
+    assert keys['mode'] == 'unknown'
+
+
+def test_missing_fields_add_no_counters():
+    keys = rollup_keys(doc(cpu_model=None, gpu_brand=None, ram_gb=None))
+    dims = [dim for dim, _ in keys]
+    assert 'cpu_model' not in dims and 'gpu_brand' not in dims and 'ram_gb' not in dims
+    assert 'brand_pair' not in dims and 'cpu_score_bin' not in dims
+    assert dict(keys)['combo'] == 'Unknown CPU + RTX 4070'
+    # brand pairs need a device type, like DASHBOARD_PIPELINE
+    assert 'brand_pair' not in dict(rollup_keys(doc(test_device_type=None)))
+    assert dict(rollup_keys(doc(test_device_type=None)))['device_type'] == 'unknown'
+    # old None-key counters are ignored when read back
+    rows = [{'_id': {'dim': 'cpu_model', 'key': None}, 'count': 3},
+            {'_id': {'dim': 'brand_pair', 'key': [None, 'AMD']}, 'count': 2}]
+    stats = add_rollup_rows(empty_stats(), rows)
+    assert stats['counts']['cpu_model'] == {} and stats['counts']['brand_pair'] == {}
+
+
+def test_rollups_match_query_stats():
+    docs = records(1500)
+    docs[5]['test_details'] = {'mode': None, 'avg_score': 55.0}
+    docs[6].update(test_device_type=None, cpu_model=None)
+    docs[7].update(gpu_brand=None, ram_gb='lots')
+    collection = mongomock.MongoClient().db['process']
+    collection.insert_many([dict(d) for d in docs])
+    store = RollupStore(mongomock.MongoClient().db['rollups'])
+    store.record_many(docs)
+    assert dashboard(store.snapshot()) == dashboard(query_stats(collection))
+    assert store.snapshot()['counts']['mode']['unknown'] >= 1
@@ -0,0 +1,101 @@
+import random
+from collections import Counter
+
+import mongomock
+
+from dashboard import combo_label
+from sketches import HyperLogLog, SketchStore, SpaceSaving
+from synthetic import generate_records
+
+
+def test_hyperloglog_small_cardinality_is_exact():
+    """Tens of models are counted by linear counting, effectively exact"""
+    records = list(generate_records(5000))
+    for field in ('cpu_model', 'gpu_model'):
+        hll = HyperLogLog()
+        for record in records:
+            hll.add(record[field])
+        assert hll.count() == len({record[field] for record in records})
+
+
+def test_hyperloglog_error_bound():
+    """Large cardinalities stay within 3 standard errors (1.04 / sqrt(m))"""
+    rnd = random.Random(7)
+    for n in (10000, 100000):
+        hll = HyperLogLog()
+        for _ in range(n):
+            hll.add(f'model-{rnd.getrandbits(48)}')
+        assert abs(hll.count() - n) / n < 3 * 1.04 / hll.m ** 0.5
+
+
+def test_hyperloglog_merge_is_union():
+    a, b, union = HyperLogLog(), HyperLogLog(), HyperLogLog()
+    for i in range(20000):
+        (a if i % 2 else b).add(i % 15000)
+        union.add(i % 15000)
+    assert a.merge(b).registers == union.registers
+
+
+def test_space_saving_top_combos_match_exact():
+    """Top-10 CPU+GPU combos on synthetic data: same ranking, counts within N/k"""
+    records = list(generate_records(20000))
+    exact = Counter(combo_label(record['cpu_model'], record['gpu_model']) for record in records)
+    sketch = SpaceSaving(k=50)
+    for record in records:
+        sketch.add(combo_label(record['cpu_model'], record['gpu_model']))
+
+    bound = len(records) / sketch.k
+    for item, estimate in sketch.top(10):
+        assert exact[item] <= estimate <= exact[item] + bound
+    # every item more frequent than N/k is guaranteed to be kept
+    assert {item for item, n in exact.items() if n > bound} <= set(sketch.counters)
+
+
+def test_space_saving_heavy_hitters_on_skewed_stream():
+    rnd = random.Random(3)
+    stream = [f'cpu-{min(int(rnd.paretovariate(1.2)), 5000)}' for _ in range(50000)]
+    exact = Counter(stream)
+    sketch = SpaceSaving(k=100)
+    for item in stream:
+        sketch.add(item)
+    assert [item for item, _ in sketch.top(5)] == [item for item, _ in exact.most_common(5)]
+    for item, estimate in sketch.top(20):
+        assert 0 <= estimate - exact[item] <= sketch.counters[item][1] <= len(stream) / sketch.k
+
+
+def test_space_saving_merge_keeps_bound():
+    rnd = random.Random(11)
+    stream = [f'gpu-{int(rnd.expovariate(0.05))}' for _ in range(30000)]
+    exact = Counter(stream)
+    left, right = SpaceSaving(k=40), SpaceSaving(k=40)
+    for i, item in enumerate(stream):
+        (left if i % 3 else right).add(item)
+    merged = left.merge(right)
+    assert merged.total == len(stream)
+    for item, estimate in merged.top(10):
+        assert exact[item] <= estimate <= exact[item] + len(stream) / merged.k
+
+
+def test_store_persists_and_merges_workers():
+    """Two workers' increments end up in the shared document and in both views"""
+    collection = mongomock.MongoClient()['system-monitor']['sketches']
+    records = list(generate_records(4000))
+    worker_a = SketchStore(collection, flush_interval=3600)
+    worker_b = SketchStore(collection, flush_interval=3600)
+    worker_a.rebuild(mongomock.MongoClient()['empty']['process'])
+    worker_a.record_many(records[:2000])
+    worker_b.record_many(records[2000:])
+    worker_a.sync()
+    worker_b.sync()
+    worker_a.sync()
+
+    exact = Counter(record['cpu_model'] for record in records)
+    for worker in (worker_a, worker_b):
+        assert worker.ready()
+        stats = worker.fill({'distinct': {}, 'counts': {}})
+        assert stats['distinct']['cpu_model'] == len(exact)
+        assert stats['counts']['cpu_model'] == dict(exact)
+
+    restarted = SketchStore(collection)
+    assert restarted.ready()
+    assert restarted.fill({'distinct': {}, 'counts': {}})['counts']['cpu_model'] == dict(exact)
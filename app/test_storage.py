@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta, timezone
+
+import mongomock
+import pytest
+
+from aggregate import stats_from_documents
+from listing import parse_list_args
+from queries import growth_counts
+from sqlite_storage import SQLiteStorage
+from storage import MongoStorage, backend_from_env
+from synthetic import generate_records
+
+
+def records(n, seed=1, days=90):
+    docs = list(generate_records(n, seed=seed, days=days))
+    for doc in docs:
+        # BSON dates keep milliseconds only
+        doc['created_at'] = doc['created_at'].replace(microsecond=doc['created_at'].microsecond // 1000 * 1000)
+    docs[0]['test_details'] = {'mode': 'ai', 'extra': [1, 2]}
+    docs[1]['test_details'] = None
+    docs[2]['test_details'] = 'Gaming performance test'
+    docs[3].pop('cpu_model')
+    docs[4].pop('ram_gb')
+    return docs
+
+
+@pytest.fixture
+def stores(tmp_path):
+    docs = records(2000)
+    sqlite = SQLiteStorage(str(tmp_path / 'test.db'))
+    mongo = MongoStorage(mongomock.MongoClient().db['process'])
+    # เอกสารชุดเดียวกัน (_id เดียวกัน) ในทั้งสอง backend
+    assert sqlite.insert_many([dict(doc) for doc in docs]) == []
+    mongo.insert_many([dict(doc, _id=stored['_id']) for doc, stored in zip(docs, sqlite.find({}))])
+    yield sqlite, mongo
+    sqlite.close()
+
+
+def approx_stats(stats):
+    # tests_last_7d/tests_prev_7d come from growth_counts() (see app.py summary)
+    expected = dict(stats, tests_last_7d=0, tests_prev_7d=0)
+    for key in ('ram_sum', 'score_sum'):
+        expected[key] = pytest.approx(expected[key])
+    expected['score_sums'] = {dim: {key: [pytest.approx(total), n] for key, (total, n) in sums.items()}
+                              for dim, sums in stats['score_sums'].items()}
+    return expected
+
+
+def test_stats_match_reference(stores):
+    sqlite, mongo = stores
+    documents = list(mongo.collection.find())
+    assert sqlite.stats() == approx_stats(stats_from_documents(documents))
+
+    start = datetime.now(timezone.utc) - timedelta(days=10)
+    in_window = [doc for doc in documents if doc['created_at'].replace(tzinfo=timezone.utc) >= start]
+    assert 0 < len(in_window) < len(documents)
+    assert sqlite.stats(window=(start, None)) == approx_stats(stats_from_documents(in_window))
+
+
+def test_list_queries_match_mongodb(stores):
+    sqlite, mongo = stores
+    for args in [{}, {'cpu_model': 'M2', 'ram_gb': '16'}, {'mode': 'ai', 'sort': 'created_at'},
+                 {'sort': 'created_at', 'fields': 'cpu_model,ram_gb', 'limit': '7'}]:
+        params = parse_list_args(args)
+        query, projection, sort, limit = params['query'], params['projection'], params['sort'], params['limit']
+        expected = list(mongo.find(query, projection, sort, limit))
+        assert list(sqlite.find(query, projection, sort, limit)) == expected, args
+
+        # หน้าถัดไปจาก cursor `after`
+        last = expected[-1]
+        after = str(last['_id']) if 'sort' not in args else f"{last['created_at'].isoformat()},{last['_id']}"
+        params = parse_list_args(dict(args, after=after))
+        assert (list(sqlite.find(params['query'], params['projection'], params['sort'], params['limit']))
+                == list(mongo.find(params['query'], params['projection'], params['sort'], params['limit'])))
+
+
+def test_growth_counts_match_mongodb(stores):
+    sqlite, mongo = stores
+    assert sqlite.growth_counts() == growth_counts(mongo.collection) != (0, 0)
+    window = (datetime.now(timezone.utc) - timedelta(days=10), None)
+    assert sqlite.growth_counts(window) == growth_counts(mongo.collection, window)
+
+
+def test_backend_from_env():
+    assert backend_from_env({}) == 'mongodb'
+    assert backend_from_env({'STORAGE_BACKEND': 'SQLite'}) == 'sqlite'
+    with pytest.raises(ValueError):
+        backend_from_env({'STORAGE_BACKEND': 'duckdb'})
@@ -0,0 +1,70 @@
+import json
+
+import mongomock
+import pytest
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from submission import (MAX_BATCH_SIZE, apply_write_errors, batch_response, build_document, parse_batch,
+                        validate_batch)
+from synthetic import generate_records
+
+
+def record():
+    doc = next(iter(generate_records(1)))
+    doc.pop('created_at')
+    return doc
+
+
+def test_build_document_requires_fields():
+    doc = build_document(dict(record(), extra='dropped'))
+    assert 'extra' not in doc and doc['created_at'].tzinfo is not None
+    for data, message in [(None, 'No JSON data'), ([record()], 'JSON object'),
+                          ({k: v for k, v in record().items() if k != 'ram_gb'}, 'Missing field: ram_gb')]:
+        with pytest.raises(ValueError, match=message):
+            build_document(data)
+
+
+def test_partly_invalid_batch():
+    body = '\n'.join([json.dumps(record()), '{not json', json.dumps({'cpu_model': 'x'}), '', json.dumps(record())])
+    records = parse_batch(body.encode(), 'application/x-ndjson; charset=utf-8')
+    assert len(records) == 4
+    documents, results = validate_batch(records)
+    # valid documents keep the index of their record
+    assert [index for index, _ in documents] == [0, 3]
+    assert results[0] is None and results[3] is None
+    assert results[1]['status'] == 'error' and results[1]['message'].startswith('Invalid JSON')
+    assert results[2] == {'index': 2, 'status': 'error', 'message': 'Missing field: test_device_type'}
+
+
+def test_write_errors_map_back_to_records():
+    collection = mongomock.MongoClient().db['process']
+    existing = ObjectId()
+    collection.insert_one({'_id': existing})
+    records = [record(), {}, record(), record()]
+    documents, results = validate_batch(records)
+    # the second insert (record 2) collides with a stored _id
+    documents[1][1]['_id'] = existing
+    write_errors = []
+    try:
+        collection.insert_many([doc for _, doc in documents], ordered=False)
+    except BulkWriteError as e:
+        write_errors = e.details['writeErrors']
+    assert [error['index'] for error in write_errors] == [1]
+
+    inserted = apply_write_errors(documents, results, write_errors)
+    assert inserted == [documents[0][1], documents[2][1]]
+    assert [result['status'] for result in results] == ['ok', 'error', 'error', 'ok']
+    assert results[2]['index'] == 2 and 'Duplicate' in results[2]['message']
+    assert results[3]['document_id'] == str(documents[2][1]['_id'])
+    body = batch_response(results, demo=False)
+    assert (body['status'], body['saved'], body['failed']) == ('partial', 2, 2)
+
+
+def test_batch_size_limit():
+    assert len(parse_batch(json.dumps([record()] * MAX_BATCH_SIZE).encode(), 'application/json')) == MAX_BATCH_SIZE
+    with pytest.raises(ValueError, match=f'Batch too large: {MAX_BATCH_SIZE + 1} records'):
+        parse_batch(json.dumps([record()] * (MAX_BATCH_SIZE + 1)).encode(), 'application/json')
+    for body, message in [(b'[]', 'No records'), (b'{"a": 1}', 'JSON array or NDJSON'), (b'[', 'Invalid JSON')]:
+        with pytest.raises(ValueError, match=message):
+            parse_batch(body, 'application/json')
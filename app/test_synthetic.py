@@ -0,0 +1,39 @@
+from collections import Counter
+from datetime import datetime, timezone
+
+import pytest
+
+from synthetic import Profile, generate_records
+
+END = datetime(2024, 6, 30, tzinfo=timezone.utc)
+
+
+def test_weighted_profile_only_generates_listed_values():
+    profile = Profile(cpu_weights={'i5-13600K': 9, 'M2': 1}, ram_weights={'16': 3, '64': 1},
+                      free_text_rate=0, missing_score_rate=0)
+    records = list(generate_records(4000, end=END, profile=profile))
+    cpus = Counter(record['cpu_model'] for record in records)
+    assert set(cpus) == {'i5-13600K', 'M2'}
+    assert 0.85 < cpus['i5-13600K'] / len(records) < 0.95
+    assert set(record['ram_gb'] for record in records) == {16, 64}
+    assert all('avg_score' in record['test_details'] for record in records)
+    assert {record['cpu_brand'] for record in records if record['cpu_model'] == 'M2'} == {'Apple'}
+
+
+@pytest.mark.parametrize('shape', ['uniform', 'recent', 'diurnal'])
+def test_timestamps_stay_in_range(shape):
+    records = list(generate_records(2000, days=30, end=END, profile=Profile(timestamps=shape)))
+    assert all(0 <= (END - record['created_at']).days <= 30 for record in records)
+
+
+def test_recent_profile_skews_towards_the_end():
+    records = list(generate_records(3000, days=90, end=END, profile=Profile(timestamps='recent')))
+    last_month = sum(1 for record in records if (END - record['created_at']).days < 30)
+    assert last_month > len(records) / 2
+
+
+def test_unknown_values_are_rejected():
+    with pytest.raises(ValueError):
+        Profile(gpu_weights={'RTX 9999': 1})
+    with pytest.raises(ValueError):
+        Profile(timestamps='weekly')